@@ -0,0 +1,200 @@
+"""
+Product sales analytics for R Sanju Invoice application.
+
+For one month: the top products by revenue, quantity and margin, and an
+hour-of-day x weekday heatmap of sales. Each comes from one grouped query
+(over the month's invoice lines and over its invoices), and the grouped
+figures are cached per (user, month). Creating, voiding or deleting an
+invoice invalidates its month once the change has committed. Months in
+archived financial years are grouped from the archive instead.
+
+Revenue is the taxable value (after discount, before GST). Margin uses each
+product's current cost price, since the cost at the time of sale is not
+recorded; names and costs are read fresh on every request.
+"""
+import heapq
+from datetime import date
+from typing import NamedTuple
+
+from sqlalchemy import select, func, extract
+
+from models import db, Invoice, InvoiceItem, Product
+import archival
+import cache
+from partitioning import financial_year
+
+
+TOP_N = 10
+MAX_TOP_N = 50
+CACHE_TTL = 3600
+WEEKDAYS = ("Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun")
+# Invoice times are stored in UTC; the heatmap is in IST
+IST_OFFSET_MINUTES = 330
+MINUTES_PER_WEEK = 7 * 24 * 60
+
+invoices_table = Invoice.__table__
+items_table = InvoiceItem.__table__
+products_table = Product.__table__
+
+
+class ProductSales(NamedTuple):
+    """One product's sales over the period."""
+    product_id: int
+    name: str
+    sku: str
+    quantity: float
+    revenue: float
+    cost: float
+    margin: float
+
+
+class SalesAnalytics(NamedTuple):
+    """Top sellers and the sales heatmap of one month."""
+    month: str
+    invoice_count: int
+    sales_total: float
+    top_by_revenue: list
+    top_by_quantity: list
+    top_by_margin: list
+    heatmap: list          # 7 weekday rows (Monday first) of 24 hourly sales totals
+    heatmap_counts: list   # invoice counts in the same layout
+    heatmap_max: float
+
+
+def _month_bounds(year: int, month: int) -> tuple:
+    return date(year, month, 1), date(year + month // 12, month % 12 + 1, 1)
+
+
+def _week_slot(weekday: int, hour: int, minute: int) -> tuple:
+    """IST ``(weekday, hour)`` of a UTC time given as Monday-first weekday, hour and minute."""
+    minutes = (weekday * 24 * 60 + hour * 60 + minute + IST_OFFSET_MINUTES) % MINUTES_PER_WEEK
+    return minutes // (24 * 60), minutes // 60 % 24
+
+
+def _grouped_from_tables(user_id: str, start: date, end: date) -> tuple:
+    """``({product_id: [quantity, revenue]}, {(weekday, hour): [sales, invoices]})`` in SQL."""
+    i, li = invoices_table, items_table
+    in_month = (
+        i.c.user_id == user_id,
+        i.c.invoice_date >= start,
+        i.c.invoice_date < end,
+        i.c.status == "active",
+    )
+    connection = db.session.connection()
+
+    products = {}
+    for product_id, quantity, revenue in connection.execute(
+        select(li.c.product_id, func.sum(li.c.quantity), func.sum(li.c.taxable_value))
+        .select_from(li.join(i, i.c.id == li.c.invoice_id))
+        .where(li.c.user_id == user_id, li.c.product_id.is_not(None), *in_month)
+        .group_by(li.c.product_id)
+    ):
+        products[product_id] = [quantity or 0.0, revenue or 0.0]
+
+    # Grouped to the minute (no bound parameters, so PostgreSQL matches the
+    # GROUP BY expressions) and shifted to IST here
+    dow, hour, minute = (extract(field, i.c.created_at) for field in ("dow", "hour", "minute"))
+    slots = {}
+    for day, at_hour, at_minute, sales, count in connection.execute(
+        select(dow, hour, minute, func.sum(i.c.total), func.count(i.c.id))
+        .where(*in_month).group_by(dow, hour, minute)
+    ):
+        # SQL weekdays start on Sunday
+        slot = _week_slot((int(day) + 6) % 7, int(at_hour), int(at_minute))
+        totals = slots.setdefault(slot, [0.0, 0])
+        totals[0] += sales or 0.0
+        totals[1] += count
+    return products, slots
+
+
+def _grouped_from_archive(user_id: str, start: date, end: date) -> tuple:
+    """The same figures as _grouped_from_tables(), for a month in an archived year."""
+    archived = archival.load_year(user_id, financial_year(start))
+    products, slots = {}, {}
+    if archived is None:
+        return products, slots
+    for invoice in archived.invoices.values():
+        if invoice["status"] != "active" or not start <= invoice["invoice_date"] < end:
+            continue
+        created = invoice["created_at"]
+        totals = slots.setdefault(_week_slot(created.weekday(), created.hour, created.minute), [0.0, 0])
+        totals[0] += invoice["total"] or 0.0
+        totals[1] += 1
+        for item in archived.items.get(invoice["id"], []):
+            if item["product_id"]:
+                sums = products.setdefault(item["product_id"], [0.0, 0.0])
+                sums[0] += item["quantity"] or 0.0
+                sums[1] += item["taxable_value"] or 0.0
+    return products, slots
+
+
+def _grouped(user_id: str, year: int, month: int) -> tuple:
+    start, end = _month_bounds(year, month)
+    tables = _grouped_from_tables(user_id, start, end)
+    if not archival.month_summary(user_id, year, month):
+        return tables
+    # A backdated invoice can land in an archived month after archival
+    products, slots = _grouped_from_archive(user_id, start, end)
+    for source, target in ((tables[0], products), (tables[1], slots)):
+        for key, (first, second) in source.items():
+            totals = target.setdefault(key, [0, 0])
+            totals[0] += first
+            totals[1] += second
+    return products, slots
+
+
+def sales_analytics(user_id: str, year: int, month: int, top_n: int = TOP_N) -> SalesAnalytics:
+    """Top ``top_n`` products by revenue, quantity and margin, and the heatmap, for one month."""
+    top_n = max(1, min(top_n, MAX_TOP_N))
+    products, slots = cache.get_or_set(
+        ("sales_analytics", user_id, f"{year}-{month:02d}"),
+        lambda: _grouped(user_id, year, month),
+        CACHE_TTL,
+        tags=(cache.user_tag(user_id),),
+    )
+
+    p = products_table
+    details = {}
+    if products:
+        details = {
+            row.id: row for row in db.session.connection().execute(
+                select(p.c.id, p.c.name, p.c.sku, p.c.cost_price)
+                .where(p.c.user_id == user_id, p.c.id.in_(list(products)))
+            )
+        }
+    sales = []
+    for product_id, (quantity, revenue) in products.items():
+        detail = details.get(product_id)
+        cost = quantity * (detail.cost_price or 0.0) if detail else 0.0
+        sales.append(ProductSales(
+            product_id,
+            detail.name if detail else "(deleted product)",
+            detail.sku if detail else "",
+            round(quantity, 3),
+            round(revenue, 2),
+            round(cost, 2),
+            round(revenue - cost, 2),
+        ))
+
+    heatmap = [[0.0] * 24 for _ in WEEKDAYS]
+    counts = [[0] * 24 for _ in WEEKDAYS]
+    for (weekday, hour), (total, count) in slots.items():
+        heatmap[weekday][hour] = round(total, 2)
+        counts[weekday][hour] = count
+
+    return SalesAnalytics(
+        month=f"{year}-{month:02d}",
+        invoice_count=sum(count for _, count in slots.values()),
+        sales_total=round(sum(total for total, _ in slots.values()), 2),
+        top_by_revenue=heapq.nlargest(top_n, sales, key=lambda row: row.revenue),
+        top_by_quantity=heapq.nlargest(top_n, sales, key=lambda row: row.quantity),
+        top_by_margin=heapq.nlargest(top_n, sales, key=lambda row: row.margin),
+        heatmap=heatmap,
+        heatmap_counts=counts,
+        heatmap_max=max((max(row) for row in heatmap), default=0.0),
+    )
+
+
+def invalidate(user_id: str, days) -> None:
+    """Drop the cached analytics of the months containing ``days``."""
+    cache.invalidate(*{("sales_analytics", user_id, f"{d.year}-{d.month:02d}") for d in days})
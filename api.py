@@ -0,0 +1,520 @@
+"""
+Versioned JSON API for R Sanju Invoice application.
+
+Integrations and the billing screen's JavaScript use these endpoints instead
+of posting HTML forms and parsing pages. Everything lives under /api/v1 so a
+later version can change shapes without breaking existing clients.
+
+- Authentication: ``Authorization: Bearer <token>`` with a token created on
+  the settings page, or the browser's logged-in session. Session requests
+  that change data must be sent as JSON, which a cross-site HTML form cannot
+  do.
+- Sparse fieldsets: ``?fields=id,total`` selects only those columns in SQL;
+  ``id`` is always returned.
+- Pagination: ``?limit=`` (at most MAX_LIMIT) and the opaque ``next_cursor``
+  of the previous page, keyset-based so deep pages cost the same as the first.
+- Batches: POST a JSON array (at most MAX_BATCH objects) to create many
+  records in one transaction; one invalid record rejects the whole batch.
+- Idempotency: an ``Idempotency-Key`` header on POST /invoices makes a
+  retried request return the invoice the first one created.
+- Branches: invoices and expenses take a ``branch_id`` (null for the main
+  branch) and list endpoints filter on ``?branch_id=`` (0 for the main
+  branch); GET /reports/branches sums a period per branch.
+- Offline billing: a terminal reserves a block of invoice numbers, bills
+  from it while offline, and later sends the queued invoices to
+  POST /sync/invoices, where each is saved once and reported on its own.
+
+Records are created through the same ``services`` functions as the HTML
+routes.
+"""
+import base64
+import hashlib
+import json
+import secrets
+from datetime import datetime, date, timedelta
+from typing import NamedTuple
+
+from flask import Blueprint, request, session, jsonify, g
+from sqlalchemy import select, or_, and_
+from werkzeug.exceptions import HTTPException
+
+from models import db, ApiToken, Product, Invoice, InvoiceItem, Expense
+import services
+import analytics
+import branches
+import read_models
+
+
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 200
+MAX_BATCH = 100
+TOKEN_PREFIX = "rsk_"
+# last_used_at is only written once per interval, not on every request
+LAST_USED_INTERVAL = timedelta(minutes=5)
+
+api = Blueprint("api", __name__, url_prefix="/api/v1")
+
+
+class ApiError(Exception):
+    """An error returned to the client as ``{"error": {"code", "message"}}``."""
+
+    def __init__(self, status: int, code: str, message: str):
+        super().__init__(message)
+        self.status = status
+        self.code = code
+        self.message = message
+
+
+class Resource(NamedTuple):
+    """Table, exposed fields and keyset order of one API collection."""
+    table: object
+    fields: tuple
+    default_fields: tuple
+    order: tuple  # (column name, descending) pairs; the last one is unique
+
+
+PRODUCTS = Resource(
+    table=Product.__table__,
+    fields=("id", "name", "description", "sku", "barcode", "category", "brand", "unit_price",
+            "cost_price", "stock_quantity", "min_stock_level", "hsn_code", "gst_rate",
+            "supplier_id", "created_at", "updated_at"),
+    default_fields=("id", "name", "sku", "barcode", "category", "unit_price", "stock_quantity",
+                    "hsn_code", "gst_rate"),
+    order=(("id", False),),
+)
+
+INVOICES = Resource(
+    table=Invoice.__table__,
+    fields=("id", "invoice_number", "invoice_date", "created_at", "customer_name", "customer_phone",
+            "customer_address", "customer_gstin", "subtotal", "discount", "tax", "total",
+            "payment_mode", "payment_reference", "notes", "status", "voided_at", "branch_id", "items"),
+    default_fields=("id", "invoice_number", "invoice_date", "customer_name", "customer_phone",
+                    "subtotal", "discount", "tax", "total", "payment_mode", "status"),
+    order=(("id", True),),
+)
+
+EXPENSES = Resource(
+    table=Expense.__table__,
+    fields=("id", "date", "description", "category", "amount", "branch_id", "created_at"),
+    default_fields=("id", "date", "description", "category", "amount"),
+    order=(("date", True), ("id", True)),
+)
+
+INVOICE_ITEM_FIELDS = ("product_id", "description", "quantity", "unit_price", "line_total",
+                       "hsn_code", "gst_rate", "taxable_value", "cgst", "sgst", "igst")
+
+
+def hash_token(token: str) -> str:
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+
+def create_token(user_id: str, name: str) -> tuple:
+    """Create an API token; returns ``(ApiToken, token)``. Only the hash is stored."""
+    token = TOKEN_PREFIX + secrets.token_urlsafe(32)
+    api_token = ApiToken(
+        user_id=user_id,
+        name=(name or "").strip()[:100] or "API token",
+        token_hash=hash_token(token),
+        token_prefix=token[:12],
+    )
+    db.session.add(api_token)
+    db.session.flush()
+    return api_token, token
+
+
+@api.before_request
+def authenticate():
+    header = request.headers.get("Authorization", "")
+    if header.startswith("Bearer "):
+        api_token = ApiToken.query.filter_by(token_hash=hash_token(header[7:].strip())).first()
+        if not api_token:
+            raise ApiError(401, "invalid_token", "The API token is invalid or has been revoked.")
+        now = datetime.utcnow()
+        if not api_token.last_used_at or now - api_token.last_used_at > LAST_USED_INTERVAL:
+            with services.unit_of_work():
+                api_token.last_used_at = now
+        g.api_user_id = api_token.user_id
+        return None
+
+    if session.get("logged_in"):
+        if request.method not in ("GET", "HEAD") and not request.is_json:
+            raise ApiError(415, "json_required", "Send the request body as application/json.")
+        g.api_user_id = session.get("user_id", "default_user")
+        return None
+
+    raise ApiError(401, "unauthorized", "Send an Authorization: Bearer <token> header.")
+
+
+@api.errorhandler(ApiError)
+def handle_api_error(error: ApiError):
+    return jsonify({"error": {"code": error.code, "message": error.message}}), error.status
+
+
+@api.errorhandler(HTTPException)
+def handle_http_error(error: HTTPException):
+    code = (error.name or "error").lower().replace(" ", "_")
+    return jsonify({"error": {"code": code, "message": error.description}}), error.code
+
+
+def _json_value(value):
+    if isinstance(value, datetime):
+        # Timestamps are stored as naive UTC
+        return value.isoformat() + ("Z" if value.tzinfo is None else "")
+    if isinstance(value, date):
+        return value.isoformat()
+    return value
+
+
+def _requested_fields(resource: Resource) -> tuple:
+    """The ``fields`` query parameter checked against the resource, or its defaults."""
+    raw = request.args.get("fields")
+    if not raw:
+        return resource.default_fields
+    fields = [name.strip() for name in raw.split(",") if name.strip()]
+    unknown = [name for name in fields if name not in resource.fields]
+    if unknown:
+        raise ApiError(400, "invalid_fields", f"Unknown field(s): {', '.join(unknown)}. "
+                                              f"Available: {', '.join(resource.fields)}.")
+    return ("id",) + tuple(name for name in fields if name != "id")
+
+
+def _limit() -> int:
+    try:
+        limit = int(request.args.get("limit", DEFAULT_LIMIT))
+    except ValueError:
+        raise ApiError(400, "invalid_limit", "limit must be an integer.")
+    return max(1, min(limit, MAX_LIMIT))
+
+
+def _encode_cursor(values: dict) -> str:
+    payload = json.dumps({key: _json_value(value) for key, value in values.items()})
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def _decode_cursor(resource: Resource) -> tuple:
+    """Keyset position from the ``cursor`` parameter, in ``resource.order`` column order."""
+    raw = request.args.get("cursor")
+    if not raw:
+        return None
+    try:
+        values = json.loads(base64.urlsafe_b64decode(raw + "=" * (-len(raw) % 4)))
+        key = []
+        for name, _ in resource.order:
+            value = values[name]
+            if resource.table.c[name].type.python_type is date:
+                value = date.fromisoformat(value)
+            key.append(value)
+        return tuple(key)
+    except (ValueError, KeyError, TypeError):
+        raise ApiError(400, "invalid_cursor", "The cursor is malformed; use next_cursor from the previous page.")
+
+
+def _after(resource: Resource, key: tuple):
+    """WHERE clause for rows after ``key`` in the resource's order."""
+    columns = [(resource.table.c[name], desc) for name, desc in resource.order]
+    clauses = []
+    for position, (column, desc) in enumerate(columns):
+        equal = [columns[i][0] == key[i] for i in range(position)]
+        beyond = column < key[position] if desc else column > key[position]
+        clauses.append(and_(*equal, beyond))
+    return or_(*clauses)
+
+
+def _load_items(user_id: str, invoice_ids: list) -> dict:
+    """Items of many invoices in one query, grouped by invoice id."""
+    li = InvoiceItem.__table__
+    stmt = select(li.c.invoice_id, *[li.c[name] for name in INVOICE_ITEM_FIELDS]).where(
+        li.c.user_id == user_id, li.c.invoice_id.in_(invoice_ids)
+    ).order_by(li.c.invoice_id, li.c.id)
+    items = {invoice_id: [] for invoice_id in invoice_ids}
+    for row in db.session.connection().execute(stmt):
+        items[row[0]].append(dict(zip(INVOICE_ITEM_FIELDS, row[1:])))
+    return items
+
+
+def _select_rows(resource: Resource, fields: tuple, user_id: str, *criteria,
+                 after: tuple = None, limit: int = None) -> tuple:
+    """Rows of ``fields`` in keyset order; returns ``(rows, next_cursor)``."""
+    t = resource.table
+    key_names = [name for name, _ in resource.order]
+    columns = [name for name in fields if name != "items"]
+    selected = list(dict.fromkeys(columns + key_names))
+
+    stmt = select(*[t.c[name] for name in selected]).where(t.c.user_id == user_id, *criteria)
+    if after:
+        stmt = stmt.where(_after(resource, after))
+    stmt = stmt.order_by(*[t.c[name].desc() if desc else t.c[name] for name, desc in resource.order])
+    if limit:
+        stmt = stmt.limit(limit + 1)
+
+    rows = [dict(zip(selected, row)) for row in db.session.connection().execute(stmt)]
+    next_cursor = None
+    if limit and len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = _encode_cursor({name: rows[-1][name] for name in key_names})
+
+    if "items" in fields and rows:
+        items = _load_items(user_id, [row["id"] for row in rows])
+        for row in rows:
+            row["items"] = items[row["id"]]
+
+    return [{name: _json_value(row[name]) for name in fields} for row in rows], next_cursor
+
+
+def _list(resource: Resource, *criteria):
+    data, next_cursor = _select_rows(
+        resource, _requested_fields(resource), g.api_user_id, *criteria,
+        after=_decode_cursor(resource), limit=_limit(),
+    )
+    return jsonify({"data": data, "next_cursor": next_cursor})
+
+
+def _detail(resource: Resource, record_id: int):
+    data, _ = _select_rows(resource, _requested_fields(resource), g.api_user_id,
+                           resource.table.c.id == record_id)
+    if not data:
+        raise ApiError(404, "not_found", f"No record with id {record_id}.")
+    return jsonify({"data": data[0]})
+
+
+def _create(resource: Resource, create):
+    """Create one record, or a batch from a JSON array, in a single transaction."""
+    payload = request.get_json(silent=True)
+    batch = isinstance(payload, list)
+    records = payload if batch else [payload]
+    if not records or not all(isinstance(record, dict) for record in records):
+        raise ApiError(400, "invalid_body", "Send a JSON object, or an array of objects.")
+    if len(records) > MAX_BATCH:
+        raise ApiError(400, "batch_too_large", f"A batch can hold at most {MAX_BATCH} records.")
+
+    user_id = g.api_user_id
+
+    def create_all() -> list:
+        ids = []
+        for index, record in enumerate(records):
+            try:
+                ids.append(create(user_id, record).id)
+            except services.ValidationError as e:
+                message = f"Record {index}: {e}" if batch else str(e)
+                raise ApiError(400, "validation_error", message)
+        return ids
+
+    try:
+        ids = services.run_in_unit_of_work(create_all)
+    except services.ConflictError as e:
+        raise ApiError(409, "conflict", str(e))
+
+    fields = _requested_fields(resource)
+    data, _ = _select_rows(resource, fields, user_id, resource.table.c.id.in_(ids))
+    by_id = {record["id"]: record for record in data}
+    data = [by_id[record_id] for record_id in ids]
+    return jsonify({"data": data if batch else data[0]}), 201
+
+
+def _branch_criteria(column) -> list:
+    """``?branch_id=`` as a filter: 0 for the main branch, omitted for every branch."""
+    value = request.args.get("branch_id")
+    if not value:
+        return []
+    try:
+        return [read_models.branch_filter(column, int(value))]
+    except ValueError:
+        raise ApiError(400, "invalid_branch", "branch_id must be an integer.")
+
+
+def _date_arg(name: str) -> date:
+    value = request.args.get(name)
+    if not value:
+        return None
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        raise ApiError(400, "invalid_date", f"{name} must be a date (YYYY-MM-DD).")
+
+
+@api.get("/products")
+def list_products():
+    return _list(PRODUCTS)
+
+
+@api.get("/products/<int:product_id>")
+def get_product(product_id: int):
+    return _detail(PRODUCTS, product_id)
+
+
+@api.post("/products")
+def create_products():
+    return _create(PRODUCTS, services.create_product)
+
+
+@api.get("/invoices")
+def list_invoices():
+    t = INVOICES.table
+    start, end = _date_arg("start"), _date_arg("end")
+    criteria = []
+    if start:
+        criteria.append(t.c.invoice_date >= start)
+    if end:
+        criteria.append(t.c.invoice_date <= end)
+    return _list(INVOICES, *criteria, *_branch_criteria(t.c.branch_id))
+
+
+@api.get("/invoices/<int:invoice_id>")
+def get_invoice(invoice_id: int):
+    return _detail(INVOICES, invoice_id)
+
+
+@api.post("/invoices")
+def create_invoices():
+    """Create invoices; with an ``Idempotency-Key`` header a retried request is not billed twice."""
+    key = request.headers.get("Idempotency-Key")
+    if not key:
+        return _create(INVOICES, services.create_invoice)
+    if isinstance(request.get_json(silent=True), list):
+        raise ApiError(400, "invalid_body", "An Idempotency-Key covers one invoice; send a single object.")
+
+    replayed = []
+
+    def create(user_id: str, record: dict):
+        invoice, was_replayed = services.create_invoice_once(user_id, record, key)
+        replayed.append(was_replayed)
+        return invoice
+
+    response, status = _create(INVOICES, create)
+    # The last attempt is the one that committed
+    if replayed[-1]:
+        response.headers["Idempotent-Replayed"] = "true"
+    return response, status
+
+
+@api.post("/invoices/void")
+def void_invoices():
+    """Void many invoices in one transaction: ``{"ids": [1, 2, 3]}``."""
+    payload = request.get_json(silent=True)
+    ids = payload.get("ids") if isinstance(payload, dict) else None
+    if not ids or not isinstance(ids, list) or not all(type(value) is int for value in ids):
+        raise ApiError(400, "invalid_body", 'Send {"ids": [...]} with the invoice ids to void.')
+    if len(ids) > MAX_BATCH:
+        raise ApiError(400, "batch_too_large", f"A batch can hold at most {MAX_BATCH} records.")
+
+    try:
+        voided = services.run_in_unit_of_work(services.void_invoices, g.api_user_id, ids)
+    except services.ConflictError as e:
+        raise ApiError(409, "conflict", str(e))
+    return jsonify({"data": {"voided": voided}})
+
+
+@api.post("/terminals/<terminal_id>/number-blocks")
+def reserve_number_block(terminal_id: str):
+    """Reserve a block of invoice numbers for a terminal to bill with offline: ``{"size": 50}``."""
+    payload = request.get_json(silent=True) or {}
+    size = payload.get("size", services.NUMBER_BLOCK_SIZE) if isinstance(payload, dict) else None
+    if type(size) is not int:
+        raise ApiError(400, "invalid_body", 'Send {"size": n} with the number of invoice numbers to reserve.')
+
+    try:
+        block = services.run_in_unit_of_work(services.reserve_number_block, g.api_user_id, terminal_id, size)
+    except services.ValidationError as e:
+        raise ApiError(400, "validation_error", str(e))
+    except services.ConflictError as e:
+        raise ApiError(409, "conflict", str(e))
+    return jsonify({"data": {
+        "terminal_id": block.terminal_id,
+        "prefix": services.invoice_number_prefix(g.api_user_id),
+        "year": block.year,
+        "first": block.first,
+        "last": block.last,
+    }}), 201
+
+
+@api.post("/sync/invoices")
+def sync_invoices():
+    """Save invoices billed offline: ``{"terminal_id": "...", "branch_id": 0, "invoices": [...]}``.
+
+    Each invoice needs its ``key`` and ``sequence`` (see
+    services.sync_invoices). The whole batch is one transaction; the reply
+    gives each invoice's status in the order sent.
+    """
+    payload = request.get_json(silent=True)
+    invoices = payload.get("invoices") if isinstance(payload, dict) else None
+    if not isinstance(invoices, list) or not all(isinstance(record, dict) for record in invoices):
+        raise ApiError(400, "invalid_body", 'Send {"terminal_id": "...", "invoices": [...]}.')
+    if len(invoices) > MAX_BATCH:
+        raise ApiError(400, "batch_too_large", f"A batch can hold at most {MAX_BATCH} records.")
+
+    try:
+        results = services.run_in_unit_of_work(
+            services.sync_invoices, g.api_user_id, payload.get("terminal_id"), invoices, payload.get("branch_id")
+        )
+    except services.ValidationError as e:
+        raise ApiError(400, "validation_error", str(e))
+    except services.ConflictError as e:
+        raise ApiError(409, "conflict", str(e))
+    return jsonify({"data": [result._asdict() for result in results]})
+
+
+@api.get("/expenses")
+def list_expenses():
+    t = EXPENSES.table
+    start, end = _date_arg("start"), _date_arg("end")
+    criteria = []
+    if start:
+        criteria.append(t.c.date >= start)
+    if end:
+        criteria.append(t.c.date <= end)
+    return _list(EXPENSES, *criteria, *_branch_criteria(t.c.branch_id))
+
+
+@api.post("/expenses")
+def create_expenses():
+    days = []
+
+    def create(user_id: str, record: dict):
+        expense = services.create_expense(user_id, record)
+        days.append(expense.date)
+        return expense
+
+    response = _create(EXPENSES, create)
+    services.invalidate_expense_rollups(g.api_user_id, days)
+    return response
+
+
+@api.get("/analytics/sales")
+def sales_analytics():
+    """Top products and the hourly heatmap for ``?month=YYYY-MM``."""
+    month = request.args.get("month") or datetime.now(services.IST).strftime("%Y-%m")
+    try:
+        year, month_number = map(int, month.split("-"))
+        date(year, month_number, 1)
+    except ValueError:
+        raise ApiError(400, "invalid_month", "month must be a month (YYYY-MM).")
+    try:
+        top_n = int(request.args.get("limit", analytics.TOP_N))
+    except ValueError:
+        raise ApiError(400, "invalid_limit", "limit must be an integer.")
+
+    result = analytics.sales_analytics(g.api_user_id, year, month_number, top_n)
+    data = result._asdict()
+    for key in ("top_by_revenue", "top_by_quantity", "top_by_margin"):
+        data[key] = [row._asdict() for row in data[key]]
+    data["weekdays"] = list(analytics.WEEKDAYS)
+    return jsonify({"data": data})
+
+
+@api.get("/branches")
+def list_branches():
+    """The store's branches; the main branch is ``branch_id`` 0 in filters and null on records."""
+    return jsonify({"data": [
+        {"id": branch.id, "name": branch.name, "address": branch.address or ""}
+        for branch in branches.list_branches(g.api_user_id)
+    ]})
+
+
+@api.get("/reports/branches")
+def branch_report():
+    """Sales and expenses per branch for ``?start=&end=`` (inclusive; default this month)."""
+    today = datetime.now(services.IST).date()
+    start = _date_arg("start") or today.replace(day=1)
+    end = _date_arg("end") or today
+    totals = branches.consolidated_totals(g.api_user_id, start, end + timedelta(days=1))
+    return jsonify({"data": [row._asdict() for row in totals]})
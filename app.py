@@ -14,6 +14,7 @@ THANK YOU
 import os
 from datetime import datetime, date, timezone, timedelta
 import json
+import secrets
 
 IST = timezone(timedelta(hours=5, minutes=30))
 
@@ -22,13 +23,17 @@ def now_ist():
     return datetime.now(IST)
 from pathlib import Path
 import csv
-from io import StringIO, BytesIO
+from io import StringIO, BytesIO, TextIOWrapper
+from urllib.parse import urlparse
 
 from functools import wraps
+from itertools import chain
 from werkzeug.utils import secure_filename
 from dotenv import load_dotenv
+from flask_migrate import Migrate
+from sqlalchemy.orm import selectinload
 
-from flask import Flask, render_template, request, redirect, url_for, flash, make_response, session, send_file
+from flask import Flask, render_template, request, redirect, url_for, flash, make_response, session, send_file, Response, stream_with_context
 import firebase_admin
 from firebase_admin import credentials, auth
 
@@ -36,8 +41,25 @@ from firebase_admin import credentials, auth
 load_dotenv()
 
 # Database ke liye 
-from models import db, User, StoreSettings, Product, Supplier, Invoice, InvoiceItem, Expense, StockTransaction
+from models import db, User, ApiToken, StoreSettings, Product, Supplier, Invoice, InvoiceItem, Expense, StockTransaction, PurchaseOrder, GoodsReceipt
 from config import config
+import read_models
+import inventory
+import purchasing
+import labels
+import pdf_invoice
+import gst
+import expense_import
+import branches
+import services
+import archival
+import analytics
+import reorder
+import assets
+import compression
+import cache
+from api import api, create_token
+from services import month_range, expense_rollups, invalidate_expense_rollups, EXPENSES_PER_PAGE
 
 app = Flask(__name__)
 
@@ -46,6 +68,11 @@ env = os.environ.get('FLASK_ENV', 'development')
 app.config.from_object(config[env])
 
 db.init_app(app)
+migrate = Migrate(app, db, render_as_batch=True)
+app.register_blueprint(api)
+assets.init_app(app)
+compression.init_app(app)
+cache.init_app(app)
 
 
 try:
@@ -128,201 +155,38 @@ def get_current_user_id():
     return session.get("user_id", "default_user")
 
 
-def get_or_create_user(user_id: str, email: str = None) -> User:
-    """Get existing user or create new one."""
-    user = User.query.get(user_id)
-    if not user:
-        user = User(id=user_id, email=email or f"{user_id}@example.com")
-        db.session.add(user)
-        db.session.commit()
-    return user
+def get_current_branch_id():
+    """The branch the current session bills at; None for the main branch."""
+    return session.get("branch_id")
 
 
+def local_redirect_target(target, fallback: str) -> str:
+    """``target`` if it is a path on this site, else ``fallback`` (no open redirects)."""
+    # Browsers read "/\host" as "//host" and drop tabs and newlines in URLs
+    if not target or "\\" in target or any(ord(char) < 32 for char in target):
+        return fallback
+    parsed = urlparse(target)
+    if parsed.scheme or parsed.netloc or not target.startswith("/") or target.startswith("//"):
+        return fallback
+    return target
+
 
 def get_store_settings() -> dict:
-    """Get store settings for current user."""
-    user_id = get_current_user_id()
-    user = get_or_create_user(user_id)
-    
-    settings = StoreSettings.query.filter_by(user_id=user_id).first()
-    
-    if not settings:
-        settings = StoreSettings(
-            user_id=user_id,
-            store_name="Managekarlo",
-            address="",
-            phone="",
-            email="",
-        )
-        db.session.add(settings)
-        db.session.commit()
-    
+    """Store settings of the current user, as shown in templates."""
+    profile = services.store_profile(get_current_user_id())
     return {
-        "store_name": settings.store_name or "Managekarlo",
-        "address": settings.address or "",
-        "phone": settings.phone or "",
-        "email": settings.email or "",
-        "logo_url": url_for("get_store_logo") if settings.logo_data else "",
+        "store_name": profile["store_name"],
+        "address": profile["address"],
+        "phone": profile["phone"],
+        "email": profile["email"],
+        "logo_url": url_for("get_store_logo") if profile["has_logo"] else "",
+        "gstin": profile["gstin"],
     }
 
 
-def save_store_settings(data: dict, logo_file=None) -> None:
-    """Save store settings for current user."""
-    user_id = get_current_user_id()
-    user = get_or_create_user(user_id)
-    
-    settings = StoreSettings.query.filter_by(user_id=user_id).first()
-    
-    if not settings:
-        settings = StoreSettings(user_id=user_id)
-        db.session.add(settings)
-    
-    settings.store_name = data.get("store_name", "Managekarlo")
-    settings.address = data.get("address", "")
-    settings.phone = data.get("phone", "")
-    settings.email = data.get("email", "")
-    
-    
-    if logo_file and logo_file.filename:
-        settings.logo_data = logo_file.read()
-        settings.logo_filename = secure_filename(logo_file.filename)
-        settings.logo_mimetype = logo_file.mimetype
-    
-    db.session.commit()
-
-
-def generate_invoice_number() -> str:
-    """Generate globally unique invoice number: RS-<user_hash>-<year>-0001 style.
-    
-    Uses a 4-char hash of user_id to ensure uniqueness across all users.
-    Includes retry logic as a safety net.
-    """
-    import hashlib
-    
-    user_id = get_current_user_id()
-    settings = StoreSettings.query.filter_by(user_id=user_id).first()
-    
-    if not settings:
-        user = get_or_create_user(user_id)
-        settings = StoreSettings(user_id=user_id, store_name="Managekarlo")
-        db.session.add(settings)
-    
-    # Create a short unique hash from user_id (4 uppercase chars)
-    user_hash = hashlib.md5(user_id.encode()).hexdigest()[:4].upper()
-    year = now_ist().year
-    
-    # Retry logic in case of any edge conflicts
-    max_retries = 10
-    for attempt in range(max_retries):
-        settings.invoice_counter += 1
-        invoice_number = f"RS-{user_hash}-{year}-{settings.invoice_counter:04d}"
-        
-        # Check if this invoice number already exists
-        from models import Invoice
-        existing = Invoice.query.filter_by(invoice_number=invoice_number).first()
-        if not existing:
-            db.session.commit()
-            return invoice_number
-    
-    # Fallback: use timestamp to guarantee uniqueness
-    import time
-    settings.invoice_counter += 1
-    db.session.commit()
-    timestamp = int(time.time())
-    return f"RS-{user_hash}-{year}-{timestamp}"
-
-
-
-
-def get_products() -> list:
-    """Get all products for current user."""
-    user_id = get_current_user_id()
-    products = Product.query.filter_by(user_id=user_id).all()
-    return products
-
-
-def find_product(product_id: int) -> Product:
-    """Find product by ID for current user."""
-    user_id = get_current_user_id()
-    return Product.query.filter_by(id=product_id, user_id=user_id).first()
-
-
-def create_product(data: dict) -> Product:
-    """Create a new product."""
-    user_id = get_current_user_id()
-    user = get_or_create_user(user_id)
-    
-    sku = data.get("sku", "").strip() or f"SKU-{int(now_ist().timestamp())}"
-    barcode = data.get("barcode", "").strip() or sku
-    
-    product = Product(
-        user_id=user_id,
-        name=data.get("name", "").strip(),
-        description=data.get("description", "").strip(),
-        sku=sku,
-        barcode=barcode,
-        category=data.get("category", "").strip(),
-        brand=data.get("brand", "").strip(),
-        unit_price=float(data.get("unit_price") or 0),
-        cost_price=float(data.get("cost_price") or 0),
-        stock_quantity=float(data.get("stock_quantity") or 0),
-        min_stock_level=float(data.get("min_stock_level") or 0),
-        supplier_id=int(data.get("supplier_id")) if data.get("supplier_id") else None,
-    )
-    
-    db.session.add(product)
-    db.session.commit()
-    
-    return product
-
-
-def update_product(product: Product, data: dict) -> None:
-    """Update an existing product."""
-    sku = (data.get("sku", "") or "").strip() or product.sku or f"SKU-{product.id}"
-    barcode = (data.get("barcode", "") or "").strip() or product.barcode or sku
-    
-    product.name = data.get("name", "").strip()
-    product.description = data.get("description", "").strip()
-    product.sku = sku
-    product.barcode = barcode
-    product.category = data.get("category", "").strip()
-    product.brand = data.get("brand", "").strip()
-    product.unit_price = float(data.get("unit_price") or 0)
-    product.cost_price = float(data.get("cost_price") or 0)
-    product.stock_quantity = float(data.get("stock_quantity") or 0)
-    product.min_stock_level = float(data.get("min_stock_level") or 0)
-    product.supplier_id = int(data.get("supplier_id")) if data.get("supplier_id") else None
-    
-    db.session.commit()
-
-
-def record_stock_transaction(product_id: int, tx_type: str, quantity: float, reference_id: str = "", notes: str = "") -> None:
-    """Record a stock transaction."""
-    user_id = get_current_user_id()
-    
-    transaction = StockTransaction(
-        user_id=user_id,
-        product_id=product_id,
-        transaction_type=tx_type,
-        quantity=float(quantity or 0),
-        reference_id=reference_id,
-        notes=notes,
-    )
-    
-    db.session.add(transaction)
-    db.session.commit()
-
-
-def adjust_stock(product_id: int, delta: float, tx_type: str, reference_id: str = "", notes: str = "") -> None:
-    """Adjust product stock and record transaction."""
-    product = find_product(product_id)
-    if not product:
-        return
-    
-    product.stock_quantity += float(delta or 0)
-    record_stock_transaction(product_id, tx_type, delta, reference_id, notes)
-    db.session.commit()
-
+def get_invoice_layout(user_id: str):
+    """Compiled PDF layout for a user's store, rebuilt only when the settings change."""
+    return pdf_invoice.get_layout(services.get_store_settings(user_id))
 
 
 @app.route("/login", methods=["GET", "POST"])
@@ -336,9 +200,8 @@ def login():
                 user_id = decoded_token['uid']
                 email = decoded_token.get('email', '')
                 
-                user = get_or_create_user(user_id, email)
-                user.last_login = now_ist()
-                db.session.commit()
+                with services.unit_of_work():
+                    services.record_login(user_id, email)
                 
                 session["logged_in"] = True
                 session["user_id"] = user_id
@@ -399,19 +262,14 @@ def invoice_list():
     search_date = (request.args.get("date") or "").strip()
     
 
-    query = Invoice.query.filter_by(user_id=user_id)
-    
-    if search_phone:
-        query = query.filter(Invoice.customer_phone.contains(search_phone))
-    
+    date_obj = None
     if search_date:
         try:
             date_obj = datetime.strptime(search_date, "%Y-%m-%d").date()
-            query = query.filter(Invoice.invoice_date == date_obj)
         except ValueError:
             pass
     
-    invoices = query.order_by(Invoice.created_at.desc()).all()
+    invoices = read_models.list_invoices(user_id, phone=search_phone, on_date=date_obj)
     
     return render_template(
         "invoice_list.html",
@@ -419,20 +277,24 @@ def invoice_list():
         invoices=invoices,
         search_phone=search_phone,
         search_date=search_date,
+        archived_years=archival.archived_years(user_id),
+        year_label=archival.year_label,
     )
 
 
 @app.route("/invoices/export")
 @login_required
 def export_invoices():
-    """Export all invoices as a CSV file."""
+    """Export all invoices as a CSV file; ?archived=1 adds the archived years."""
     user_id = get_current_user_id()
-    invoices = Invoice.query.filter_by(user_id=user_id).order_by(Invoice.created_at.desc()).all()
+    invoices = read_models.list_invoices(user_id)
+    if request.args.get("archived"):
+        invoices += archival.invoice_rows(user_id)
     
     output = StringIO()
     writer = csv.writer(output)
     
-    writer.writerow(["Invoice #", "Date & time", "Invoice date", "Customer", "Phone", "Total", "Payment mode"])
+    writer.writerow(["Invoice #", "Date & time", "Invoice date", "Customer", "Phone", "Total", "Payment mode", "Status"])
     for inv in invoices:
         writer.writerow([
             inv.invoice_number,
@@ -442,6 +304,7 @@ def export_invoices():
             inv.customer_phone or "-",
             f"{inv.total:.2f}",
             inv.payment_mode or "-",
+            inv.status,
         ])
     
     csv_data = output.getvalue()
@@ -453,6 +316,12 @@ def export_invoices():
     return response
 
 
+INVOICE_FORM_FIELDS = (
+    "invoice_date", "customer_name", "customer_phone", "customer_address", "customer_gstin",
+    "discount", "payment_mode", "payment_reference", "notes",
+)
+
+
 @app.route("/invoice/new", methods=["GET", "POST"])
 @login_required
 #INVOICE 
@@ -462,99 +331,65 @@ def new_invoice():
     if request.method == "POST":
         user_id = get_current_user_id()
         form = request.form
-        now = now_ist()
-        invoice_date_str = form.get("invoice_date") or now.strftime("%Y-%m-%d")
-        invoice_date = datetime.strptime(invoice_date_str, "%Y-%m-%d").date()
-        invoice_number = generate_invoice_number()
         
         # Line items (arrays)
         descriptions = form.getlist("item_description[]")
         quantities = form.getlist("item_quantity[]")
         unit_prices = form.getlist("item_unit_price[]")
         product_ids = form.getlist("item_product_id[]")
+        gst_rates = form.getlist("item_gst_rate[]")
         
-        items = []
-        subtotal = 0.0
-        
-        for desc, qty_str, price_str, product_id in zip(descriptions, quantities, unit_prices, product_ids):
-            if not desc.strip():
-                continue
-            try:
-                qty = float(qty_str or 0)
-                price = float(price_str or 0)
-            except ValueError:
-                qty = 0.0
-                price = 0.0
-            line_total = qty * price
-            subtotal += line_total
-            
-            item = InvoiceItem(
-                description=desc.strip(),
-                quantity=qty,
-                unit_price=price,
-                line_total=line_total,
-                product_id=int(product_id) if product_id else None,
-            )
-            items.append(item)
+        items = [
+            {
+                "description": desc,
+                "quantity": qty,
+                "unit_price": price,
+                "product_id": product_id,
+                "gst_rate": gst_rates[index] if index < len(gst_rates) else 0,
+            }
+            for index, (desc, qty, price, product_id) in enumerate(zip(descriptions, quantities, unit_prices, product_ids))
+        ]
+        data = {field: form.get(field, "") for field in INVOICE_FORM_FIELDS}
+        data["items"] = items
+        data["branch_id"] = get_current_branch_id()
         
+        # A resubmitted form carries the same key and gets the invoice it already created
+        key = form.get("idempotency_key")
         try:
-            discount = float(form.get("discount") or 0)
-        except ValueError:
-            discount = 0.0
-        try:
-            tax = float(form.get("tax") or 0)
-        except ValueError:
-            tax = 0.0
-        
-        total = subtotal - discount + tax
-        
-        # New invoice ke liye
-        invoice = Invoice(
-            user_id=user_id,
-            invoice_number=invoice_number,
-            invoice_date=invoice_date,
-            customer_name=form.get("customer_name", "").strip(),
-            customer_phone=form.get("customer_phone", "").strip(),
-            customer_address=form.get("customer_address", "").strip(),
-            customer_gstin=form.get("customer_gstin", "").strip(),
-            subtotal=subtotal,
-            discount=discount,
-            tax=tax,
-            total=total,
-            payment_mode=form.get("payment_mode"),
-            payment_reference=form.get("payment_reference", "").strip(),
-            notes=form.get("notes", "").strip(),
-        )
-        
-        db.session.add(invoice)
-        db.session.flush()  
-        
-        
-        for item in items:
-            item.invoice_id = invoice.id
-            db.session.add(item)
-        
-        db.session.commit()
-        
-
-        for item in items:
-            if item.product_id and item.quantity > 0:
-                adjust_stock(
-                    item.product_id,
-                    -item.quantity,
-                    "sale",
-                    reference_id=str(invoice.id),
-                    notes=f"Invoice {invoice_number}"
-                )
+            if key:
+                invoice, replayed = services.run_in_unit_of_work(services.create_invoice_once, user_id, data, key)
+            else:
+                invoice, replayed = services.run_in_unit_of_work(services.create_invoice, user_id, data), False
+        except (services.ValidationError, services.ConflictError) as e:
+            flash(str(e), "error")
+            return redirect(url_for("new_invoice"))
         
-        flash("Invoice created successfully.", "success")
+        if replayed:
+            flash(f"Invoice {invoice.invoice_number} was already saved; it was not created again.", "info")
+        else:
+            flash("Invoice created successfully.", "success")
         return redirect(url_for("invoice_view", invoice_id=invoice.id))
     
     today = now_ist().strftime("%Y-%m-%d")
-    products = get_products()
+    products = Product.query.filter_by(user_id=get_current_user_id()).all()
     # Convert products to dictionaries for JSON serialization in template
     products_data = [p.to_dict() for p in products]
-    return render_template("new_invoice.html", store=store, today=today, products=products_data)
+    return render_template(
+        "new_invoice.html", store=store, today=today, products=products_data,
+        idempotency_key=secrets.token_urlsafe(24),
+        number_prefix=services.invoice_number_prefix(get_current_user_id()),
+        branch_id=get_current_branch_id() or branches.MAIN_BRANCH,
+        rendered_at=datetime.utcnow().isoformat(),
+    )
+
+
+@app.route("/billing-sw.js")
+def billing_service_worker():
+    """The billing page's service worker, served from the root so it may control /invoice/."""
+    response = app.send_static_file("js/billing_sw.js")
+    # Browsers check for a new worker on every visit; it must not sit in a cache
+    response.headers["Cache-Control"] = "no-cache"
+    return response
 
 
 @app.route("/invoice/<int:invoice_id>")
@@ -562,29 +397,72 @@ def new_invoice():
 def invoice_view(invoice_id: int):
     store = get_store_settings()
     user_id = get_current_user_id()
-    invoice = Invoice.query.filter_by(id=invoice_id, user_id=user_id).first()
+    invoice = Invoice.query.options(
+        selectinload(Invoice.items), selectinload(Invoice.tax_summaries)
+    ).filter_by(id=invoice_id, user_id=user_id).first()
+    archived = False
+    if not invoice:
+        invoice = archival.find_invoice(user_id, invoice_id)
+        archived = invoice is not None
     
     if not invoice:
         flash("Invoice not found.", "error")
         return redirect(url_for("invoice_list"))
     
-    return render_template("invoice_view.html", store=store, invoice=invoice)
+    return render_template("invoice_view.html", store=store, invoice=invoice, archived=archived)
 
 
 @app.route("/invoice/<int:invoice_id>/delete", methods=["POST"])
 @login_required
 def delete_invoice(invoice_id: int):
     """Delete a single invoice by id."""
-    user_id = get_current_user_id()
-    invoice = Invoice.query.filter_by(id=invoice_id, user_id=user_id).first()
+    try:
+        deleted = services.run_in_unit_of_work(services.delete_invoice, get_current_user_id(), invoice_id)
+    except services.ConflictError as e:
+        flash(str(e), "error")
+        return redirect(url_for("invoice_view", invoice_id=invoice_id))
     
-    if not invoice:
+    if deleted:
+        flash("Invoice deleted successfully.", "success")
+    else:
         flash("Invoice not found.", "error")
+    
+    return redirect(url_for("invoice_list"))
+
+
+@app.route("/invoice/<int:invoice_id>/void", methods=["POST"])
+@login_required
+def void_invoice(invoice_id: int):
+    """Void an invoice; its items go back into stock."""
+    try:
+        voided = services.run_in_unit_of_work(services.void_invoices, get_current_user_id(), [invoice_id])
+    except services.ConflictError as e:
+        flash(str(e), "error")
+        return redirect(url_for("invoice_view", invoice_id=invoice_id))
+    
+    if voided:
+        flash("Invoice voided. Its items are back in stock.", "success")
     else:
-        db.session.delete(invoice)
-        db.session.commit()
-        flash("Invoice deleted successfully.", "success")
+        flash("Invoice not found or already void.", "error")
     
+    return redirect(url_for("invoice_view", invoice_id=invoice_id))
+
+
+@app.route("/invoices/void", methods=["POST"])
+@login_required
+def void_invoices():
+    """Void the invoices ticked on the list in one operation."""
+    ids = [int(value) for value in request.form.getlist("ids") if value.isdigit()]
+    if not ids:
+        flash("Select at least one invoice to void.", "error")
+        return redirect(url_for("invoice_list"))
+    
+    try:
+        voided = services.run_in_unit_of_work(services.void_invoices, get_current_user_id(), ids)
+    except services.ConflictError as e:
+        flash(str(e), "error")
+        return redirect(url_for("invoice_list"))
+    flash(f"Voided {len(voided)} invoice(s). Their items are back in stock.", "success")
     return redirect(url_for("invoice_list"))
 
 
@@ -592,27 +470,17 @@ def delete_invoice(invoice_id: int):
 @login_required
 def convert_credit_to_cash(invoice_id: int):
     """Convert an invoice payment mode from CREDIT to CASH."""
-    user_id = get_current_user_id()
-    invoice = Invoice.query.filter_by(id=invoice_id, user_id=user_id).first()
+    try:
+        with services.unit_of_work():
+            invoice = services.convert_credit_to_cash(get_current_user_id(), invoice_id)
+    except services.ValidationError as e:
+        flash(str(e), "error")
+        return redirect(url_for("invoice_view", invoice_id=invoice_id))
     
     if not invoice:
         flash("Invoice not found.", "error")
         return redirect(url_for("invoice_list"))
     
-    if (invoice.payment_mode or "").upper() != "CREDIT":
-        flash("Invoice is not in CREDIT payment mode.", "error")
-        return redirect(url_for("invoice_view", invoice_id=invoice_id))
-    
-    invoice.payment_mode = "CASH"
-    
-    timestamp = now_ist().strftime("%Y-%m-%d %H:%M:%S")
-    conversion_note = f"[Converted from CREDIT to CASH on {timestamp}]"
-    if invoice.notes:
-        invoice.notes = invoice.notes + "\n" + conversion_note
-    else:
-        invoice.notes = conversion_note
-    
-    db.session.commit()
     flash("Invoice payment changed from CREDIT to CASH.", "success")
     
     return redirect(url_for("invoice_view", invoice_id=invoice_id))
@@ -623,16 +491,105 @@ def convert_credit_to_cash(invoice_id: int):
 def download_invoice(invoice_id: int):
     store = get_store_settings()
     user_id = get_current_user_id()
-    invoice = Invoice.query.filter_by(id=invoice_id, user_id=user_id).first()
+    invoice = Invoice.query.options(selectinload(Invoice.items)).filter_by(id=invoice_id, user_id=user_id).first()
+    archived = False
+    if not invoice:
+        invoice = archival.find_invoice(user_id, invoice_id)
+        archived = invoice is not None
     
     if not invoice:
         flash("Invoice not found.", "error")
         return redirect(url_for("invoice_list"))
     
-    html = render_template("invoice_view.html", store=store, invoice=invoice)
-    response = make_response(html)
-    filename = f"invoice-{invoice.invoice_number}.html"
-    response.headers["Content-Type"] = "text/html; charset=utf-8"
+    if request.args.get("format") == "html":
+        html = render_template("invoice_view.html", store=store, invoice=invoice, archived=archived)
+        response = make_response(html)
+        filename = f"invoice-{invoice.invoice_number}.html"
+        response.headers["Content-Type"] = "text/html; charset=utf-8"
+        response.headers["Content-Disposition"] = f"attachment; filename={filename}"
+        return response
+    
+    document = read_models.invoice_document(invoice)
+    pdf = pdf_invoice.render_invoice_pdf(get_invoice_layout(user_id), document)
+    response = make_response(pdf)
+    response.headers["Content-Type"] = "application/pdf"
+    response.headers["Content-Disposition"] = f"attachment; filename={pdf_invoice.pdf_filename(document)}"
+    return response
+
+
+@app.route("/invoices/download")
+@login_required
+def download_invoices_month():
+    """All invoices of a month as one combined PDF; format=zip hands over to the archive export."""
+    user_id = get_current_user_id()
+    
+    try:
+        year, month = map(int, (request.args.get("month") or "").split("-"))
+        start, end = month_range(year, month)
+    except ValueError:
+        flash("Choose a month to download.", "error")
+        return redirect(url_for("reports", period="monthly"))
+    
+    if request.args.get("format") == "zip":
+        return redirect(url_for(
+            "invoice_archive",
+            start=start.isoformat(),
+            end=(end - timedelta(days=1)).isoformat(),
+        ))
+    
+    layout = get_invoice_layout(user_id)
+    documents = chain(
+        read_models.iter_invoice_documents(user_id, start, end),
+        archival.iter_invoice_documents(user_id, start, end),
+    )
+    response = make_response(pdf_invoice.render_combined_pdf(layout, documents))
+    response.headers["Content-Type"] = "application/pdf"
+    response.headers["Content-Disposition"] = f"attachment; filename=invoices-{year}-{month:02d}.pdf"
+    return response
+
+
+@app.route("/invoices/archive")
+@login_required
+def invoice_archive():
+    """Stream a ZIP of every invoice dated between start and end (inclusive).
+    
+    Invoices are read in keyset batches and PDFs are rendered in worker
+    processes; each entry is sent as soon as it is ready, so the download
+    starts immediately and memory use does not grow with the range.
+    """
+    store = get_store_settings()
+    user_id = get_current_user_id()
+    
+    try:
+        start = datetime.strptime(request.args.get("start") or "", "%Y-%m-%d").date()
+        end = datetime.strptime(request.args.get("end") or "", "%Y-%m-%d").date()
+    except ValueError:
+        flash("Choose a start and end date for the archive.", "error")
+        return redirect(url_for("reports"))
+    
+    if end < start:
+        flash("End date must not be before the start date.", "error")
+        return redirect(url_for("reports"))
+    
+    fmt = "html" if request.args.get("format") == "html" else "pdf"
+    documents = chain(
+        read_models.iter_invoice_documents(user_id, start, end + timedelta(days=1)),
+        archival.iter_invoice_documents(user_id, start, end + timedelta(days=1)),
+    )
+    
+    if fmt == "pdf":
+        entries = pdf_invoice.iter_rendered(
+            get_invoice_layout(user_id), documents, workers=app.config["PDF_WORKERS"]
+        )
+    else:
+        entries = (
+            (f"invoice-{doc.invoice_number}.html",
+             render_template("invoice_view.html", store=store, invoice=doc).encode("utf-8"))
+            for doc in documents
+        )
+    
+    filename = f"invoices-{start.isoformat()}-to-{end.isoformat()}-{fmt}.zip"
+    response = Response(stream_with_context(pdf_invoice.stream_zip(entries)), mimetype="application/zip")
     response.headers["Content-Disposition"] = f"attachment; filename={filename}"
     return response
 
@@ -644,34 +601,112 @@ def expenses():
     user_id = get_current_user_id()
     
     if request.method == "POST":
-        form = request.form
-        date_str = form.get("date") or now_ist().strftime("%Y-%m-%d")
-        expense_date = datetime.strptime(date_str, "%Y-%m-%d").date()
-        
-        expense = Expense(
-            user_id=user_id,
-            date=expense_date,
-            description=form.get("description", "").strip(),
-            category=form.get("category", "").strip(),
-            amount=float(form.get("amount") or 0),
-        )
-        
-        db.session.add(expense)
-        db.session.commit()
+        try:
+            with services.unit_of_work():
+                expense = services.create_expense(
+                    user_id, dict(request.form.items(), branch_id=get_current_branch_id())
+                )
+        except services.ValidationError as e:
+            flash(str(e), "error")
+            return redirect(url_for("expenses"))
+        invalidate_expense_rollups(user_id, [expense.date])
         flash("Expense recorded.", "success")
         return redirect(url_for("expenses"))
     
-    all_expenses = Expense.query.filter_by(user_id=user_id).order_by(Expense.date.desc()).all()
+    start_str = request.args.get("start", "")
+    end_str = request.args.get("end", "")
+    try:
+        start = datetime.strptime(start_str, "%Y-%m-%d").date() if start_str else None
+        end = datetime.strptime(end_str, "%Y-%m-%d").date() if end_str else None
+    except ValueError:
+        flash("Invalid date filter.", "error")
+        return redirect(url_for("expenses"))
+    
+    # "after" is the (date, id) of the last row on the previous page, as "YYYY-MM-DD.id"
+    after = None
+    after_str = request.args.get("after", "")
+    if after_str:
+        try:
+            after_date, after_id = after_str.split(".")
+            after = (datetime.strptime(after_date, "%Y-%m-%d").date(), int(after_id))
+        except ValueError:
+            after = None
+    
+    # The "To" date is inclusive on the form
+    end_exclusive = end + timedelta(days=1) if end else None
+    page, next_key = read_models.expenses_page(
+        user_id, start=start, end=end_exclusive, after=after, limit=EXPENSES_PER_PAGE
+    )
+    next_after = f"{next_key[0].isoformat()}.{next_key[1]}" if next_key else ""
+    
+    rollups = expense_rollups(user_id, start, end_exclusive)
     today = now_ist().strftime("%Y-%m-%d")
-    return render_template("expenses.html", store=store, expenses=all_expenses, today=today)
+    return render_template(
+        "expenses.html",
+        store=store,
+        expenses=page,
+        today=today,
+        start=start_str,
+        end=end_str,
+        paged=bool(after),
+        next_after=next_after,
+        rollups=rollups,
+    )
+
+
+@app.route("/expenses/import", methods=["GET", "POST"])
+@login_required
+def import_expenses():
+    """Bulk-import expenses from a CSV or bank statement export."""
+    store = get_store_settings()
+    user_id = get_current_user_id()
+    form = request.form
+    mapping = expense_import.ColumnMapping(
+        date=form.get("date_column", "Date").strip(),
+        description=form.get("description_column", "Description").strip(),
+        amount=form.get("amount_column", "Amount").strip(),
+        category=form.get("category_column", "").strip(),
+        default_category=form.get("default_category", "").strip(),
+        date_format=form.get("date_format", "").strip(),
+    )
+    result = None
+    
+    if request.method == "POST":
+        upload = request.files.get("file")
+        if not upload or not upload.filename:
+            flash("Choose a CSV file to import.", "error")
+            return render_template("expense_import.html", store=store, mapping=mapping, result=None, dry_run=True)
+        
+        dry_run = bool(form.get("dry_run"))
+        # Decoded on the fly; the upload is never read into memory as a whole
+        lines = TextIOWrapper(upload.stream, encoding="utf-8-sig", errors="replace", newline="")
+        try:
+            result = expense_import.import_expenses(user_id, lines, mapping, dry_run=dry_run)
+        except expense_import.ExpenseImportError as e:
+            flash(str(e), "error")
+            return render_template("expense_import.html", store=store, mapping=mapping, result=None, dry_run=dry_run)
+        
+        if not dry_run:
+            invalidate_expense_rollups(user_id, [date(year, month, 1) for year, month in result.months])
+            flash(f"Imported {result.inserted} expense(s); {result.duplicates} duplicate(s) skipped.", "success")
+        return render_template("expense_import.html", store=store, mapping=mapping, result=result, dry_run=dry_run)
+    
+    return render_template("expense_import.html", store=store, mapping=mapping, result=None, dry_run=True)
 
 
 @app.route("/expenses/export")
 @login_required
 def export_expenses():
-    """Export all expenses as a CSV file."""
+    """Export expenses as a CSV file, optionally limited to a date range."""
     user_id = get_current_user_id()
-    all_expenses = Expense.query.filter_by(user_id=user_id).order_by(Expense.date.desc()).all()
+    try:
+        start = datetime.strptime(request.args["start"], "%Y-%m-%d").date() if request.args.get("start") else None
+        end = datetime.strptime(request.args["end"], "%Y-%m-%d").date() if request.args.get("end") else None
+    except ValueError:
+        start = end = None
+    all_expenses = read_models.list_expenses(
+        user_id, start=start, end=end + timedelta(days=1) if end else None
+    )
     
     output = StringIO()
     writer = csv.writer(output)
@@ -694,6 +729,12 @@ def export_expenses():
     return response
 
 
+def invoices_between(user_id: str, start: date, end: date, branch: int = None) -> list:
+    """Active invoices of a period, of one branch or all, including any in archived financial years."""
+    return (read_models.invoices_between(user_id, start, end, branch)
+            + archival.invoices_between(user_id, start, end, branch))
+
+
 @app.route("/reports")
 @login_required
 def reports():
@@ -706,6 +747,7 @@ def reports():
     period = request.args.get("period") or "daily"
     selected_date = request.args.get("date") or today_str
     selected_month = request.args.get("month") or current_month_str
+    branch = branches.parse_selection(request.args.get("branch"))
     
     if period == "monthly":
         try:
@@ -714,17 +756,9 @@ def reports():
             year, month = now_ist().year, now_ist().month
         
         # AI Generated part of code
-        from sqlalchemy import extract
-        invoices = Invoice.query.filter_by(user_id=user_id).filter(
-            extract('year', Invoice.invoice_date) == year,
-            extract('month', Invoice.invoice_date) == month
-        ).all()
-        
-        
-        expenses_data = Expense.query.filter_by(user_id=user_id).filter(
-            extract('year', Expense.date) == year,
-            extract('month', Expense.date) == month
-        ).all()
+        start, end = month_range(year, month)
+        invoices = invoices_between(user_id, start, end, branch)
+        expenses_data = read_models.expenses_between(user_id, start, end, branch)
         
         label = f"{year}-{month:02d} (Monthly)"
     else:
@@ -735,8 +769,9 @@ def reports():
             date_obj = date.today()
             selected_date = date_obj.strftime("%Y-%m-%d")
         
-        invoices = Invoice.query.filter_by(user_id=user_id, invoice_date=date_obj).all()
-        expenses_data = Expense.query.filter_by(user_id=user_id, date=date_obj).all()
+        start, end = date_obj, date_obj + timedelta(days=1)
+        invoices = invoices_between(user_id, start, end, branch)
+        expenses_data = read_models.expenses_between(user_id, start, end, branch)
         label = f"{selected_date} (Daily)"
     
     sales_total = sum(inv.total for inv in invoices)
@@ -778,6 +813,10 @@ def reports():
         "ai_summary": ai_summary,
     }
     
+    # Every branch side by side, from one grouped query per table
+    branch_list = branches.list_branches(user_id)
+    branch_totals = branches.consolidated_totals(user_id, start, end) if branch_list else []
+    
     return render_template(
         "reports.html",
         store=store,
@@ -785,6 +824,11 @@ def reports():
         period=period,
         selected_date=selected_date,
         selected_month=selected_month,
+        branches=branch_list,
+        branch=branch,
+        branch_totals=branch_totals,
+        main_branch_id=branches.MAIN_BRANCH,
+        main_branch_name=branches.MAIN_BRANCH_NAME,
     )
 
 
@@ -801,6 +845,7 @@ def export_report():
     period = request.args.get("period") or "daily"
     selected_date = request.args.get("date") or today_str
     selected_month = request.args.get("month") or current_month_str
+    branch = branches.parse_selection(request.args.get("branch"))
     
     if period == "monthly":
         try:
@@ -808,16 +853,9 @@ def export_report():
         except ValueError:
             year, month = now_ist().year, now_ist().month
         
-        from sqlalchemy import extract
-        invoices = Invoice.query.filter_by(user_id=user_id).filter(
-            extract('year', Invoice.invoice_date) == year,
-            extract('month', Invoice.invoice_date) == month
-        ).all()
-        
-        expenses_data = Expense.query.filter_by(user_id=user_id).filter(
-            extract('year', Expense.date) == year,
-            extract('month', Expense.date) == month
-        ).all()
+        start, end = month_range(year, month)
+        invoices = invoices_between(user_id, start, end, branch)
+        expenses_data = read_models.expenses_between(user_id, start, end, branch)
         
         label = f"{year}-{month:02d} (Monthly)"
         filename_period = selected_month
@@ -828,8 +866,9 @@ def export_report():
             date_obj = date.today()
             selected_date = date_obj.strftime("%Y-%m-%d")
         
-        invoices = Invoice.query.filter_by(user_id=user_id, invoice_date=date_obj).all()
-        expenses_data = Expense.query.filter_by(user_id=user_id, date=date_obj).all()
+        start, end = date_obj, date_obj + timedelta(days=1)
+        invoices = invoices_between(user_id, start, end, branch)
+        expenses_data = read_models.expenses_between(user_id, start, end, branch)
         label = f"{selected_date} (Daily)"
         filename_period = selected_date
     
@@ -846,6 +885,16 @@ def export_report():
     writer.writerow(["Total expenses", f"{expenses_total:.2f}"])
     writer.writerow(["Net (sales - expenses)", f"{net_total:.2f}"])
     writer.writerow([])
+    
+    if branch is None and branches.list_branches(user_id):
+        writer.writerow(["Branches"])
+        writer.writerow(["Branch", "Invoices", "Sales", "Expenses", "Net"])
+        for row in branches.consolidated_totals(user_id, start, end):
+            writer.writerow([
+                row.name, row.invoice_count, f"{row.sales_total:.2f}",
+                f"{row.expenses_total:.2f}", f"{row.net_total:.2f}",
+            ])
+        writer.writerow([])
     #AI GENERATED PART OVER
     # Invoices section
     writer.writerow(["Invoices"])
@@ -874,7 +923,7 @@ def export_report():
     csv_data = output.getvalue()
     output.close()
     
-    filename = f"report-{period}-{filename_period}.csv"
+    filename = f"report-{period}-{filename_period}{'' if branch is None else f'-branch{branch}'}.csv"
     
     response = make_response(csv_data)
     response.headers["Content-Type"] = "text/csv; charset=utf-8"
@@ -882,25 +931,171 @@ def export_report():
     return response
 
 
+def parse_gst_month() -> tuple:
+    """Read ?month=YYYY-MM (default: current month) as ``(label, start, end)``."""
+    selected_month = request.args.get("month") or now_ist().strftime("%Y-%m")
+    try:
+        year, month = map(int, selected_month.split("-"))
+        start, end = month_range(year, month)
+    except ValueError:
+        year, month = now_ist().year, now_ist().month
+        start, end = month_range(year, month)
+    return f"{year}-{month:02d}", start, end
+
+
+def gst_rows(user_id: str, start: date, end: date) -> tuple:
+    """GSTR-1 and HSN rows of a month; archived months come from the archive's summary."""
+    rows = gst.gstr1_summary(user_id, start, end)
+    hsn_rows = gst.hsn_summary(user_id, start, end)
+    archived = archival.month_summary(user_id, start.year, start.month)
+    if archived:
+        rows += archived.gstr1
+        hsn_rows += archived.hsn
+    return rows, hsn_rows
+
+
+@app.route("/reports/gstr1")
+@login_required
+def gstr1_report():
+    """GSTR-1 style summary of outward supplies for one month."""
+    store = get_store_settings()
+    user_id = get_current_user_id()
+    selected_month, start, end = parse_gst_month()
+    
+    rows, hsn_rows = gst_rows(user_id, start, end)
+    totals = {
+        "taxable_value": sum(row.taxable_value for row in rows),
+        "cgst": sum(row.cgst for row in rows),
+        "sgst": sum(row.sgst for row in rows),
+        "igst": sum(row.igst for row in rows),
+    }
+    
+    return render_template(
+        "gstr1.html",
+        store=store,
+        selected_month=selected_month,
+        rows=rows,
+        hsn_rows=hsn_rows,
+        totals=totals,
+    )
+
+
+@app.route("/reports/gstr1/export")
+@login_required
+def export_gstr1():
+    """Export the monthly GSTR-1 summary as CSV."""
+    user_id = get_current_user_id()
+    selected_month, start, end = parse_gst_month()
+    
+    output = StringIO()
+    writer = csv.writer(output)
+    rows, hsn_rows = gst_rows(user_id, start, end)
+    
+    writer.writerow(["GSTR-1 summary", selected_month])
+    writer.writerow([])
+    writer.writerow(["Supply type", "Inter-state", "Rate %", "Invoices", "Taxable value", "CGST", "SGST", "IGST"])
+    for row in rows:
+        writer.writerow([
+            row.supply_type,
+            "Yes" if row.inter_state else "No",
+            f"{row.gst_rate:g}",
+            row.invoice_count,
+            f"{row.taxable_value:.2f}",
+            f"{row.cgst:.2f}",
+            f"{row.sgst:.2f}",
+            f"{row.igst:.2f}",
+        ])
+    
+    writer.writerow([])
+    writer.writerow(["HSN summary"])
+    writer.writerow(["HSN", "Rate %", "Quantity", "Taxable value", "CGST", "SGST", "IGST"])
+    for row in hsn_rows:
+        writer.writerow([
+            row.hsn_code or "-",
+            f"{row.gst_rate:g}",
+            f"{row.quantity:.2f}",
+            f"{row.taxable_value:.2f}",
+            f"{row.cgst:.2f}",
+            f"{row.sgst:.2f}",
+            f"{row.igst:.2f}",
+        ])
+    
+    csv_data = output.getvalue()
+    output.close()
+    
+    response = make_response(csv_data)
+    response.headers["Content-Type"] = "text/csv; charset=utf-8"
+    response.headers["Content-Disposition"] = f"attachment; filename=gstr1-{selected_month}.csv"
+    return response
+
+
+@app.route("/reports/products")
+@login_required
+def sales_analytics_report():
+    """Top-selling products and the hourly sales heatmap for one month."""
+    store = get_store_settings()
+    user_id = get_current_user_id()
+    selected_month, start, _ = parse_gst_month()
+    try:
+        top_n = int(request.args.get("limit") or analytics.TOP_N)
+    except ValueError:
+        top_n = analytics.TOP_N
+    
+    result = analytics.sales_analytics(user_id, start.year, start.month, top_n)
+    
+    return render_template(
+        "sales_analytics.html",
+        store=store,
+        selected_month=selected_month,
+        limit=max(1, min(top_n, analytics.MAX_TOP_N)),
+        result=result,
+        weekdays=analytics.WEEKDAYS,
+    )
+
+
 @app.route("/settings", methods=["GET", "POST"])
 @login_required
 def settings():
     if request.method == "POST":
-        data = {
-            "store_name": request.form.get("store_name", "").strip(),
-            "address": request.form.get("address", "").strip(),
-            "phone": request.form.get("phone", "").strip(),
-            "email": request.form.get("email", "").strip(),
-        }
-        
         logo_file = request.files.get("logo_file")
-        save_store_settings(data, logo_file)
+        logo = None
+        if logo_file and logo_file.filename:
+            logo = (logo_file.read(), secure_filename(logo_file.filename), logo_file.mimetype)
+        
+        try:
+            # Every invoice bumps the settings row's version, so a sale made
+            # while saving conflicts and the save is retried
+            services.run_in_unit_of_work(services.save_store_settings, get_current_user_id(), request.form, logo)
+        except services.ConflictError as e:
+            flash(str(e), "error")
+            return redirect(url_for("settings"))
         
         flash("Store settings saved.", "success")
         return redirect(url_for("settings"))
     
     store = get_store_settings()
-    return render_template("settings.html", store=store)
+    api_tokens = ApiToken.query.filter_by(user_id=get_current_user_id()).order_by(ApiToken.created_at.desc()).all()
+    return render_template("settings.html", store=store, api_tokens=api_tokens)
+
+
+@app.route("/settings/api-tokens", methods=["POST"])
+@login_required
+def api_token_new():
+    """Create an API token; the token itself is shown once and never stored."""
+    with services.unit_of_work():
+        api_token, token = create_token(get_current_user_id(), request.form.get("name", ""))
+    flash(f"API token '{api_token.name}' created. Copy it now, it will not be shown again: {token}", "success")
+    return redirect(url_for("settings"))
+
+
+@app.route("/settings/api-tokens/<int:token_id>/revoke", methods=["POST"])
+@login_required
+def api_token_revoke(token_id: int):
+    api_token = ApiToken.query.filter_by(id=token_id, user_id=get_current_user_id()).first_or_404()
+    with services.unit_of_work():
+        db.session.delete(api_token)
+    flash(f"API token '{api_token.name}' revoked.", "success")
+    return redirect(url_for("settings"))
 #AI GENERATED 
 
 @app.route("/store-logo")
@@ -934,23 +1129,7 @@ def products_list():
     q = (request.args.get("q") or "").strip().lower()
     stock_status = (request.args.get("stock_status") or "").strip()
     
-    query = Product.query.filter_by(user_id=user_id)
-    
-    if q:
-        query = query.filter(
-            db.or_(
-                Product.name.ilike(f"%{q}%"),
-                Product.sku.ilike(f"%{q}%"),
-                Product.barcode.ilike(f"%{q}%"),
-            )
-        )
-    
-    if stock_status == "low":
-        query = query.filter(Product.stock_quantity <= Product.min_stock_level)
-    elif stock_status == "in_stock":
-        query = query.filter(Product.stock_quantity > 0)
-    
-    products = query.order_by(Product.name).all()
+    products = read_models.list_products(user_id, q=q, stock_status=stock_status)
     
     return render_template("products_list.html", store=store, products=products)
 
@@ -961,20 +1140,21 @@ def product_new():
     store = get_store_settings()
     if request.method == "POST":
         try:
-            create_product(request.form)
+            with services.unit_of_work():
+                services.create_product(get_current_user_id(), request.form)
             flash("Product created.", "success")
             return redirect(url_for("products_list"))
         except Exception as e:
             flash(f"Failed to create product: {e}", "error")
     
-    return render_template("product_form.html", store=store, product=None)
+    return render_template("product_form.html", store=store, product=None, gst_rates=gst.GST_RATES)
 
 
 @app.route("/products/<int:product_id>/edit", methods=["GET", "POST"])
 @login_required
 def product_edit(product_id: int):
     store = get_store_settings()
-    product = find_product(product_id)
+    product = services.get_product(get_current_user_id(), product_id)
     
     if not product:
         flash("Product not found.", "error")
@@ -982,39 +1162,121 @@ def product_edit(product_id: int):
     
     if request.method == "POST":
         try:
-            update_product(product, request.form)
+            services.run_in_unit_of_work(services.update_product, get_current_user_id(), product_id, request.form)
             flash("Product updated.", "success")
             return redirect(url_for("products_list"))
         except Exception as e:
             flash(f"Failed to update product: {e}", "error")
     
-    return render_template("product_form.html", store=store, product=product)
+    return render_template("product_form.html", store=store, product=product, gst_rates=gst.GST_RATES)
+
+
+LABEL_TYPES = ("barcode", "qrcode", "both")
+MAX_LABEL_COPIES = 500
+
+
+def render_label_sheet(products: list, back_url: str):
+    """Compose a printable label sheet for one or more products in a single page.
+    
+    Each product's codes are emitted once as SVG symbols; every copy on the
+    sheet references them, so large sheets stay small and need no scripts.
+    """
+    store = get_store_settings()
+    code_type = request.args.get("type") if request.args.get("type") in LABEL_TYPES else "barcode"
+    try:
+        copies = max(1, min(int(request.args.get("qty") or 24), MAX_LABEL_COPIES))
+    except ValueError:
+        copies = 24
+    
+    sheet = []
+    symbols = []
+    for product in products:
+        value = product.barcode or product.sku or ""
+        label = {"name": product.name, "value": value, "bar": None, "qr": None, "id": product.id}
+        try:
+            if code_type in ("barcode", "both"):
+                label["bar"] = labels.code_geometry(value, labels.pick_symbology(value))
+                symbols.append(labels.svg_symbol(f"bar-{product.id}", label["bar"]))
+            if code_type in ("qrcode", "both"):
+                label["qr"] = labels.code_geometry(value, "qr")
+                symbols.append(labels.svg_symbol(f"qr-{product.id}", label["qr"]))
+        except labels.LabelError as e:
+            flash(f"{product.name}: {e}", "error")
+            continue
+        sheet.append(label)
+    
+    return render_template(
+        "product_barcode.html",
+        store=store,
+        sheet=sheet,
+        symbols=symbols,
+        code_type=code_type,
+        copies=copies,
+        back_url=back_url,
+    )
 
 
 @app.route("/products/<int:product_id>/barcode")
 @login_required
 def product_barcode(product_id: int):
-    store = get_store_settings()
-    product = find_product(product_id)
+    product = services.get_product(get_current_user_id(), product_id)
     
     if not product:
         flash("Product not found.", "error")
         return redirect(url_for("products_list"))
     
-    return render_template("product_barcode.html", store=store, product=product)
+    return render_label_sheet([product], back_url=url_for("products_list"))
+
+
+@app.route("/products/labels")
+@login_required
+def product_labels():
+    """Label sheet for several products (?ids=1&ids=2 or ?ids=1,2)."""
+    user_id = get_current_user_id()
+    ids = []
+    for raw in request.args.getlist("ids"):
+        ids.extend(int(part) for part in raw.split(",") if part.strip().isdigit())
+    
+    products = Product.query.filter(Product.user_id == user_id, Product.id.in_(ids)).order_by(Product.name).all() if ids else []
+    if not products:
+        flash("Select at least one product to print labels.", "error")
+        return redirect(url_for("products_list"))
+    
+    return render_label_sheet(products, back_url=url_for("products_list"))
+
+
+@app.route("/labels/code")
+@login_required
+def label_image():
+    """A single barcode/QR image: ?value=&symbology=code128|ean13|qr&format=svg|png&size=2."""
+    value = request.args.get("value", "")
+    symbology = request.args.get("symbology") or labels.pick_symbology(value)
+    fmt = request.args.get("format", "svg")
+    try:
+        size = int(request.args.get("size") or 2)
+        image = labels.render_code(value, symbology, fmt, size)
+    except ValueError as e:
+        return make_response(str(e), 400)
+    
+    response = make_response(image)
+    response.headers["Content-Type"] = "image/svg+xml" if fmt == "svg" else "image/png"
+    response.headers["Cache-Control"] = "private, max-age=86400"
+    return response
 
 
 @app.route("/products/<int:product_id>/delete", methods=["POST"])
 @login_required
 def product_delete(product_id: int):
-    product = find_product(product_id)
+    try:
+        deleted = services.run_in_unit_of_work(services.delete_product, get_current_user_id(), product_id)
+    except services.ConflictError as e:
+        flash(str(e), "error")
+        return redirect(url_for("products_list"))
     
-    if not product:
-        flash("Product not found.", "error")
-    else:
-        db.session.delete(product)
-        db.session.commit()
+    if deleted:
         flash("Product deleted.", "success")
+    else:
+        flash("Product not found.", "error")
     
     return redirect(url_for("products_list"))
 
@@ -1058,6 +1320,296 @@ def inventory_dashboard():
     return render_template("inventory_dashboard.html", store=store, summary=summary)
 
 
+def ist_day_end_utc(day: date) -> datetime:
+    """Naive UTC datetime for the end of an IST calendar day (ledger dates are UTC)."""
+    next_midnight = datetime.combine(day + timedelta(days=1), datetime.min.time(), tzinfo=IST)
+    return next_midnight.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def parse_valuation_date() -> date:
+    """Read ?date=YYYY-MM-DD for valuation pages, defaulting to today (IST)."""
+    try:
+        return datetime.strptime(request.args.get("date") or "", "%Y-%m-%d").date()
+    except ValueError:
+        return now_ist().date()
+
+
+@app.route("/inventory/valuation")
+@login_required
+def inventory_valuation():
+    """Closing stock and its cost value at the end of a given day."""
+    store = get_store_settings()
+    user_id = get_current_user_id()
+    valuation_date = parse_valuation_date()
+    
+    rows = inventory.stock_valuation(user_id, ist_day_end_utc(valuation_date))
+    
+    return render_template(
+        "inventory_valuation.html",
+        store=store,
+        rows=rows,
+        selected_date=valuation_date.strftime("%Y-%m-%d"),
+        total_quantity=sum(r.quantity for r in rows),
+        total_value=sum(r.value for r in rows),
+    )
+
+
+@app.route("/inventory/valuation/export")
+@login_required
+def export_inventory_valuation():
+    """Export the closing-stock report for a given day as CSV."""
+    user_id = get_current_user_id()
+    valuation_date = parse_valuation_date()
+    rows = inventory.stock_valuation(user_id, ist_day_end_utc(valuation_date))
+    
+    output = StringIO()
+    writer = csv.writer(output)
+    
+    writer.writerow(["Closing stock", valuation_date.strftime("%Y-%m-%d")])
+    writer.writerow(["Product", "SKU", "Quantity", "Unit cost", "Value"])
+    for row in rows:
+        writer.writerow([
+            row.name,
+            row.sku,
+            f"{row.quantity:.2f}",
+            f"{row.unit_cost:.2f}",
+            f"{row.value:.2f}",
+        ])
+    writer.writerow(["Total", "", f"{sum(r.quantity for r in rows):.2f}", "", f"{sum(r.value for r in rows):.2f}"])
+    
+    csv_data = output.getvalue()
+    output.close()
+    
+    response = make_response(csv_data)
+    response.headers["Content-Type"] = "text/csv; charset=utf-8"
+    response.headers["Content-Disposition"] = f"attachment; filename=closing-stock-{valuation_date:%Y-%m-%d}.csv"
+    return response
+
+
+@app.route("/inventory/reorder")
+@login_required
+def reorder_suggestions():
+    """Products due for reordering, as one draft purchase list per supplier."""
+    store = get_store_settings()
+    user_id = get_current_user_id()
+    
+    return render_template(
+        "reorder_suggestions.html",
+        store=store,
+        lists=reorder.supplier_lists(user_id),
+        computed_at=reorder.last_computed(user_id),
+    )
+
+
+@app.route("/inventory/reorder/refresh", methods=["POST"])
+@login_required
+def refresh_reorder_suggestions():
+    """Recompute this store's suggestions now instead of waiting for the nightly job."""
+    user_id = get_current_user_id()
+    with services.unit_of_work():
+        count = reorder.refresh_suggestions(user_id, now_ist().date(), **reorder.settings(app.config))
+    flash(f"{count} product(s) due for reordering.", "success")
+    return redirect(url_for("reorder_suggestions"))
+
+
+@app.route("/inventory/reorder/order", methods=["POST"])
+@login_required
+def order_reorder_suggestions():
+    """Turn one supplier's draft list into a purchase order."""
+    user_id = get_current_user_id()
+    supplier_id = request.form.get("supplier_id")
+    try:
+        with services.unit_of_work():
+            order = reorder.order_supplier_list(
+                user_id, int(supplier_id) if supplier_id else None, now_ist().date()
+            )
+    except ValueError as e:
+        flash(str(e), "error")
+        return redirect(url_for("reorder_suggestions"))
+    
+    flash(f"Purchase order {order.po_number} created.", "success")
+    return redirect(url_for("purchase_order_view", order_id=order.id))
+
+
+@app.route("/branches", methods=["GET", "POST"])
+@login_required
+def branches_page():
+    """Branches of the store, the stock at each, and adding a branch."""
+    store = get_store_settings()
+    user_id = get_current_user_id()
+    
+    if request.method == "POST":
+        try:
+            with services.unit_of_work():
+                branch = branches.create_branch(user_id, request.form.get("name"), request.form.get("address"))
+        except branches.BranchError as e:
+            flash(str(e), "error")
+            return redirect(url_for("branches_page"))
+        flash(f"Branch {branch.name} added.", "success")
+        return redirect(url_for("branches_page"))
+    
+    branch_list = branches.list_branches(user_id)
+    stock = branches.stock_by_branch(user_id, [branch.id for branch in branch_list]) if branch_list else {}
+    return render_template(
+        "branches.html",
+        store=store,
+        branches=branch_list,
+        products=read_models.list_products(user_id),
+        stock=stock,
+        current_branch_id=get_current_branch_id() or branches.MAIN_BRANCH,
+        main_branch_id=branches.MAIN_BRANCH,
+        main_branch_name=branches.MAIN_BRANCH_NAME,
+    )
+
+
+@app.route("/branches/switch", methods=["POST"])
+@login_required
+def switch_branch():
+    """Bill, record expenses and take stock at another branch in this session."""
+    user_id = get_current_user_id()
+    try:
+        branch_id = branches.resolve_branch(user_id, request.form.get("branch_id"))
+    except branches.BranchError as e:
+        flash(str(e), "error")
+        return redirect(url_for("branches_page"))
+    session["branch_id"] = branch_id
+    session["branch_name"] = branches.branch_names(user_id)[branch_id] if branch_id else None
+    flash(f"Now working at {session['branch_name'] or branches.MAIN_BRANCH_NAME}.", "success")
+    return redirect(local_redirect_target(request.form.get("next"), url_for("branches_page")))
+
+
+@app.route("/branches/transfer", methods=["POST"])
+@login_required
+def transfer_branch_stock():
+    """Move stock between branches from pasted ``SKU, quantity`` lines."""
+    user_id = get_current_user_id()
+    try:
+        from_branch = branches.resolve_branch(user_id, request.form.get("from_branch"))
+        to_branch = branches.resolve_branch(user_id, request.form.get("to_branch"))
+        if from_branch == to_branch:
+            raise branches.BranchError("Choose two different branches.")
+        lines = purchasing.parse_stock_lines(user_id, request.form.get("lines"))
+        names = branches.branch_names(user_id)
+        moved = services.run_in_unit_of_work(
+            inventory.transfer_stock, user_id,
+            [(product_id, quantity) for product_id, quantity, _ in lines], from_branch, to_branch,
+            notes=f"Transfer {names[from_branch]} -> {names[to_branch]}",
+        )
+    except (branches.BranchError, purchasing.StockLineError, services.ConflictError) as e:
+        flash(str(e), "error")
+        return redirect(url_for("branches_page"))
+    
+    flash(f"Moved {len(moved)} product(s) from {names[from_branch]} to {names[to_branch]}.", "success")
+    return redirect(url_for("branches_page"))
+
+
+@app.route("/purchases")
+@login_required
+def purchases_list():
+    store = get_store_settings()
+    user_id = get_current_user_id()
+    
+    orders = PurchaseOrder.query.filter_by(user_id=user_id).order_by(PurchaseOrder.created_at.desc()).all()
+    receipts = GoodsReceipt.query.filter_by(user_id=user_id).order_by(GoodsReceipt.received_at.desc()).limit(20).all()
+    
+    return render_template("purchases.html", store=store, orders=orders, receipts=receipts)
+
+
+@app.route("/purchases/new", methods=["GET", "POST"])
+@login_required
+def purchase_order_new():
+    """Create a purchase order from pasted 'SKU, quantity, unit cost' lines."""
+    return _stock_lines_form(receive_now=False)
+
+
+@app.route("/purchases/receive", methods=["GET", "POST"])
+@login_required
+def goods_receive():
+    """Receive a delivery that has no purchase order."""
+    return _stock_lines_form(receive_now=True)
+
+
+def _stock_lines_form(receive_now: bool):
+    store = get_store_settings()
+    user_id = get_current_user_id()
+    form = request.form
+    
+    if request.method == "POST":
+        try:
+            with services.unit_of_work():
+                lines = purchasing.parse_stock_lines(user_id, form.get("lines", ""))
+                supplier = purchasing.get_or_create_supplier(
+                    user_id, form.get("supplier_id"), form.get("supplier_name", "")
+                )
+                notes = form.get("notes", "").strip()
+                
+                if receive_now:
+                    receipt = purchasing.receive_goods(user_id, lines, supplier=supplier, notes=notes)
+                else:
+                    order_date_str = form.get("order_date") or now_ist().strftime("%Y-%m-%d")
+                    order = purchasing.create_purchase_order(
+                        user_id, lines, supplier=supplier,
+                        order_date=datetime.strptime(order_date_str, "%Y-%m-%d").date(),
+                        notes=notes,
+                    )
+            
+            if receive_now:
+                flash(f"Goods received ({receipt.grn_number}). Stock updated for {len(receipt.items)} product(s).", "success")
+                return redirect(url_for("purchases_list"))
+            flash(f"Purchase order {order.po_number} created.", "success")
+            return redirect(url_for("purchase_order_view", order_id=order.id))
+        except (ValueError, inventory.StockConflictError) as e:
+            flash(str(e), "error")
+    
+    suppliers = Supplier.query.filter_by(user_id=user_id).order_by(Supplier.name).all()
+    return render_template(
+        "purchase_order_form.html",
+        store=store,
+        suppliers=suppliers,
+        receive_now=receive_now,
+        form=form,
+        today=now_ist().strftime("%Y-%m-%d"),
+    )
+
+
+@app.route("/purchases/<int:order_id>")
+@login_required
+def purchase_order_view(order_id: int):
+    store = get_store_settings()
+    user_id = get_current_user_id()
+    order = PurchaseOrder.query.options(selectinload(PurchaseOrder.items)).filter_by(id=order_id, user_id=user_id).first()
+    
+    if not order:
+        flash("Purchase order not found.", "error")
+        return redirect(url_for("purchases_list"))
+    
+    return render_template("purchase_order_view.html", store=store, order=order)
+
+
+@app.route("/purchases/<int:order_id>/receive", methods=["POST"])
+@login_required
+def purchase_order_receive(order_id: int):
+    """Receive some or all outstanding quantities of a purchase order."""
+    user_id = get_current_user_id()
+    order = PurchaseOrder.query.options(selectinload(PurchaseOrder.items)).filter_by(id=order_id, user_id=user_id).first()
+    
+    if not order:
+        flash("Purchase order not found.", "error")
+        return redirect(url_for("purchases_list"))
+    
+    quantities = {item.id: request.form.get(f"receive_{item.id}") for item in order.items}
+    try:
+        with services.unit_of_work():
+            receipt = purchasing.receive_purchase_order(
+                user_id, order, quantities, notes=request.form.get("notes", "").strip()
+            )
+        flash(f"Goods received ({receipt.grn_number}).", "success")
+    except (ValueError, inventory.StockConflictError) as e:
+        flash(str(e), "error")
+    
+    return redirect(url_for("purchase_order_view", order_id=order_id))
+
+
 if __name__ == "__main__":
 #AI GENERATED
     with app.app_context():
@@ -0,0 +1,457 @@
+"""
+Cold storage of closed financial years for R Sanju Invoice application.
+
+A closed financial year (April to March) of invoices and stock movements is
+rarely read again, yet it makes every index and every list or export scan
+bigger. archive_financial_year() moves one store's year out of the hot
+tables into a single InvoiceArchive row. Each table's rows are stored
+column by column as JSON and zlib-compressed, which packs the repetitive
+columns (dates, payment modes, GST rates) tightly. The row also keeps a
+per-month summary: sales totals plus the GSTR-1 and HSN rollups.
+
+Reading is transparent: find_invoice() rebuilds an archived invoice as a
+detached Invoice, so the invoice page and its PDF work unchanged, and
+invoices_between(), invoice_rows() and iter_invoice_documents() feed
+reports and exports. Unpacked years stay in the cache for a few minutes.
+
+Before ledger rows leave, every product gets a stock checkpoint at the end
+of the year, so valuations after it only replay the hot ledger. Stock at a
+time inside an archived year starts from the nearest checkpoint after it
+and unwinds the archived movements in between (see
+inventory.stock_valuation, which reads them with archived_ledger()).
+"""
+import json
+import zlib
+from datetime import date, datetime, timedelta
+from typing import NamedTuple, Optional
+
+from sqlalchemy import select, insert, update, delete, func, and_, literal
+
+from models import db, Invoice, InvoiceItem, InvoiceTaxSummary, InvoiceArchive, Product, StockTransaction, StockSnapshot
+import cache
+import gst
+from partitioning import financial_year
+from read_models import MAIN_BRANCH, InvoiceRow, InvoiceLine, InvoiceDocument
+
+
+IST_OFFSET = timedelta(hours=5, minutes=30)
+# The running year and the one before stay hot: returns for a year are
+# still being filed and corrected for months after it closes
+HOT_YEARS = 2
+CACHE_TTL = 300
+
+invoices_table = Invoice.__table__
+items_table = InvoiceItem.__table__
+summaries_table = InvoiceTaxSummary.__table__
+ledger_table = StockTransaction.__table__
+archives_table = InvoiceArchive.__table__
+products_table = Product.__table__
+snapshots_table = StockSnapshot.__table__
+
+SUMMARY_TOTALS = ("subtotal", "discount", "tax", "total")
+
+
+class ArchiveResult(NamedTuple):
+    """What one archive_financial_year() call moved out of the hot tables."""
+    financial_year: int
+    invoices: int
+    ledger_rows: int
+    compressed_bytes: int
+
+
+class MonthSummary(NamedTuple):
+    """Totals and GST rollups of an archived month's active invoices."""
+    invoice_count: int
+    subtotal: float
+    discount: float
+    tax: float
+    total: float
+    gstr1: list
+    hsn: list
+
+
+class ArchivedYear(NamedTuple):
+    """An archived year's rows, unpacked and indexed by invoice id."""
+    invoices: dict
+    items: dict
+    tax_summaries: dict
+
+
+def year_bounds(year: int) -> tuple:
+    """``(start, end)`` of financial year ``year``: April 1 to the next April 1."""
+    return date(year, 4, 1), date(year + 1, 4, 1)
+
+
+def year_label(year: int) -> str:
+    return f"{year}-{(year + 1) % 100:02d}"
+
+
+def _ledger_time(day: date) -> datetime:
+    """Midnight IST at the start of ``day`` as naive UTC, the ledger's time base."""
+    return datetime(day.year, day.month, day.day) - IST_OFFSET
+
+
+def _pack(table, rows: list) -> bytes:
+    """Compress rows (mappings) column by column."""
+    def plain(value):
+        return value.isoformat() if isinstance(value, (date, datetime)) else value
+
+    payload = {column.name: [plain(row[column.name]) for row in rows] for column in table.columns}
+    return zlib.compress(json.dumps(payload, separators=(",", ":")).encode("utf-8"), 9)
+
+
+def _unpack(table, blob: bytes) -> list:
+    """Rows (dicts) of a _pack()ed blob; columns added to the table since read as None."""
+    payload = json.loads(zlib.decompress(blob))
+    count = len(next(iter(payload.values()), []))
+    columns = {}
+    for column in table.columns:
+        values = payload.get(column.name) or [None] * count
+        if isinstance(column.type, db.DateTime):
+            values = [datetime.fromisoformat(value) if value else None for value in values]
+        elif isinstance(column.type, db.Date):
+            values = [date.fromisoformat(value) if value else None for value in values]
+        columns[column.name] = values
+    return [dict(zip(columns, values)) for values in zip(*columns.values())]
+
+
+def _summarize(invoices: list, items: list, tax_summaries: list) -> dict:
+    """Per-month totals and GSTR-1/HSN rollups of the active invoices, keyed "YYYY-MM"."""
+    active = {row["id"]: row for row in invoices if row["status"] == "active"}
+    months = {}
+
+    def month_of(invoice_id: int) -> dict:
+        day = active[invoice_id]["invoice_date"]
+        return months.setdefault(f"{day.year}-{day.month:02d}", {
+            "invoice_count": 0, **{name: 0.0 for name in SUMMARY_TOTALS}, "gstr1": {}, "hsn": {},
+        })
+
+    for invoice_id, row in active.items():
+        month = month_of(invoice_id)
+        month["invoice_count"] += 1
+        for name in SUMMARY_TOTALS:
+            month[name] += row[name] or 0.0
+
+    for row in tax_summaries:
+        if row["invoice_id"] not in active:
+            continue
+        gstr1 = month_of(row["invoice_id"])["gstr1"]
+        key = (row["supply_type"], row["inter_state"], row["gst_rate"])
+        ids, taxable, cgst, sgst, igst = gstr1.get(key, (set(), 0.0, 0.0, 0.0, 0.0))
+        ids.add(row["invoice_id"])
+        gstr1[key] = (ids, taxable + row["taxable_value"], cgst + row["cgst"], sgst + row["sgst"], igst + row["igst"])
+
+    for row in items:
+        if row["invoice_id"] not in active:
+            continue
+        key = (row["hsn_code"] or "", row["gst_rate"])
+        hsn = month_of(row["invoice_id"])["hsn"]
+        totals = hsn.get(key, (0.0, 0.0, 0.0, 0.0, 0.0))
+        hsn[key] = tuple(total + (row[name] or 0.0) for total, name in zip(
+            totals, ("quantity", "taxable_value", "cgst", "sgst", "igst"),
+        ))
+
+    for month in months.values():
+        month["gstr1"] = [
+            [*key, len(ids), *(round(value, 2) for value in totals)]
+            for key, (ids, *totals) in sorted(month["gstr1"].items())
+        ]
+        month["hsn"] = [[*key, *(round(value, 2) for value in totals)] for key, totals in sorted(month["hsn"].items())]
+        for name in SUMMARY_TOTALS:
+            month[name] = round(month[name], 2)
+    return months
+
+
+def _checkpoint(user_id: str, at: datetime) -> int:
+    """Snapshot every product's stock as of ``at``: live stock less the movements since."""
+    p = products_table
+    moved_since = select(func.coalesce(func.sum(ledger_table.c.quantity), 0.0)).where(
+        ledger_table.c.product_id == p.c.id,
+        ledger_table.c.date >= at,
+    ).scalar_subquery()
+    already = select(snapshots_table.c.id).where(
+        snapshots_table.c.product_id == p.c.id,
+        snapshots_table.c.as_of == at,
+    ).exists()
+    source = select(
+        p.c.user_id, p.c.id, literal(at, type_=db.DateTime), p.c.stock_quantity - moved_since, p.c.cost_price,
+    ).where(p.c.user_id == user_id, p.c.created_at <= at, ~already)
+
+    result = db.session.execute(insert(snapshots_table).from_select(
+        ["user_id", "product_id", "as_of", "quantity", "unit_cost"], source
+    ))
+    return result.rowcount
+
+
+def archive_financial_year(user_id: str, year: int, today: date = None) -> Optional[ArchiveResult]:
+    """Move a closed financial year of one store into cold storage.
+
+    Invoices dated in the year go with their items and GST summaries, along
+    with the ledger rows of the year. Archiving a year again (say after a
+    backdated entry) merges into the existing archive. Returns None when
+    there is nothing to move. The caller commits.
+    """
+    start, end = year_bounds(year)
+    today = today or (datetime.utcnow() + IST_OFFSET).date()
+    if end > today:
+        raise ValueError(f"Financial year {year_label(year)} has not closed yet.")
+
+    i = invoices_table
+    in_year = and_(i.c.user_id == user_id, i.c.invoice_date >= start, i.c.invoice_date < end)
+    invoice_ids = select(i.c.id).where(in_year)
+    in_ledger_year = and_(
+        ledger_table.c.user_id == user_id,
+        ledger_table.c.date >= _ledger_time(start),
+        ledger_table.c.date < _ledger_time(end),
+    )
+
+    connection = db.session.connection()
+    invoices = connection.execute(select(i).where(in_year).order_by(i.c.id)).mappings().all()
+    ledger = connection.execute(select(ledger_table).where(in_ledger_year).order_by(ledger_table.c.id)).mappings().all()
+    if not invoices and not ledger:
+        return None
+    items = connection.execute(select(items_table).where(
+        items_table.c.user_id == user_id, items_table.c.invoice_id.in_(invoice_ids),
+    ).order_by(items_table.c.id)).mappings().all()
+    tax_summaries = connection.execute(select(summaries_table).where(
+        summaries_table.c.user_id == user_id, summaries_table.c.invoice_id.in_(invoice_ids),
+    ).order_by(summaries_table.c.id)).mappings().all()
+
+    moved_invoices, moved_ledger = len(invoices), len(ledger)
+    existing = connection.execute(select(archives_table).where(
+        archives_table.c.user_id == user_id, archives_table.c.financial_year == year,
+    )).mappings().first()
+    if existing:
+        invoices = _unpack(invoices_table, existing["invoices"]) + list(invoices)
+        items = _unpack(items_table, existing["invoice_items"]) + list(items)
+        tax_summaries = _unpack(summaries_table, existing["tax_summaries"]) + list(tax_summaries)
+        ledger = _unpack(ledger_table, existing["stock_transactions"]) + list(ledger)
+
+    if moved_ledger:
+        _checkpoint(user_id, _ledger_time(end))
+
+    ids = [row["id"] for row in invoices]
+    values = {
+        "invoice_count": len(invoices),
+        "ledger_count": len(ledger),
+        "min_invoice_id": min(ids, default=None),
+        "max_invoice_id": max(ids, default=None),
+        "summary": json.dumps(_summarize(invoices, items, tax_summaries), separators=(",", ":")),
+        "invoices": _pack(invoices_table, invoices),
+        "invoice_items": _pack(items_table, items),
+        "tax_summaries": _pack(summaries_table, tax_summaries),
+        "stock_transactions": _pack(ledger_table, ledger),
+        "archived_at": datetime.utcnow(),
+    }
+    if existing:
+        db.session.execute(update(archives_table).where(archives_table.c.id == existing["id"]).values(**values))
+    else:
+        db.session.execute(insert(archives_table).values(user_id=user_id, financial_year=year, **values))
+
+    # Items and GST summaries go with the invoices (ON DELETE CASCADE)
+    db.session.execute(delete(i).where(in_year))
+    db.session.execute(delete(ledger_table).where(in_ledger_year))
+    # The unpacked archive and any figures cached from the moved rows
+    cache.invalidate_user(user_id)
+
+    size = sum(len(values[name]) for name in ("invoices", "invoice_items", "tax_summaries", "stock_transactions"))
+    return ArchiveResult(year, moved_invoices, moved_ledger, size)
+
+
+def archivable_years(user_id: str = None, today: date = None) -> list:
+    """``(user_id, financial_year)`` pairs with hot rows older than the HOT_YEARS kept."""
+    today = today or (datetime.utcnow() + IST_OFFSET).date()
+    cutoff_start, _ = year_bounds(financial_year(today) - HOT_YEARS + 1)
+
+    oldest = {}
+    for table, column, cutoff in (
+        (invoices_table, invoices_table.c.invoice_date, cutoff_start),
+        (ledger_table, ledger_table.c.date, _ledger_time(cutoff_start)),
+    ):
+        stmt = select(table.c.user_id, func.min(column)).where(column < cutoff).group_by(table.c.user_id)
+        if user_id:
+            stmt = stmt.where(table.c.user_id == user_id)
+        for owner, first in db.session.connection().execute(stmt):
+            if isinstance(first, datetime):
+                first = (first + IST_OFFSET).date()
+            oldest[owner] = min(first, oldest.get(owner, first))
+
+    return [
+        (owner, year)
+        for owner, first in sorted(oldest.items())
+        for year in range(financial_year(first), financial_year(cutoff_start))
+    ]
+
+
+def archived_years(user_id: str) -> list:
+    """``(financial_year, invoice_count, archived_at)`` of a store's archives, newest first."""
+    a = archives_table
+    return db.session.connection().execute(
+        select(a.c.financial_year, a.c.invoice_count, a.c.archived_at)
+        .where(a.c.user_id == user_id).order_by(a.c.financial_year.desc())
+    ).all()
+
+
+def load_year(user_id: str, year: int) -> Optional[ArchivedYear]:
+    """An archived year unpacked, from the cache when it was read recently."""
+    def load():
+        a = archives_table
+        row = db.session.connection().execute(
+            select(a.c.invoices, a.c.invoice_items, a.c.tax_summaries)
+            .where(a.c.user_id == user_id, a.c.financial_year == year)
+        ).first()
+        if row is None:
+            return None
+        items, tax_summaries = {}, {}
+        for item in _unpack(items_table, row.invoice_items):
+            items.setdefault(item["invoice_id"], []).append(item)
+        for summary in _unpack(summaries_table, row.tax_summaries):
+            tax_summaries.setdefault(summary["invoice_id"], []).append(summary)
+        invoices = {invoice["id"]: invoice for invoice in _unpack(invoices_table, row.invoices)}
+        return ArchivedYear(invoices, items, tax_summaries)
+
+    return cache.get_or_set(("invoice_archive", user_id, year), load, CACHE_TTL, tags=(cache.user_tag(user_id),))
+
+
+def archive_boundary(user_id: str) -> Optional[datetime]:
+    """Ledger time (naive UTC) the store's archived stock movements end at, or None if none are."""
+    a = archives_table
+    year = db.session.connection().execute(
+        select(func.max(a.c.financial_year)).where(a.c.user_id == user_id, a.c.ledger_count > 0)
+    ).scalar()
+    return _ledger_time(year_bounds(year)[1]) if year is not None else None
+
+
+def archived_ledger(user_id: str, since: datetime) -> list:
+    """``(product_id, date, quantity)`` of the archived ledger rows dated at or after ``since``."""
+    a = archives_table
+    years = db.session.connection().execute(
+        select(a.c.financial_year).where(
+            a.c.user_id == user_id,
+            a.c.ledger_count > 0,
+            a.c.financial_year >= financial_year((since + IST_OFFSET).date()),
+        ).order_by(a.c.financial_year)
+    ).scalars().all()
+
+    def load(year):
+        blob = db.session.connection().execute(
+            select(a.c.stock_transactions).where(a.c.user_id == user_id, a.c.financial_year == year)
+        ).scalar()
+        return [(row["product_id"], row["date"], row["quantity"]) for row in _unpack(ledger_table, blob)]
+
+    rows = []
+    for year in years:
+        movements = cache.get_or_set(
+            ("ledger_archive", user_id, year), lambda: load(year), CACHE_TTL, tags=(cache.user_tag(user_id),),
+        )
+        rows.extend(row for row in movements if row[1] >= since)
+    return rows
+
+
+def _years_between(user_id: str, start: date, end: date) -> list:
+    a = archives_table
+    return db.session.connection().execute(
+        select(a.c.financial_year).where(
+            a.c.user_id == user_id,
+            a.c.financial_year >= financial_year(start),
+            a.c.financial_year <= financial_year(end - timedelta(days=1)),
+        ).order_by(a.c.financial_year)
+    ).scalars().all()
+
+
+def find_invoice(user_id: str, invoice_id: int) -> Optional[Invoice]:
+    """An archived invoice rebuilt as a detached Invoice with its items, or None.
+
+    The object is never added to the session, so it is read-only.
+    """
+    a = archives_table
+    years = db.session.connection().execute(
+        select(a.c.financial_year).where(
+            a.c.user_id == user_id,
+            a.c.min_invoice_id <= invoice_id,
+            a.c.max_invoice_id >= invoice_id,
+        )
+    ).scalars().all()
+    for year in years:
+        archived = load_year(user_id, year)
+        row = archived.invoices.get(invoice_id) if archived else None
+        if row is None:
+            continue
+        invoice = Invoice(**row)
+        invoice.items = [InvoiceItem(**item) for item in archived.items.get(invoice_id, [])]
+        invoice.tax_summaries = [InvoiceTaxSummary(**summary) for summary in archived.tax_summaries.get(invoice_id, [])]
+        return invoice
+    return None
+
+
+def _invoice_row(row: dict) -> InvoiceRow:
+    return InvoiceRow(**{name: row[name] for name in InvoiceRow._fields})
+
+
+def invoices_between(user_id: str, start: date, end: date, branch: Optional[int] = None) -> list:
+    """Archived active invoices with ``start <= invoice_date < end``, as InvoiceRows.
+
+    ``branch`` filters as in read_models.invoices_between().
+    """
+    wanted = None if branch == MAIN_BRANCH else branch
+    rows = []
+    for year in _years_between(user_id, start, end):
+        archived = load_year(user_id, year)
+        rows.extend(
+            _invoice_row(row) for row in archived.invoices.values()
+            if row["status"] == "active" and start <= row["invoice_date"] < end
+            and (branch is None or row["branch_id"] == wanted)
+        )
+    return rows
+
+
+def invoice_rows(user_id: str) -> list:
+    """Every archived invoice as an InvoiceRow, newest year first."""
+    rows = []
+    for year, _, _ in archived_years(user_id):
+        archived = load_year(user_id, year)
+        rows.extend(sorted(
+            (_invoice_row(row) for row in archived.invoices.values()),
+            key=lambda row: row.created_at, reverse=True,
+        ))
+    return rows
+
+
+def iter_invoice_documents(user_id: str, start: date, end: date):
+    """Yield archived active InvoiceDocuments with ``start <= invoice_date < end`` in date order."""
+    for year in _years_between(user_id, start, end):
+        archived = load_year(user_id, year)
+        selected = sorted(
+            (row for row in archived.invoices.values()
+             if row["status"] == "active" and start <= row["invoice_date"] < end),
+            key=lambda row: (row["invoice_date"], row["id"]),
+        )
+        for row in selected:
+            lines = tuple(
+                InvoiceLine(item["description"], item["quantity"], item["unit_price"], item["line_total"])
+                for item in sorted(archived.items.get(row["id"], []), key=lambda item: item["id"])
+            )
+            fields = {name: row[name] for name in InvoiceDocument._fields if name != "items"}
+            yield InvoiceDocument(items=lines, **fields)
+
+
+def month_summary(user_id: str, year: int, month: int) -> Optional[MonthSummary]:
+    """The stored summary of an archived month, or None if its year is not archived."""
+    a = archives_table
+    summary = db.session.connection().execute(
+        select(a.c.summary).where(
+            a.c.user_id == user_id,
+            a.c.financial_year == financial_year(date(year, month, 1)),
+        )
+    ).scalar()
+    if summary is None:
+        return None
+    month_data = json.loads(summary).get(f"{year}-{month:02d}")
+    if not month_data:
+        return MonthSummary(0, 0.0, 0.0, 0.0, 0.0, [], [])
+    return MonthSummary(
+        month_data["invoice_count"],
+        *(month_data[name] for name in SUMMARY_TOTALS),
+        [gst.Gstr1Row(*row) for row in month_data["gstr1"]],
+        [gst.HsnRow(*row) for row in month_data["hsn"]],
+    )
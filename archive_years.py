@@ -0,0 +1,58 @@
+"""
+Cold-storage archival job for R Sanju Invoice application.
+Run this script after each financial year closes (or on a monthly
+schedule) to move invoices and stock movements older than the last
+archival.HOT_YEARS financial years into compressed archives.
+"""
+import os
+import sys
+from pathlib import Path
+
+# Add parent directory to path to import modules
+sys.path.insert(0, str(Path(__file__).parent))
+
+from flask import Flask
+from models import db
+from config import config
+from archival import archivable_years, archive_financial_year, year_label
+from services import unit_of_work
+
+
+def run_archival(app_config='default', user_id=None):
+    """
+    Archive every closed financial year that is old enough.
+    
+    Args:
+        app_config: Configuration to use ('development', 'production', or 'default')
+        user_id: Limit archival to a single store (all stores if None)
+    """
+    app = Flask(__name__)
+    app.config.from_object(config[app_config])
+    db.init_app(app)
+    
+    archived = 0
+    with app.app_context():
+        for owner, year in archivable_years(user_id):
+            # One transaction per store and year keeps locks and memory small
+            with unit_of_work():
+                result = archive_financial_year(owner, year)
+            if result:
+                archived += 1
+                print(f"✓ {owner} FY {year_label(year)}: {result.invoices} invoice(s), "
+                      f"{result.ledger_rows} stock movement(s), {result.compressed_bytes} bytes")
+        print(f"✓ Archived {archived} financial year(s)")
+    
+    return archived
+
+
+if __name__ == '__main__':
+    env = os.environ.get('FLASK_ENV', 'development')
+    user_id = sys.argv[1] if len(sys.argv) > 1 else None
+    
+    try:
+        run_archival(env, user_id)
+    except Exception as e:
+        print(f"\n❌ Error archiving financial years: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
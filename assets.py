@@ -0,0 +1,222 @@
+"""
+Fingerprinted static assets for R Sanju Invoice application.
+
+When the app starts, every file under static/ is read once. CSS and
+JavaScript are minified, and every file gets a URL carrying a hash of its
+content (``css/style.3f2a9c1d0e.css``). ``url_for('static', filename=...)``
+returns the hashed URL, so templates pick it up without changes.
+
+Hashed URLs are served from memory with a one-year immutable Cache-Control:
+a changed file gets a new URL, so browsers never revalidate or keep a stale
+copy. Text assets are gzip-compressed (and Brotli-compressed when the brotli
+package is installed) at startup, and each request gets the best variant it
+accepts. Unhashed URLs still go to Flask's normal static handler.
+
+While the app is in debug mode (checked on every url_for(), so a flag
+turned on after startup counts too), files edited while the server runs are
+rebuilt on the next url_for() call.
+"""
+import gzip
+import hashlib
+import mimetypes
+import re
+from pathlib import Path
+from typing import NamedTuple, Optional
+
+from flask import current_app, has_app_context, request, Response
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+HASH_LENGTH = 10
+IMMUTABLE_MAX_AGE = 365 * 24 * 60 * 60
+COMPRESSIBLE = {".css", ".js", ".svg", ".json", ".txt"}
+# Below this, compression saves less than the extra headers cost
+MIN_COMPRESS_SIZE = 512
+
+
+class Asset(NamedTuple):
+    """One static file as served under its hashed path."""
+    path: str             # Hashed path relative to static/
+    mimetype: str
+    etag: str
+    body: bytes
+    gzip: Optional[bytes]
+    brotli: Optional[bytes]
+    mtime: float
+
+
+CSS_STRING = r"""("(?:\\.|[^"\\])*"|'(?:\\.|[^'\\])*')"""
+CSS_STRING_OR_COMMENT = re.compile(CSS_STRING + r"|/\*.*?\*/", re.S)
+
+
+def _minify_css_code(text: str) -> str:
+    text = re.sub(r"\s+", " ", text)
+    # Spaces before ':' are kept: "a :hover" and "a:hover" differ in selectors
+    text = re.sub(r"\s*([{};,>])\s*", r"\1", text)
+    text = re.sub(r":\s+", ":", text)
+    return text.replace(";}", "}")
+
+
+def minify_css(text: str) -> str:
+    """Drop comments and the whitespace CSS does not need.
+
+    Quoted strings (``content: "a  b"``, ``url("a b.png")``) are kept
+    exactly as written, including anything in them that looks like a comment.
+    """
+    text = CSS_STRING_OR_COMMENT.sub(lambda match: match.group(1) or "", text)
+    # re.split() with a group alternates code and the strings between it
+    parts = re.split(CSS_STRING, text)
+    return "".join(
+        part if index % 2 else _minify_css_code(part) for index, part in enumerate(parts)
+    ).strip()
+
+
+def minify_js(text: str) -> str:
+    """Strip indentation, blank lines and whole-line ``//`` comments.
+
+    Line breaks are kept so automatic semicolon insertion still works, and
+    lines inside multi-line template literals are left exactly as written.
+    """
+    lines = []
+    in_template = False
+    for line in text.splitlines():
+        if in_template:
+            lines.append(line)
+        else:
+            stripped = line.strip()
+            if stripped and not stripped.startswith("//"):
+                lines.append(stripped)
+        # An odd number of backticks opens or closes a template literal
+        if (line.count("`") - line.count("\\`")) % 2:
+            in_template = not in_template
+    return "\n".join(lines) + "\n"
+
+
+MINIFIERS = {".css": minify_css, ".js": minify_js}
+
+
+def _hashed_path(filename: str, digest: str) -> str:
+    stem, dot, suffix = filename.rpartition(".")
+    if not dot or "/" in suffix:
+        return f"{filename}.{digest}"
+    return f"{stem}.{digest}.{suffix}"
+
+
+def _compressed(body: bytes, suffix: str) -> tuple:
+    """``(gzip, brotli)`` variants worth sending; None where compression does not help."""
+    if suffix not in COMPRESSIBLE or len(body) < MIN_COMPRESS_SIZE:
+        return None, None
+    # mtime=0 keeps the gzip bytes identical across restarts and workers
+    gzipped = gzip.compress(body, compresslevel=9, mtime=0)
+    brotlied = brotli.compress(body, quality=11) if brotli else None
+    return (
+        gzipped if len(gzipped) < len(body) else None,
+        brotlied if brotlied and len(brotlied) < len(body) else None,
+    )
+
+
+def build_asset(root: Path, filename: str) -> Asset:
+    """Read, minify, hash and precompress one file under ``root``."""
+    source = root / filename
+    suffix = source.suffix.lower()
+    body = source.read_bytes()
+    minify = MINIFIERS.get(suffix)
+    if minify:
+        body = minify(body.decode("utf-8")).encode("utf-8")
+
+    digest = hashlib.sha256(body).hexdigest()[:HASH_LENGTH]
+    gzipped, brotlied = _compressed(body, suffix)
+    return Asset(
+        path=_hashed_path(filename, digest),
+        mimetype=mimetypes.guess_type(filename)[0] or "application/octet-stream",
+        etag=digest,
+        body=body,
+        gzip=gzipped,
+        brotli=brotlied,
+        mtime=source.stat().st_mtime,
+    )
+
+
+def build_manifest(root: Path) -> dict:
+    """``{filename: Asset}`` for every file under ``root``, skipping hidden ones."""
+    manifest = {}
+    for source in sorted(root.rglob("*")):
+        filename = source.relative_to(root).as_posix()
+        if source.is_file() and not any(part.startswith(".") for part in filename.split("/")):
+            manifest[filename] = build_asset(root, filename)
+    return manifest
+
+
+class AssetManifest:
+    """Hashed assets of one app, by original filename and by hashed path."""
+
+    def __init__(self, root: Path, watch: Optional[bool] = None):
+        self.root = root
+        # None follows the debug flag of the app handling the request
+        self.watch = watch
+        self.by_name = build_manifest(root)
+        self.by_path = {asset.path: asset for asset in self.by_name.values()}
+
+    def _watching(self) -> bool:
+        if self.watch is None:
+            return has_app_context() and current_app.debug
+        return self.watch
+
+    def lookup(self, filename: str) -> Optional[Asset]:
+        asset = self.by_name.get(filename)
+        if self._watching():
+            asset = self._refresh(filename, asset)
+        return asset
+
+    def _refresh(self, filename: str, asset: Optional[Asset]) -> Optional[Asset]:
+        source = self.root / filename
+        if not source.is_file() or (asset and source.stat().st_mtime == asset.mtime):
+            return asset
+        fresh = build_asset(self.root, filename)
+        self.by_name[filename] = fresh
+        # The old hashed path stays servable for pages rendered before the edit
+        self.by_path[fresh.path] = fresh
+        return fresh
+
+    def serve(self, path: str, fallback) -> Response:
+        """Response for a hashed ``path``; anything else goes to Flask's ``fallback`` view."""
+        asset = self.by_path.get(path)
+        if asset is None:
+            return fallback(filename=path)
+
+        body, encoding = asset.body, None
+        if asset.brotli and request.accept_encodings["br"]:
+            body, encoding = asset.brotli, "br"
+        elif asset.gzip and request.accept_encodings["gzip"]:
+            body, encoding = asset.gzip, "gzip"
+
+        response = Response(body, mimetype=asset.mimetype)
+        # Each encoding is a different representation, so it gets its own ETag
+        response.set_etag(f"{asset.etag}-{encoding}" if encoding else asset.etag)
+        if encoding:
+            response.headers["Content-Encoding"] = encoding
+        if asset.gzip or asset.brotli:
+            response.vary.add("Accept-Encoding")
+        response.headers["Cache-Control"] = f"public, max-age={IMMUTABLE_MAX_AGE}, immutable"
+        return response.make_conditional(request)
+
+
+def init_app(app) -> AssetManifest:
+    """Build the manifest and route url_for('static') and /static through it."""
+    manifest = AssetManifest(Path(app.static_folder))
+    app.extensions["assets"] = manifest
+
+    @app.url_defaults
+    def hashed_static_url(endpoint, values):
+        if endpoint == "static" and "filename" in values:
+            asset = manifest.lookup(values["filename"])
+            if asset:
+                values["filename"] = asset.path
+
+    fallback = app.view_functions["static"]
+    app.view_functions["static"] = lambda filename: manifest.serve(filename, fallback)
+    return manifest
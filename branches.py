@@ -0,0 +1,184 @@
+"""
+Branches for R Sanju Invoice application.
+
+One login can run several shops. The shop a store started with is its main
+branch; every further shop is a Branch row. Invoices, expenses and stock
+movements record the branch they happened at, with NULL meaning the main
+branch, so a store without branches works exactly as before.
+
+Product.stock_quantity stays the store-wide total that reorder suggestions,
+valuation and the API read. BranchStock holds each branch's share of it, and
+the main branch holds the rest.
+
+Consolidated reports group by branch, with one query per table for all
+branches at once rather than one report per branch. Functions flush but do
+not commit; callers wrap them in services.unit_of_work().
+"""
+from datetime import date
+from typing import NamedTuple, Optional
+
+from sqlalchemy import select, insert, func, literal
+
+from models import db, Branch, BranchStock, Invoice, Expense, Product
+from read_models import MAIN_BRANCH
+import archival
+
+
+MAIN_BRANCH_NAME = "Main branch"
+
+branches_table = Branch.__table__
+branch_stocks_table = BranchStock.__table__
+invoices_table = Invoice.__table__
+expenses_table = Expense.__table__
+products_table = Product.__table__
+
+
+class BranchError(ValueError):
+    """Raised for an unknown branch or an invalid branch name."""
+
+
+class BranchTotals(NamedTuple):
+    """Sales and expenses of one branch over a period."""
+    branch_id: Optional[int]  # None for the main branch
+    name: str
+    invoice_count: int
+    sales_total: float
+    expense_count: int
+    expenses_total: float
+    net_total: float
+
+
+def list_branches(user_id: str) -> list:
+    """The store's branches (not counting the main one), by name."""
+    return Branch.query.filter_by(user_id=user_id).order_by(Branch.name).all()
+
+
+def create_branch(user_id: str, name: str, address: str = "") -> Branch:
+    """Add a branch, with an empty stock row for every product."""
+    name = (name or "").strip()
+    if not name:
+        raise BranchError("Branch name is required.")
+    b = branches_table
+    taken = db.session.connection().execute(
+        select(b.c.id).where(b.c.user_id == user_id, func.lower(b.c.name) == name.lower())
+    ).first()
+    if name.lower() == MAIN_BRANCH_NAME.lower() or taken:
+        raise BranchError(f"There is already a branch named '{name}'.")
+
+    branch = Branch(user_id=user_id, name=name, address=(address or "").strip() or None)
+    db.session.add(branch)
+    db.session.flush()
+
+    p = products_table
+    db.session.execute(insert(branch_stocks_table).from_select(
+        ["user_id", "branch_id", "product_id", "quantity"],
+        select(p.c.user_id, literal(branch.id), p.c.id, literal(0.0)).where(p.c.user_id == user_id),
+    ))
+    return branch
+
+
+def add_product(user_id: str, product_id: int) -> None:
+    """Give a new product an empty stock row at every branch."""
+    b = branches_table
+    db.session.execute(insert(branch_stocks_table).from_select(
+        ["user_id", "branch_id", "product_id", "quantity"],
+        select(b.c.user_id, b.c.id, literal(product_id), literal(0.0)).where(b.c.user_id == user_id),
+    ))
+
+
+def resolve_branch(user_id: str, value) -> Optional[int]:
+    """The branch_id to store for a submitted branch: None for the main branch."""
+    if value in (None, "", MAIN_BRANCH, str(MAIN_BRANCH)):
+        return None
+    try:
+        branch_id = int(value)
+    except (TypeError, ValueError):
+        raise BranchError("branch_id must be an integer.")
+    branch = db.session.get(Branch, branch_id)
+    if branch is None or branch.user_id != user_id:
+        raise BranchError(f"Unknown branch id: {branch_id}")
+    return branch_id
+
+
+def parse_selection(value) -> Optional[int]:
+    """Read a ``branch`` argument for read_models filters: None for all branches, MAIN_BRANCH or an id."""
+    try:
+        return int(value) if value not in (None, "") else None
+    except (TypeError, ValueError):
+        return None
+
+
+def branch_names(user_id: str) -> dict:
+    """``{branch_id: name}`` including ``None`` for the main branch."""
+    names = {None: MAIN_BRANCH_NAME}
+    b = branches_table
+    names.update(db.session.connection().execute(
+        select(b.c.id, b.c.name).where(b.c.user_id == user_id)
+    ).all())
+    return names
+
+
+def stock_by_branch(user_id: str, branch_ids: list) -> dict:
+    """``{product_id: [main, branch, ...]}`` quantities, in the order of ``branch_ids``, in one query."""
+    p, s = products_table, branch_stocks_table
+    position = {branch_id: index for index, branch_id in enumerate(branch_ids, start=1)}
+    stock = {}
+    for product_id, total, branch_id, quantity in db.session.connection().execute(
+        select(p.c.id, p.c.stock_quantity, s.c.branch_id, s.c.quantity)
+        .select_from(p.outerjoin(s, s.c.product_id == p.c.id))
+        .where(p.c.user_id == user_id)
+    ):
+        row = stock.get(product_id)
+        if row is None:
+            row = stock[product_id] = [total or 0.0] + [0.0] * len(branch_ids)
+        if branch_id in position:
+            row[position[branch_id]] = quantity or 0.0
+            row[0] -= quantity or 0.0
+    return stock
+
+
+def consolidated_totals(user_id: str, start: date, end: date) -> list:
+    """BranchTotals of every branch, main first, for ``start <= date < end``.
+
+    Live invoices and expenses are each summed with one query grouped by
+    branch; invoices of archived financial years are added from the archive.
+    """
+    i, e = invoices_table, expenses_table
+    connection = db.session.connection()
+    sales = {
+        branch_id: [count, total or 0.0]
+        for branch_id, count, total in connection.execute(
+            select(i.c.branch_id, func.count(i.c.id), func.sum(i.c.total)).where(
+                i.c.user_id == user_id,
+                i.c.invoice_date >= start,
+                i.c.invoice_date < end,
+                i.c.status == "active",
+            ).group_by(i.c.branch_id)
+        )
+    }
+    for row in archival.invoices_between(user_id, start, end):
+        totals = sales.setdefault(row.branch_id, [0, 0.0])
+        totals[0] += 1
+        totals[1] += row.total or 0.0
+    expenses = {
+        branch_id: (count, total or 0.0)
+        for branch_id, count, total in connection.execute(
+            select(e.c.branch_id, func.count(e.c.id), func.sum(e.c.amount)).where(
+                e.c.user_id == user_id,
+                e.c.date >= start,
+                e.c.date < end,
+            ).group_by(e.c.branch_id)
+        )
+    }
+
+    names = branch_names(user_id)
+    order = [None] + sorted((branch_id for branch_id in names if branch_id is not None), key=names.get)
+    totals = []
+    for branch_id in order:
+        invoice_count, sales_total = sales.get(branch_id, (0, 0.0))
+        expense_count, expenses_total = expenses.get(branch_id, (0, 0.0))
+        totals.append(BranchTotals(
+            branch_id, names[branch_id], invoice_count, round(sales_total, 2),
+            expense_count, round(expenses_total, 2), round(sales_total - expenses_total, 2),
+        ))
+    return totals
@@ -0,0 +1,454 @@
+"""
+Cache for R Sanju Invoice application.
+
+Values are cached under tuple keys such as ``("expense_rollup", user_id,
+"2024-04")`` and expire after a TTL. An entry can also carry tags, and
+invalidate_tags() drops every entry with any of the given tags; every entry
+cached for a store is tagged user_tag(user_id), so one call forgets all of
+it. Writers invalidate what they affect once their change has committed
+(services.after_commit).
+
+The backend is chosen with CACHE_BACKEND:
+
+- ``memory`` (default): a per-process LRU dict of at most CACHE_MAX_ENTRIES
+  entries. Each worker process holds its own copy, so another worker's
+  invalidation is not seen and the TTL bounds the staleness.
+- ``sqlite``: a SQLite file at CACHE_PATH shared by every worker on one
+  host, so an invalidation is seen by all of them at once.
+- ``redis``: any server speaking the Redis protocol at CACHE_URL
+  (``redis://[:password@]host[:port][/db]``), shared across hosts. The
+  protocol is spoken over a plain socket, so no client package is needed.
+
+Shared backends pickle values, so only point them at a server this app
+alone writes to. A backend that fails (a locked file, an unreachable
+server) counts an error and behaves as a miss: the value is computed as if
+there were no cache. stats() has the hit, miss and error counts of the
+current process.
+"""
+import os
+import pickle
+import socket
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from urllib.parse import urlparse, unquote
+
+
+DEFAULT_TTL = 600
+MAX_ENTRIES = 10000
+# Shared backends drop expired entries once every this many writes
+PRUNE_EVERY = 500
+# Redis tag sets outlive the entries in them; entry TTLs are capped to this
+REDIS_TAG_TTL = 24 * 60 * 60
+REDIS_TIMEOUT = 2.0
+# After a failed connection, calls miss at once for this many seconds
+REDIS_RETRY_AFTER = 5.0
+
+
+def user_tag(user_id: str) -> str:
+    """The tag every cache entry of a store carries."""
+    return f"user:{user_id}"
+
+
+def _key(key) -> str:
+    return ":".join(str(part) for part in key) if isinstance(key, tuple) else str(key)
+
+
+class MemoryBackend:
+    """Per-process LRU cache with per-entry expiry."""
+
+    name = "memory"
+
+    def __init__(self, max_entries: int = MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # key -> (expires_at, value, tags)
+        self._tags = {}                # tag -> {key: None}; set() is shadowed below
+        self._lock = threading.Lock()
+
+    def get(self, key: str):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] < time.monotonic():
+                self._drop(key)
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def set(self, key: str, value, ttl: int, tags: tuple) -> None:
+        with self._lock:
+            self._drop(key)
+            self._entries[key] = (time.monotonic() + ttl, value, tags)
+            for tag in tags:
+                self._tags.setdefault(tag, {})[key] = None
+            while len(self._entries) > self.max_entries:
+                self._drop(next(iter(self._entries)))
+
+    def delete(self, keys: list) -> None:
+        with self._lock:
+            for key in keys:
+                self._drop(key)
+
+    def delete_tags(self, tags: list) -> None:
+        with self._lock:
+            for tag in tags:
+                for key in list(self._tags.pop(tag, ())):
+                    self._drop(key)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._tags.clear()
+
+    def size(self) -> int:
+        return len(self._entries)
+
+    def _drop(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        for tag in entry[2]:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.pop(key, None)
+                if not keys:
+                    del self._tags[tag]
+
+
+class SQLiteBackend:
+    """Cache in a SQLite file, shared by the worker processes of one host."""
+
+    name = "sqlite"
+
+    def __init__(self, path: str, max_entries: int = MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self._local = threading.local()
+        self._writes = 0
+        with self._connection() as connection:
+            connection.executescript(
+                "CREATE TABLE IF NOT EXISTS cache_entries ("
+                " key TEXT PRIMARY KEY, value BLOB NOT NULL, expires_at REAL NOT NULL);"
+                "CREATE INDEX IF NOT EXISTS ix_cache_entries_expires_at ON cache_entries (expires_at);"
+                "CREATE TABLE IF NOT EXISTS cache_tags ("
+                " tag TEXT NOT NULL, key TEXT NOT NULL, PRIMARY KEY (tag, key));"
+                "CREATE INDEX IF NOT EXISTS ix_cache_tags_key ON cache_tags (key);"
+            )
+
+    def _connection(self) -> sqlite3.Connection:
+        # One connection per thread, opened again in a forked worker
+        connection = getattr(self._local, "connection", None)
+        if connection is None or self._local.pid != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=1, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection, self._local.pid = connection, os.getpid()
+        return connection
+
+    def get(self, key: str):
+        row = self._connection().execute(
+            "SELECT value FROM cache_entries WHERE key = ? AND expires_at >= ?", (key, time.time())
+        ).fetchone()
+        return pickle.loads(row[0]) if row else None
+
+    def set(self, key: str, value, ttl: int, tags: tuple) -> None:
+        connection = self._connection()
+        with connection:
+            connection.execute("BEGIN IMMEDIATE")
+            connection.execute(
+                "INSERT OR REPLACE INTO cache_entries (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, pickle.dumps(value, pickle.HIGHEST_PROTOCOL), time.time() + ttl),
+            )
+            connection.executemany(
+                "INSERT OR IGNORE INTO cache_tags (tag, key) VALUES (?, ?)", [(tag, key) for tag in tags]
+            )
+        self._writes += 1
+        if self._writes % PRUNE_EVERY == 0:
+            self.prune()
+
+    def prune(self) -> None:
+        """Drop expired entries, then the soonest to expire beyond max_entries."""
+        connection = self._connection()
+        with connection:
+            connection.execute("BEGIN IMMEDIATE")
+            connection.execute("DELETE FROM cache_entries WHERE expires_at < ?", (time.time(),))
+            connection.execute(
+                "DELETE FROM cache_entries WHERE key IN ("
+                " SELECT key FROM cache_entries ORDER BY expires_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+            connection.execute("DELETE FROM cache_tags WHERE key NOT IN (SELECT key FROM cache_entries)")
+
+    def delete(self, keys: list) -> None:
+        connection = self._connection()
+        with connection:
+            connection.execute("BEGIN IMMEDIATE")
+            connection.executemany("DELETE FROM cache_entries WHERE key = ?", [(key,) for key in keys])
+            connection.executemany("DELETE FROM cache_tags WHERE key = ?", [(key,) for key in keys])
+
+    def delete_tags(self, tags: list) -> None:
+        connection = self._connection()
+        with connection:
+            connection.execute("BEGIN IMMEDIATE")
+            for tag in tags:
+                connection.execute(
+                    "DELETE FROM cache_entries WHERE key IN (SELECT key FROM cache_tags WHERE tag = ?)", (tag,)
+                )
+                connection.execute("DELETE FROM cache_tags WHERE tag = ?", (tag,))
+
+    def clear(self) -> None:
+        connection = self._connection()
+        with connection:
+            connection.execute("BEGIN IMMEDIATE")
+            connection.execute("DELETE FROM cache_entries")
+            connection.execute("DELETE FROM cache_tags")
+
+    def size(self) -> int:
+        return self._connection().execute(
+            "SELECT COUNT(*) FROM cache_entries WHERE expires_at >= ?", (time.time(),)
+        ).fetchone()[0]
+
+
+class RedisError(Exception):
+    """An error reply from the server, or a reply that could not be read."""
+
+
+class RedisBackend:
+    """Cache on a server speaking the Redis protocol (RESP), shared across hosts.
+
+    Entries are strings with an expiry under ``<prefix>k:``; each tag is a
+    set, under ``<prefix>t:``, of the entries carrying it. Invalidating a
+    tag renames its set away first, so entries tagged while the
+    invalidation runs land in a new set and are kept.
+    """
+
+    name = "redis"
+
+    def __init__(self, url: str, prefix: str = "invoice:", timeout: float = REDIS_TIMEOUT):
+        parsed = urlparse(url)
+        if parsed.scheme != "redis":
+            raise ValueError(f"Unsupported cache URL: {url}")
+        self.host = parsed.hostname or "localhost"
+        self.port = parsed.port or 6379
+        self.password = unquote(parsed.password) if parsed.password else None
+        self.db = int(parsed.path.lstrip("/") or 0)
+        self.entry_prefix = f"{prefix}k:"
+        self.tag_prefix = f"{prefix}t:"
+        self.timeout = timeout
+        self._local = threading.local()
+
+    # --- Protocol ---
+    def _connect(self) -> None:
+        if getattr(self._local, "down_until", 0) > time.monotonic():
+            raise RedisError("Cache server unavailable")
+        try:
+            sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+        except OSError:
+            self._local.down_until = time.monotonic() + REDIS_RETRY_AFTER
+            raise
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._local.sock, self._local.reader, self._local.pid = sock, sock.makefile("rb"), os.getpid()
+        setup = []
+        if self.password:
+            setup.append(("AUTH", self.password))
+        if self.db:
+            setup.append(("SELECT", self.db))
+        if setup:
+            self._call(*setup)
+
+    @staticmethod
+    def _encode(command: tuple) -> bytes:
+        parts = [b"*%d\r\n" % len(command)]
+        for arg in command:
+            if not isinstance(arg, bytes):
+                arg = str(arg).encode("utf-8")
+            parts.append(b"$%d\r\n%s\r\n" % (len(arg), arg))
+        return b"".join(parts)
+
+    def _read(self):
+        line = self._local.reader.readline()
+        if not line.endswith(b"\r\n"):
+            raise RedisError("Connection closed by the cache server")
+        kind, rest = line[:1], line[1:-2]
+        if kind == b"+":
+            return rest.decode("utf-8")
+        if kind == b"-":
+            return RedisError(rest.decode("utf-8"))
+        if kind == b":":
+            return int(rest)
+        if kind == b"$":
+            length = int(rest)
+            return None if length < 0 else self._local.reader.read(length + 2)[:-2]
+        if kind == b"*":
+            length = int(rest)
+            return None if length < 0 else [self._read() for _ in range(length)]
+        raise RedisError(f"Unexpected reply from the cache server: {line!r}")
+
+    def _send(self, commands: list) -> list:
+        """Send ``commands`` in one round trip; error replies are returned, not raised."""
+        if getattr(self._local, "sock", None) is None or self._local.pid != os.getpid():
+            self._connect()
+        try:
+            self._local.sock.sendall(b"".join(self._encode(command) for command in commands))
+            return [self._read() for _ in commands]
+        except (OSError, RedisError):
+            # The connection may be half-read; the next call opens a fresh one
+            self._local.sock.close()
+            self._local.sock = None
+            raise
+
+    def _call(self, *commands) -> list:
+        replies = self._send(list(commands))
+        for reply in replies:
+            if isinstance(reply, RedisError):
+                raise reply
+        return replies
+
+    def _scan(self, pattern: str):
+        cursor = b"0"
+        while True:
+            (cursor, keys), = self._call(("SCAN", cursor, "MATCH", pattern, "COUNT", 1000))
+            yield from keys
+            if cursor in (b"0", "0"):
+                return
+
+    # --- Backend ---
+    def get(self, key: str):
+        value, = self._call(("GET", self.entry_prefix + key))
+        return pickle.loads(value) if value is not None else None
+
+    def set(self, key: str, value, ttl: int, tags: tuple) -> None:
+        key = self.entry_prefix + key
+        ttl_ms = int(min(ttl, REDIS_TAG_TTL) * 1000)
+        commands = [("SET", key, pickle.dumps(value, pickle.HIGHEST_PROTOCOL), "PX", ttl_ms)]
+        for tag in tags:
+            commands.append(("SADD", self.tag_prefix + tag, key))
+            commands.append(("EXPIRE", self.tag_prefix + tag, REDIS_TAG_TTL))
+        self._call(*commands)
+
+    def delete(self, keys: list) -> None:
+        if keys:
+            self._call(("DEL", *(self.entry_prefix + key for key in keys)))
+
+    def delete_tags(self, tags: list) -> None:
+        for tag in tags:
+            doomed = f"{self.tag_prefix}{tag}:deleting:{os.getpid()}:{threading.get_ident()}"
+            renamed, = self._send([("RENAME", self.tag_prefix + tag, doomed)])
+            if isinstance(renamed, RedisError):
+                if "no such key" in str(renamed).lower():
+                    continue
+                raise renamed
+            keys, = self._call(("SMEMBERS", doomed))
+            self._call(("DEL", doomed, *keys))
+
+    def clear(self) -> None:
+        for pattern in (self.entry_prefix + "*", self.tag_prefix + "*"):
+            keys = list(self._scan(pattern))
+            if keys:
+                self._call(("DEL", *keys))
+
+    def size(self) -> int:
+        return sum(1 for _ in self._scan(self.entry_prefix + "*"))
+
+
+_backend = MemoryBackend()
+_stats = {"hits": 0, "misses": 0, "sets": 0, "invalidations": 0, "errors": 0}
+_stats_lock = threading.Lock()
+
+
+def _count(name: str) -> None:
+    with _stats_lock:
+        _stats[name] += 1
+
+
+def _safely(operation, *args):
+    """Run a backend call; a failing backend is counted and treated as empty.
+
+    Only transport and serialisation errors are caught; a bug in a backend
+    still raises.
+    """
+    try:
+        return operation(*args)
+    except (OSError, sqlite3.Error, RedisError, pickle.UnpicklingError, EOFError):
+        _count("errors")
+        return None
+
+
+def configure(backend) -> None:
+    """Use ``backend`` for every cache call from now on."""
+    global _backend
+    _backend = backend
+
+
+def get(key):
+    """Cached value for ``key``, or None if missing or expired."""
+    value = _safely(_backend.get, _key(key))
+    _count("misses" if value is None else "hits")
+    return value
+
+
+def set(key, value, ttl: int = DEFAULT_TTL, tags: tuple = ()) -> None:
+    _count("sets")
+    _safely(_backend.set, _key(key), value, ttl, tuple(tags))
+
+
+def get_or_set(key, compute, ttl: int = DEFAULT_TTL, tags: tuple = ()):
+    """Return the cached value, computing and storing it on a miss."""
+    value = get(key)
+    if value is None:
+        value = compute()
+        set(key, value, ttl, tags)
+    return value
+
+
+def invalidate(*keys) -> None:
+    _count("invalidations")
+    _safely(_backend.delete, [_key(key) for key in keys])
+
+
+def invalidate_tags(*tags) -> None:
+    """Drop every entry carrying any of ``tags``."""
+    _count("invalidations")
+    _safely(_backend.delete_tags, list(tags))
+
+
+def invalidate_user(user_id: str) -> None:
+    """Drop everything cached for a store."""
+    invalidate_tags(user_tag(user_id))
+
+
+def clear() -> None:
+    _safely(_backend.clear)
+
+
+def stats() -> dict:
+    """Hit, miss and error counts of this process, and the backend's entry count."""
+    with _stats_lock:
+        counts = dict(_stats)
+    lookups = counts["hits"] + counts["misses"]
+    counts["hit_ratio"] = round(counts["hits"] / lookups, 3) if lookups else None
+    counts["backend"] = _backend.name
+    counts["entries"] = _safely(_backend.size)
+    return counts
+
+
+def reset_stats() -> None:
+    with _stats_lock:
+        for name in _stats:
+            _stats[name] = 0
+
+
+def init_app(app) -> None:
+    """Pick the backend from the app's CACHE_* settings."""
+    name = app.config["CACHE_BACKEND"]
+    if name == "memory":
+        configure(MemoryBackend(app.config["CACHE_MAX_ENTRIES"]))
+    elif name == "sqlite":
+        configure(SQLiteBackend(app.config["CACHE_PATH"], app.config["CACHE_MAX_ENTRIES"]))
+    elif name == "redis":
+        configure(RedisBackend(app.config["CACHE_URL"]))
+    else:
+        raise ValueError(f"Unknown CACHE_BACKEND: {name}")
+    app.extensions["cache"] = _backend
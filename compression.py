@@ -0,0 +1,175 @@
+"""
+Response compression for R Sanju Invoice application.
+
+A WSGI middleware that gzip- or Brotli-compresses dynamic HTML, JSON and CSV
+responses for clients that accept it (Brotli is preferred when the brotli
+package is installed). Bodies are compressed as they stream, each chunk
+flushed on its own, so streamed responses still reach the browser chunk by
+chunk. Bodies smaller than COMPRESSION_MIN_SIZE are sent as they are, since
+compressing them saves less than it costs.
+
+Responses that already carry a Content-Encoding (the fingerprinted static
+files are precompressed by assets.py), binary downloads such as PDFs and
+ZIPs, and anything marked ``Cache-Control: no-transform`` pass through
+untouched.
+"""
+import zlib
+
+from werkzeug.datastructures import Headers
+from werkzeug.http import parse_accept_header
+from werkzeug.wsgi import ClosingIterator
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+MIN_SIZE = 1024
+# Levels tuned for CPU per request rather than the smallest output:
+# gzip 6 and Brotli 4 get most of the savings of their maximum levels
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 4
+
+COMPRESSIBLE_TYPES = {
+    "text/html",
+    "text/csv",
+    "text/plain",
+    "text/css",
+    "text/javascript",
+    "application/json",
+    "application/javascript",
+    "image/svg+xml",
+}
+
+
+def _gzip_stream(level: int):
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    return (
+        lambda chunk: compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH),
+        compressor.flush,
+    )
+
+
+def _brotli_stream(quality: int):
+    compressor = brotli.Compressor(quality=quality)
+    return (
+        lambda chunk: compressor.process(chunk) + compressor.flush(),
+        compressor.finish,
+    )
+
+
+class CompressionMiddleware:
+    """Wrap a WSGI app so its text responses are compressed on the way out."""
+
+    def __init__(self, app, min_size: int = MIN_SIZE, gzip_level: int = GZIP_LEVEL,
+                 brotli_quality: int = BROTLI_QUALITY):
+        self.app = app
+        self.min_size = min_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    def _negotiate(self, environ) -> str:
+        """The encoding to use for this request, or "" for none."""
+        if environ.get("REQUEST_METHOD") == "HEAD":
+            return ""
+        accepted = parse_accept_header(environ.get("HTTP_ACCEPT_ENCODING", ""))
+        if brotli and accepted["br"]:
+            return "br"
+        if accepted["gzip"]:
+            return "gzip"
+        return ""
+
+    def _compressible(self, status: str, headers: Headers) -> bool:
+        content_type = (headers.get("Content-Type") or "").split(";")[0].strip().lower()
+        length = headers.get("Content-Length")
+        return (
+            status[:3] not in ("204", "206", "304")
+            and content_type in COMPRESSIBLE_TYPES
+            and "Content-Encoding" not in headers
+            and "no-transform" not in (headers.get("Cache-Control") or "")
+            and not (length and length.isdigit() and int(length) < self.min_size)
+        )
+
+    def __call__(self, environ, start_response):
+        encoding = self._negotiate(environ)
+        if not encoding:
+            return self.app(environ, start_response)
+
+        started = {}
+
+        def capture(status, headers, exc_info=None):
+            started.update(status=status, headers=Headers(headers), exc_info=exc_info)
+            # The legacy write() callable is not supported by this middleware
+            return None
+
+        app_iter = self.app(environ, capture)
+        # The inner iterable is closed by the wrapper, not by a finally in
+        # _respond(): a generator the server never started (the client went
+        # away first) runs no finally block when it is closed
+        return ClosingIterator(
+            self._respond(app_iter, started, encoding, start_response), getattr(app_iter, "close", None),
+        )
+
+    def _respond(self, app_iter, started: dict, encoding: str, start_response):
+        chunks = iter(app_iter)
+        buffered, size = [], 0
+        # An app may call start_response as late as its first non-empty chunk
+        while not started:
+            chunk = next(chunks, None)
+            if chunk is None:
+                raise RuntimeError("The application returned without calling start_response().")
+            buffered.append(chunk)
+            size += len(chunk)
+        status, headers = started["status"], started["headers"]
+
+        if not self._compressible(status, headers):
+            start_response(status, headers.to_wsgi_list(), started["exc_info"])
+            yield from buffered
+            yield from chunks
+            return
+
+        # Hold back the start of a streamed body until it is clear it is big enough
+        for chunk in chunks:
+            buffered.append(chunk)
+            size += len(chunk)
+            if size >= self.min_size:
+                break
+        else:
+            if size < self.min_size:
+                start_response(status, headers.to_wsgi_list(), started["exc_info"])
+                yield b"".join(buffered)
+                return
+
+        compress, finish = (_brotli_stream(self.brotli_quality) if encoding == "br"
+                            else _gzip_stream(self.gzip_level))
+        headers.remove("Content-Length")
+        headers["Content-Encoding"] = encoding
+        vary = headers.get("Vary")
+        if not vary:
+            headers["Vary"] = "Accept-Encoding"
+        elif "accept-encoding" not in vary.lower():
+            headers["Vary"] = f"{vary}, Accept-Encoding"
+        # The compressed body is no longer byte-identical to the original
+        etag = headers.get("ETag")
+        if etag and not etag.startswith("W/"):
+            headers["ETag"] = f"W/{etag}"
+        start_response(status, headers.to_wsgi_list(), started["exc_info"])
+
+        yield compress(b"".join(buffered))
+        for chunk in chunks:
+            if chunk:
+                yield compress(chunk)
+        yield finish()
+
+
+def init_app(app) -> None:
+    """Compress the app's responses with the COMPRESSION_* settings."""
+    if not app.config["COMPRESSION_ENABLED"]:
+        return
+    app.wsgi_app = CompressionMiddleware(
+        app.wsgi_app,
+        min_size=app.config["COMPRESSION_MIN_SIZE"],
+        gzip_level=app.config["COMPRESSION_GZIP_LEVEL"],
+        brotli_quality=app.config["COMPRESSION_BROTLI_QUALITY"],
+    )
@@ -40,6 +40,31 @@ class Config:
     # Upload folder (for temporary processing, not persistent storage)
     UPLOAD_FOLDER = BASE_DIR / 'uploads'
     UPLOAD_FOLDER.mkdir(exist_ok=True)
+    
+    # Worker processes for batch PDF rendering (1 renders in the request process)
+    PDF_WORKERS = int(os.environ.get('PDF_WORKERS') or min(4, os.cpu_count() or 1))
+    
+    # Hash partitions per table when partition_tables.py converts a PostgreSQL database
+    PARTITION_COUNT = int(os.environ.get('PARTITION_COUNT') or 16)
+    
+    # Reorder engine: supplier lead time, days between orders, chance of not running out
+    REORDER_LEAD_TIME_DAYS = int(os.environ.get('REORDER_LEAD_TIME_DAYS') or 7)
+    REORDER_REVIEW_DAYS = int(os.environ.get('REORDER_REVIEW_DAYS') or 7)
+    REORDER_SERVICE_LEVEL = float(os.environ.get('REORDER_SERVICE_LEVEL') or 0.95)
+    
+    # Response compression: bodies under the minimum size (bytes) are sent as is;
+    # higher levels trade CPU per request for fewer bytes on the wire
+    COMPRESSION_ENABLED = os.environ.get('COMPRESSION_ENABLED', '1') != '0'
+    COMPRESSION_MIN_SIZE = int(os.environ.get('COMPRESSION_MIN_SIZE') or 1024)
+    COMPRESSION_GZIP_LEVEL = int(os.environ.get('COMPRESSION_GZIP_LEVEL') or 6)
+    COMPRESSION_BROTLI_QUALITY = int(os.environ.get('COMPRESSION_BROTLI_QUALITY') or 4)
+    
+    # Cache backend: memory (per process), sqlite (a file shared by the workers of
+    # one host) or redis (a Redis-protocol server at CACHE_URL shared by every host)
+    CACHE_BACKEND = os.environ.get('CACHE_BACKEND') or 'memory'
+    CACHE_MAX_ENTRIES = int(os.environ.get('CACHE_MAX_ENTRIES') or 10000)
+    CACHE_PATH = os.environ.get('CACHE_PATH') or str(BASE_DIR / 'uploads' / 'cache.sqlite3')
+    CACHE_URL = os.environ.get('CACHE_URL') or 'redis://localhost:6379/0'
 
 
 class DevelopmentConfig(Config):
@@ -0,0 +1,213 @@
+"""
+CSV / bank-statement expense import for R Sanju Invoice application.
+
+The file is read row by row and inserted in batches, so memory use does not
+depend on the file size. Every expense carries an import_hash of its date,
+amount and description. Rows whose hash already exists for the user are
+skipped as duplicates, which also makes re-importing the same statement
+harmless. A dry run goes through exactly the same steps inside a
+transaction that is rolled back at the end.
+"""
+import csv
+import hashlib
+from datetime import datetime, date
+from typing import NamedTuple, Optional
+
+from sqlalchemy import select, insert
+
+from models import db, Expense
+
+
+BATCH_SIZE = 1000
+MAX_ERRORS = 20
+MAX_SAMPLES = 10
+
+DATE_FORMATS = ("%Y-%m-%d", "%d/%m/%Y", "%d-%m-%Y", "%d.%m.%Y", "%d-%b-%Y", "%d %b %Y", "%m/%d/%Y")
+
+expenses_table = Expense.__table__
+
+
+class ExpenseImportError(ValueError):
+    """Raised when the file or column mapping cannot be used at all."""
+
+
+class ColumnMapping(NamedTuple):
+    """Which CSV columns hold each field: a header name or a 1-based column number.
+
+    Bank statements with separate withdrawal/deposit columns map ``amount``
+    to the withdrawal column; rows with no amount there (deposits) are skipped.
+    """
+    date: str = "Date"
+    description: str = "Description"
+    amount: str = "Amount"
+    category: str = ""
+    default_category: str = ""
+    date_format: str = ""
+
+
+class ImportResult(NamedTuple):
+    """Outcome of an import or dry run."""
+    dry_run: bool
+    rows_read: int
+    inserted: int
+    duplicates: int
+    skipped: int
+    errors: list
+    samples: list
+    months: set
+
+
+def expense_hash(day: date, amount: float, description: str) -> str:
+    """Duplicate-detection key of an expense: date, amount and normalized description."""
+    normalized = " ".join((description or "").split()).casefold()
+    return hashlib.sha256(f"{day.isoformat()}|{amount:.2f}|{normalized}".encode("utf-8")).hexdigest()
+
+
+def parse_date(value: str, date_format: str = "") -> date:
+    value = (value or "").strip()
+    for fmt in ((date_format,) if date_format else DATE_FORMATS):
+        try:
+            return datetime.strptime(value, fmt).date()
+        except ValueError:
+            continue
+    raise ValueError(f"unrecognised date '{value}'")
+
+
+def parse_amount(value: str) -> Optional[float]:
+    """Parse amounts such as ``1,250.00``, ``Rs. 300``, ``-45`` or ``(45.00)``; blank is None."""
+    text = (value or "").strip().replace(",", "").replace("₹", "")
+    for prefix in ("Rs.", "Rs", "INR"):
+        if text.startswith(prefix):
+            text = text[len(prefix):].strip()
+    if text.endswith(("Dr", "DR")):
+        text = text[:-2].strip()
+    if text.startswith("(") and text.endswith(")"):
+        text = text[1:-1]
+    if not text:
+        return None
+    return abs(float(text))
+
+
+def _column_index(header: list, column: str) -> Optional[int]:
+    """Resolve a mapping entry against the header row; None if not mapped."""
+    column = (column or "").strip()
+    if not column:
+        return None
+    if column.isdigit():
+        return int(column) - 1
+    lowered = [name.strip().casefold() for name in header]
+    try:
+        return lowered.index(column.casefold())
+    except ValueError:
+        raise ExpenseImportError(f"Column '{column}' not found in the file header.")
+
+
+def _existing_hashes(user_id: str, hashes: set) -> set:
+    if not hashes:
+        return set()
+    stmt = select(expenses_table.c.import_hash).where(
+        expenses_table.c.user_id == user_id,
+        expenses_table.c.import_hash.in_(hashes),
+    )
+    return set(db.session.connection().execute(stmt).scalars())
+
+
+def _flush_batch(user_id: str, batch: list) -> tuple:
+    """Insert the non-duplicate rows of a batch; returns ``(inserted_rows, duplicates)``."""
+    existing = _existing_hashes(user_id, {row["import_hash"] for row in batch})
+    fresh = []
+    seen = set()
+    for row in batch:
+        if row["import_hash"] in existing or row["import_hash"] in seen:
+            continue
+        seen.add(row["import_hash"])
+        fresh.append(row)
+    if fresh:
+        db.session.execute(insert(expenses_table), fresh)
+    return fresh, len(batch) - len(fresh)
+
+
+def import_expenses(user_id: str, lines, mapping: ColumnMapping = ColumnMapping(),
+                    dry_run: bool = False, batch_size: int = BATCH_SIZE) -> ImportResult:
+    """Import expenses from an iterable of CSV text lines (e.g. a text file object).
+
+    Real imports commit after every batch, so an interrupted import can simply
+    be re-run. A dry run keeps everything in one transaction and rolls it back.
+    """
+    reader = csv.reader(lines)
+    try:
+        header = next(reader)
+    except StopIteration:
+        raise ExpenseImportError("The file is empty.")
+
+    date_col = _column_index(header, mapping.date)
+    desc_col = _column_index(header, mapping.description)
+    amount_col = _column_index(header, mapping.amount)
+    category_col = _column_index(header, mapping.category)
+    if date_col is None or desc_col is None or amount_col is None:
+        raise ExpenseImportError("Date, description and amount columns are required.")
+
+    rows_read = inserted = duplicates = skipped = 0
+    errors, samples, months = [], [], set()
+    batch = []
+    now = datetime.utcnow()
+
+    def flush():
+        nonlocal inserted, duplicates
+        fresh, dupes = _flush_batch(user_id, batch)
+        inserted += len(fresh)
+        duplicates += dupes
+        for row in fresh:
+            months.add((row["date"].year, row["date"].month))
+            if len(samples) < MAX_SAMPLES:
+                samples.append(row)
+        batch.clear()
+        if not dry_run:
+            db.session.commit()
+
+    try:
+        for record in reader:
+            line_no = reader.line_num
+            if not any(cell.strip() for cell in record):
+                continue
+            rows_read += 1
+            try:
+                amount = parse_amount(record[amount_col])
+                if not amount:
+                    # Deposits in a withdrawal column, or zero-value lines
+                    skipped += 1
+                    continue
+                day = parse_date(record[date_col], mapping.date_format)
+                description = record[desc_col].strip()
+                if not description:
+                    raise ValueError("missing description")
+                category = (record[category_col].strip() if category_col is not None else "") \
+                    or mapping.default_category
+            except (ValueError, IndexError) as e:
+                if len(errors) < MAX_ERRORS:
+                    errors.append((line_no, str(e) or "missing column"))
+                skipped += 1
+                continue
+
+            batch.append({
+                "user_id": user_id,
+                "date": day,
+                "description": description[:500],
+                "category": category[:100],
+                "amount": amount,
+                "import_hash": expense_hash(day, amount, description),
+                "created_at": now,
+            })
+            if len(batch) >= batch_size:
+                flush()
+
+        if batch:
+            flush()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    if dry_run:
+        db.session.rollback()
+
+    return ImportResult(dry_run, rows_read, inserted, duplicates, skipped, errors, samples, months)
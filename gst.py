@@ -0,0 +1,209 @@
+"""
+GST computation for R Sanju Invoice application.
+
+Prices are GST-exclusive. An invoice's lines are taxed in one batched pass:
+the invoice discount is spread over the lines in proportion to their value,
+each line is taxed at its own rate, and the results are summed per rate for
+the InvoiceTaxSummary rows. Intra-state supplies split the tax equally into
+CGST and SGST; inter-state supplies are charged IGST.
+"""
+from datetime import date
+from typing import NamedTuple, Optional
+
+from sqlalchemy import select, func, case
+
+from models import db, Invoice, InvoiceItem, InvoiceTaxSummary
+
+
+GST_RATES = (0.0, 0.25, 3.0, 5.0, 12.0, 18.0, 28.0)
+
+
+class LineTax(NamedTuple):
+    """Tax on one invoice line after its share of the discount."""
+    taxable_value: float
+    gst_rate: float
+    cgst: float
+    sgst: float
+    igst: float
+
+
+class RateSummary(NamedTuple):
+    """Totals of an invoice, or of a month, at one GST rate."""
+    gst_rate: float
+    taxable_value: float
+    cgst: float
+    sgst: float
+    igst: float
+
+
+class Gstr1Row(NamedTuple):
+    """One line of the monthly GSTR-1 style summary."""
+    supply_type: str
+    inter_state: bool
+    gst_rate: float
+    invoice_count: int
+    taxable_value: float
+    cgst: float
+    sgst: float
+    igst: float
+
+
+class HsnRow(NamedTuple):
+    """One line of the monthly HSN-wise summary."""
+    hsn_code: str
+    gst_rate: float
+    quantity: float
+    taxable_value: float
+    cgst: float
+    sgst: float
+    igst: float
+
+
+def state_code(gstin: Optional[str]) -> Optional[str]:
+    """The two-digit state code at the start of a GSTIN, or None if it has none."""
+    gstin = (gstin or "").strip()
+    if len(gstin) == 15 and gstin[:2].isdigit():
+        return gstin[:2]
+    return None
+
+
+def is_inter_state(store_gstin: Optional[str], customer_gstin: Optional[str]) -> bool:
+    """A supply is inter-state when both GSTINs are known and their states differ."""
+    store_state = state_code(store_gstin)
+    customer_state = state_code(customer_gstin)
+    return bool(store_state and customer_state and store_state != customer_state)
+
+
+def compute_line_taxes(amounts: list, rates: list, discount: float = 0.0,
+                       inter_state: bool = False) -> list:
+    """Tax every line of an invoice in one pass.
+
+    ``amounts`` are the line totals before discount and ``rates`` the GST
+    percentages of the same lines. The discount (capped at the subtotal) is
+    apportioned by value, with the last line taking the rounding remainder,
+    so the taxable values always add up to ``subtotal - discount``.
+    """
+    subtotal = sum(amounts)
+    discount = min(max(discount or 0.0, 0.0), subtotal)
+
+    shares = [round(discount * amount / subtotal, 2) if subtotal else 0.0 for amount in amounts]
+    if shares:
+        shares[-1] = round(discount - sum(shares[:-1]), 2)
+
+    lines = []
+    for amount, share, rate in zip(amounts, shares, rates):
+        taxable = round(amount - share, 2)
+        rate = rate or 0.0
+        tax = round(taxable * rate / 100, 2)
+        if inter_state:
+            lines.append(LineTax(taxable, rate, 0.0, 0.0, tax))
+        else:
+            # SGST takes the odd paisa so the halves always add up to the line tax
+            cgst = round(tax / 2, 2)
+            lines.append(LineTax(taxable, rate, cgst, round(tax - cgst, 2), 0.0))
+    return lines
+
+
+def summarize_by_rate(lines: list) -> list:
+    """Collapse LineTax rows into one RateSummary per GST rate."""
+    totals = {}
+    for line in lines:
+        taxable, cgst, sgst, igst = totals.get(line.gst_rate, (0.0, 0.0, 0.0, 0.0))
+        totals[line.gst_rate] = (
+            taxable + line.taxable_value, cgst + line.cgst, sgst + line.sgst, igst + line.igst,
+        )
+    return [
+        RateSummary(rate, round(taxable, 2), round(cgst, 2), round(sgst, 2), round(igst, 2))
+        for rate, (taxable, cgst, sgst, igst) in sorted(totals.items())
+    ]
+
+
+def total_tax(lines: list) -> float:
+    return round(sum(line.cgst + line.sgst + line.igst for line in lines), 2)
+
+
+def apply_to_invoice(invoice: Invoice, items: list, store_gstin: Optional[str] = None) -> list:
+    """Fill GST fields on ``items`` and return the invoice's InvoiceTaxSummary rows.
+
+    Each item must already carry ``gst_rate``. ``invoice.tax`` is set to the
+    computed GST; the caller sets the total and adds the returned rows.
+    """
+    inter_state = is_inter_state(store_gstin, invoice.customer_gstin)
+    lines = compute_line_taxes(
+        [item.line_total for item in items],
+        [item.gst_rate for item in items],
+        discount=invoice.discount,
+        inter_state=inter_state,
+    )
+    for item, line in zip(items, lines):
+        item.taxable_value = line.taxable_value
+        item.cgst = line.cgst
+        item.sgst = line.sgst
+        item.igst = line.igst
+
+    invoice.tax = total_tax(lines)
+    supply_type = "B2B" if (invoice.customer_gstin or "").strip() else "B2C"
+    return [
+        InvoiceTaxSummary(
+            user_id=invoice.user_id,
+            invoice_id=invoice.id,
+            invoice_date=invoice.invoice_date,
+            supply_type=supply_type,
+            inter_state=inter_state,
+            gst_rate=summary.gst_rate,
+            taxable_value=summary.taxable_value,
+            cgst=summary.cgst,
+            sgst=summary.sgst,
+            igst=summary.igst,
+        )
+        for summary in summarize_by_rate(lines)
+    ]
+
+
+def gstr1_summary(user_id: str, start: date, end: date) -> list:
+    """Taxable value and tax per (supply type, inter-state, rate) for ``start <= date < end``."""
+    s = InvoiceTaxSummary.__table__
+    stmt = select(
+        s.c.supply_type,
+        s.c.inter_state,
+        s.c.gst_rate,
+        func.count(func.distinct(s.c.invoice_id)),
+        func.coalesce(func.sum(s.c.taxable_value), 0.0),
+        func.coalesce(func.sum(s.c.cgst), 0.0),
+        func.coalesce(func.sum(s.c.sgst), 0.0),
+        func.coalesce(func.sum(s.c.igst), 0.0),
+    ).where(
+        s.c.user_id == user_id,
+        s.c.invoice_date >= start,
+        s.c.invoice_date < end,
+    ).group_by(
+        s.c.supply_type, s.c.inter_state, s.c.gst_rate,
+    ).order_by(s.c.supply_type, s.c.inter_state, s.c.gst_rate)
+
+    return [Gstr1Row._make(row) for row in db.session.connection().execute(stmt)]
+
+
+def hsn_summary(user_id: str, start: date, end: date) -> list:
+    """Quantity, taxable value and tax per (HSN code, rate) for ``start <= date < end``."""
+    i = Invoice.__table__
+    li = InvoiceItem.__table__
+    hsn = case((li.c.hsn_code.is_(None), ""), else_=li.c.hsn_code)
+    stmt = select(
+        hsn,
+        li.c.gst_rate,
+        func.coalesce(func.sum(li.c.quantity), 0.0),
+        func.coalesce(func.sum(li.c.taxable_value), 0.0),
+        func.coalesce(func.sum(li.c.cgst), 0.0),
+        func.coalesce(func.sum(li.c.sgst), 0.0),
+        func.coalesce(func.sum(li.c.igst), 0.0),
+    ).select_from(
+        li.join(i, i.c.id == li.c.invoice_id)
+    ).where(
+        i.c.user_id == user_id,
+        li.c.user_id == user_id,
+        i.c.invoice_date >= start,
+        i.c.invoice_date < end,
+        i.c.status == "active",
+    ).group_by(hsn, li.c.gst_rate).order_by(hsn, li.c.gst_rate)
+
+    return [HsnRow._make(row) for row in db.session.connection().execute(stmt)]
@@ -10,6 +10,7 @@ from pathlib import Path
 sys.path.insert(0, str(Path(__file__).parent))
 
 from flask import Flask
+from flask_migrate import Migrate, stamp
 from models import db, User, StoreSettings, Product, Supplier, Invoice, InvoiceItem, Expense, StockTransaction
 from config import config
 
@@ -25,6 +26,7 @@ def init_database(app_config='default'):
     
     # Initialize database with app
     db.init_app(app)
+    Migrate(app, db, directory=str(Path(__file__).parent / 'migrations'), render_as_batch=True)
     
     with app.app_context():
         print(f"Creating database tables...")
@@ -35,6 +37,10 @@ def init_database(app_config='default'):
         
         print("✓ All tables created successfully!")
         
+        # Tables already match the latest migration, so mark it as applied
+        stamp()
+        print("✓ Migration history stamped to latest revision")
+        
         # Display created tables
         from sqlalchemy import inspect
         inspector = inspect(db.engine)
@@ -0,0 +1,479 @@
+"""
+Stock ledger helpers for R Sanju Invoice application.
+
+Product.stock_quantity is the live stock figure and StockTransaction is the
+append-only ledger of every movement. StockSnapshot rows checkpoint the live
+figure periodically, so "what was in stock on date X" only replays the
+ledger between the nearest checkpoint and X instead of the full history.
+
+Stock is only ever changed by UPDATEs relative to the stored value
+(``stock_quantity = stock_quantity + :delta``) that also bump
+Product.version, so concurrent sales never overwrite each other and ORM
+edits of a product made meanwhile fail their version check instead of
+writing a stale stock figure back.
+
+A movement at a branch other than the main one also updates that branch's
+BranchStock row in the same way, and its ledger rows carry the branch.
+"""
+from datetime import datetime
+from typing import NamedTuple, Optional
+
+from sqlalchemy import select, insert, update, func, and_, or_, case, literal, bindparam
+
+from models import db, Product, StockTransaction, StockSnapshot, BranchStock
+import archival
+
+
+products_table = Product.__table__
+transactions_table = StockTransaction.__table__
+snapshots_table = StockSnapshot.__table__
+branch_stocks_table = BranchStock.__table__
+
+
+class StockConflictError(RuntimeError):
+    """Raised when rows a stock operation relies on changed while it ran.
+
+    For example a product deleted mid-sale, or an invoice voided by another
+    terminal while it was being voided here. The operation is safe to retry
+    from scratch (see services.run_in_unit_of_work).
+    """
+
+
+def _check_rowcount(result, expected: int) -> None:
+    if result.rowcount != expected:
+        raise StockConflictError(f"Expected to update {expected} product(s), updated {result.rowcount}.")
+
+
+class StockValuationRow(NamedTuple):
+    """Stock position of one product at a point in time."""
+    product_id: int
+    name: str
+    sku: str
+    quantity: float
+    unit_cost: float
+    value: float
+    snapshot_at: Optional[datetime]
+
+
+def take_stock_snapshots(user_id: str = None) -> int:
+    """Checkpoint current stock of every product, or of one user's products.
+
+    Runs as a single INSERT ... SELECT so the checkpoint is consistent with
+    the ledger at the moment it is taken. Returns the number of rows written.
+    The caller commits.
+    """
+    as_of = datetime.utcnow()
+    source = select(
+        products_table.c.user_id,
+        products_table.c.id,
+        literal(as_of, type_=db.DateTime),
+        products_table.c.stock_quantity,
+        products_table.c.cost_price,
+    )
+    if user_id:
+        source = source.where(products_table.c.user_id == user_id)
+
+    stmt = insert(snapshots_table).from_select(
+        ["user_id", "product_id", "as_of", "quantity", "unit_cost"], source
+    )
+    result = db.session.execute(stmt)
+    return result.rowcount
+
+
+def stock_valuation(user_id: str, at: datetime) -> list:
+    """Stock quantity and cost value of each product as of ``at`` (naive UTC).
+
+    Products with a snapshot at or before ``at`` start from the latest one and
+    replay ledger rows in ``[snapshot.as_of, at)``. Products without one fall
+    back to the live stock figure and unwind ledger rows dated after ``at``.
+    Times before the end of the store's archived ledger go through
+    _archived_stock_valuation(), as the rows to replay are no longer here.
+    """
+    boundary = archival.archive_boundary(user_id)
+    if boundary is not None and at < boundary:
+        return _archived_stock_valuation(user_id, at)
+
+    p = products_table
+    tx = transactions_table
+
+    latest = select(
+        snapshots_table.c.product_id,
+        func.max(snapshots_table.c.as_of).label("as_of"),
+    ).where(
+        snapshots_table.c.user_id == user_id,
+        snapshots_table.c.as_of <= at,
+    ).group_by(snapshots_table.c.product_id).subquery("latest")
+
+    anchor = select(
+        snapshots_table.c.product_id,
+        snapshots_table.c.as_of,
+        snapshots_table.c.quantity,
+        snapshots_table.c.unit_cost,
+    ).join(
+        latest,
+        and_(
+            latest.c.product_id == snapshots_table.c.product_id,
+            latest.c.as_of == snapshots_table.c.as_of,
+        ),
+    ).subquery("anchor")
+
+    replay_window = or_(
+        and_(anchor.c.as_of.is_not(None), tx.c.date >= anchor.c.as_of, tx.c.date < at),
+        and_(anchor.c.as_of.is_(None), tx.c.date >= at),
+    )
+    movement = func.coalesce(func.sum(tx.c.quantity), 0.0)
+
+    stmt = select(
+        p.c.id, p.c.name, p.c.sku, p.c.stock_quantity, p.c.cost_price,
+        anchor.c.as_of, anchor.c.quantity, anchor.c.unit_cost,
+        movement,
+    ).select_from(
+        p.outerjoin(anchor, anchor.c.product_id == p.c.id)
+        .outerjoin(tx, and_(tx.c.product_id == p.c.id, replay_window))
+    ).where(
+        p.c.user_id == user_id,
+        p.c.created_at <= at,
+    ).group_by(
+        p.c.id, p.c.name, p.c.sku, p.c.stock_quantity, p.c.cost_price,
+        anchor.c.as_of, anchor.c.quantity, anchor.c.unit_cost,
+    ).order_by(p.c.name)
+
+    rows = []
+    for (product_id, name, sku, live_qty, cost_price,
+         snapshot_at, snapshot_qty, snapshot_cost, moved) in db.session.connection().execute(stmt):
+        if snapshot_at is not None:
+            quantity = snapshot_qty + moved
+            unit_cost = snapshot_cost
+        else:
+            quantity = live_qty - moved
+            unit_cost = cost_price
+        rows.append(StockValuationRow(
+            product_id, name, sku, quantity, unit_cost, quantity * unit_cost, snapshot_at,
+        ))
+    return rows
+
+
+def _archived_stock_valuation(user_id: str, at: datetime) -> list:
+    """stock_valuation() for a time inside an archived year.
+
+    Each product starts from its nearest snapshot after ``at`` (the
+    checkpoint taken when the year was archived) and unwinds the hot and
+    archived ledger rows in ``[at, snapshot.as_of)``; products without one
+    unwind everything after ``at`` from the live stock figure.
+    """
+    p = products_table
+    tx = transactions_table
+
+    nearest = select(
+        snapshots_table.c.product_id,
+        func.min(snapshots_table.c.as_of).label("as_of"),
+    ).where(
+        snapshots_table.c.user_id == user_id,
+        snapshots_table.c.as_of >= at,
+    ).group_by(snapshots_table.c.product_id).subquery("nearest")
+
+    anchor = select(
+        snapshots_table.c.product_id,
+        snapshots_table.c.as_of,
+        snapshots_table.c.quantity,
+        snapshots_table.c.unit_cost,
+    ).join(
+        nearest,
+        and_(
+            nearest.c.product_id == snapshots_table.c.product_id,
+            nearest.c.as_of == snapshots_table.c.as_of,
+        ),
+    ).subquery("anchor")
+
+    unwind_window = and_(tx.c.date >= at, or_(anchor.c.as_of.is_(None), tx.c.date < anchor.c.as_of))
+    movement = func.coalesce(func.sum(tx.c.quantity), 0.0)
+
+    stmt = select(
+        p.c.id, p.c.name, p.c.sku, p.c.stock_quantity, p.c.cost_price,
+        anchor.c.as_of, anchor.c.quantity, anchor.c.unit_cost,
+        movement,
+    ).select_from(
+        p.outerjoin(anchor, anchor.c.product_id == p.c.id)
+        .outerjoin(tx, and_(tx.c.product_id == p.c.id, unwind_window))
+    ).where(
+        p.c.user_id == user_id,
+        p.c.created_at <= at,
+    ).group_by(
+        p.c.id, p.c.name, p.c.sku, p.c.stock_quantity, p.c.cost_price,
+        anchor.c.as_of, anchor.c.quantity, anchor.c.unit_cost,
+    ).order_by(p.c.name)
+    products = db.session.connection().execute(stmt).all()
+
+    until = {row.id: row.as_of for row in products}
+    archived_moves = {}
+    for product_id, day, quantity in archival.archived_ledger(user_id, at):
+        if product_id in until and (until[product_id] is None or day < until[product_id]):
+            archived_moves[product_id] = archived_moves.get(product_id, 0.0) + quantity
+
+    rows = []
+    for (product_id, name, sku, live_qty, cost_price,
+         snapshot_at, snapshot_qty, snapshot_cost, moved) in products:
+        moved += archived_moves.get(product_id, 0.0)
+        if snapshot_at is not None:
+            quantity = snapshot_qty - moved
+            unit_cost = snapshot_cost
+        else:
+            quantity = live_qty - moved
+            unit_cost = cost_price
+        rows.append(StockValuationRow(
+            product_id, name, sku, quantity, unit_cost, quantity * unit_cost, snapshot_at,
+        ))
+    return rows
+
+
+def receive_stock(user_id: str, lines: list, reference_id: str = "", notes: str = "") -> dict:
+    """Apply a delivery of ``(product_id, quantity, unit_cost)`` lines to stock.
+
+    Duplicate products are merged first. All products are then updated by one
+    executemany UPDATE that raises stock_quantity and rolls the delivery cost
+    into a moving-average cost_price. The cost is computed from each row's
+    current values inside the database, so concurrent sales cannot skew it.
+    Purchase ledger rows are bulk-inserted. The caller commits.
+
+    Returns ``{product_id: (quantity, unit_cost)}`` for the merged lines.
+    """
+    merged = {}
+    for product_id, quantity, unit_cost in lines:
+        if quantity <= 0:
+            continue
+        total_qty, total_value = merged.get(product_id, (0.0, 0.0))
+        merged[product_id] = (total_qty + quantity, total_value + quantity * unit_cost)
+
+    received = {pid: (qty, value / qty) for pid, (qty, value) in merged.items()}
+    if not received:
+        return received
+
+    p = products_table
+    on_hand = case((p.c.stock_quantity > 0, p.c.stock_quantity), else_=0.0)
+    incoming = bindparam("incoming_qty")
+    stmt = update(p).where(
+        p.c.id == bindparam("target_id"),
+        p.c.user_id == user_id,
+    ).values(
+        cost_price=(on_hand * p.c.cost_price + incoming * bindparam("incoming_cost")) / (on_hand + incoming),
+        stock_quantity=p.c.stock_quantity + incoming,
+        version=p.c.version + 1,
+        updated_at=datetime.utcnow(),
+    )
+    result = db.session.execute(stmt, [
+        {"target_id": pid, "incoming_qty": qty, "incoming_cost": cost}
+        for pid, (qty, cost) in received.items()
+    ])
+    _check_rowcount(result, len(received))
+
+    now = datetime.utcnow()
+    db.session.execute(insert(transactions_table), [
+        {
+            "user_id": user_id,
+            "product_id": pid,
+            "transaction_type": "purchase",
+            "quantity": qty,
+            "reference_id": reference_id,
+            "notes": notes,
+            "date": now,
+        }
+        for pid, (qty, cost) in received.items()
+    ])
+    return received
+
+
+def _apply_branch_deltas(user_id: str, branch_id: int, deltas: dict) -> None:
+    """Add ``{product_id: delta}`` to one branch's stock rows with one executemany UPDATE."""
+    s = branch_stocks_table
+    result = db.session.execute(
+        update(s).where(
+            s.c.branch_id == branch_id, s.c.product_id == bindparam("target_id"), s.c.user_id == user_id,
+        ).values(quantity=s.c.quantity + bindparam("delta")),
+        [{"target_id": pid, "delta": delta} for pid, delta in deltas.items()],
+    )
+    _check_rowcount(result, len(deltas))
+
+
+def _apply_stock_deltas(user_id: str, deltas: dict, now: datetime, branch_id: int = None) -> None:
+    """Add ``{product_id: delta}`` to stock with one executemany UPDATE (one row per product).
+
+    With a ``branch_id``, the branch's own stock rows are updated as well.
+    """
+    p = products_table
+    result = db.session.execute(
+        update(p).where(p.c.id == bindparam("target_id"), p.c.user_id == user_id).values(
+            stock_quantity=p.c.stock_quantity + bindparam("delta"),
+            version=p.c.version + 1,
+            updated_at=now,
+        ),
+        [{"target_id": pid, "delta": delta} for pid, delta in deltas.items()],
+    )
+    _check_rowcount(result, len(deltas))
+    if branch_id:
+        _apply_branch_deltas(user_id, branch_id, deltas)
+
+
+def issue_stock(user_id: str, lines: list, transaction_type: str = "sale",
+                reference_id: str = "", notes: str = "", branch_id: int = None) -> dict:
+    """Take ``(product_id, quantity)`` lines out of stock, e.g. for a sale.
+
+    Duplicate products are merged, then all products are decremented by one
+    executemany UPDATE and the ledger rows are bulk-inserted with negative
+    quantities. Products of other users are ignored. Stock is taken from
+    ``branch_id``, or the main branch when None. The caller commits.
+
+    Returns ``{product_id: quantity}`` for the merged lines.
+    """
+    issued = {}
+    for product_id, quantity in lines:
+        if product_id and quantity > 0:
+            issued[product_id] = issued.get(product_id, 0.0) + quantity
+    if not issued:
+        return issued
+
+    p = products_table
+    owned = set(db.session.connection().execute(
+        select(p.c.id).where(p.c.user_id == user_id, p.c.id.in_(list(issued)))
+    ).scalars())
+    issued = {pid: qty for pid, qty in issued.items() if pid in owned}
+    if not issued:
+        return issued
+
+    now = datetime.utcnow()
+    _apply_stock_deltas(user_id, {pid: -qty for pid, qty in issued.items()}, now, branch_id)
+    db.session.execute(insert(transactions_table), [
+        {
+            "user_id": user_id,
+            "product_id": pid,
+            "branch_id": branch_id,
+            "transaction_type": transaction_type,
+            "quantity": -qty,
+            "reference_id": reference_id,
+            "notes": notes,
+            "date": now,
+        }
+        for pid, qty in issued.items()
+    ])
+    return issued
+
+
+def issue_stock_batch(user_id: str, lines: list, transaction_type: str = "sale",
+                      branch_id: int = None) -> dict:
+    """Take ``(product_id, quantity, reference_id, notes)`` lines of many invoices out of stock.
+
+    The counterpart of return_stock() for invoices synced in a batch: each
+    product gets one row of a single executemany UPDATE, and the ledger one
+    negative row per line. Stock may go negative when terminals billing
+    offline sold more than was on hand. The caller commits.
+
+    Returns ``{product_id: quantity}`` of the stock taken out.
+    """
+    lines = [line for line in lines if line[0] and line[1] > 0]
+    issued = {}
+    for product_id, quantity, _, _ in lines:
+        issued[product_id] = issued.get(product_id, 0.0) + quantity
+    if not issued:
+        return issued
+
+    now = datetime.utcnow()
+    _apply_stock_deltas(user_id, {pid: -qty for pid, qty in issued.items()}, now, branch_id)
+    db.session.execute(insert(transactions_table), [
+        {
+            "user_id": user_id,
+            "product_id": product_id,
+            "branch_id": branch_id,
+            "transaction_type": transaction_type,
+            "quantity": -quantity,
+            "reference_id": reference_id,
+            "notes": notes,
+            "date": now,
+        }
+        for product_id, quantity, reference_id, notes in lines
+    ])
+    return issued
+
+
+def return_stock(user_id: str, lines: list, transaction_type: str = "return",
+                 branch_id: int = None) -> dict:
+    """Put ``(product_id, quantity, reference_id, notes)`` lines back into stock.
+
+    Used when invoices are voided or deleted. Lines of many invoices are
+    summed per product, so each product gets one row of a single executemany
+    UPDATE however many invoices it appeared on, while the ledger keeps one
+    positive row per (invoice, product) line. Stock goes back to
+    ``branch_id``, or the main branch when None. The caller commits.
+
+    Returns ``{product_id: quantity}`` of the stock put back.
+    """
+    returned = {}
+    for product_id, quantity, _, _ in lines:
+        if product_id and quantity:
+            returned[product_id] = returned.get(product_id, 0.0) + quantity
+    if not returned:
+        return returned
+
+    now = datetime.utcnow()
+    _apply_stock_deltas(user_id, returned, now, branch_id)
+    db.session.execute(insert(transactions_table), [
+        {
+            "user_id": user_id,
+            "product_id": product_id,
+            "branch_id": branch_id,
+            "transaction_type": transaction_type,
+            "quantity": quantity,
+            "reference_id": reference_id,
+            "notes": notes,
+            "date": now,
+        }
+        for product_id, quantity, reference_id, notes in lines
+        if product_id and quantity
+    ])
+    return returned
+
+
+def transfer_stock(user_id: str, lines: list, from_branch: Optional[int], to_branch: Optional[int],
+                   notes: str = "") -> dict:
+    """Move ``(product_id, quantity)`` lines from one branch to another (None for the main branch).
+
+    The store-wide Product.stock_quantity does not change; only the branch
+    stock rows of the two sides are updated, one executemany UPDATE each,
+    and the ledger gets a pair of ``transfer`` rows per product that net to
+    zero. Products of other users are ignored. The caller commits.
+
+    Returns ``{product_id: quantity}`` for the merged lines.
+    """
+    moved = {}
+    for product_id, quantity in lines:
+        if product_id and quantity > 0:
+            moved[product_id] = moved.get(product_id, 0.0) + quantity
+    if not moved or from_branch == to_branch:
+        return {}
+
+    p = products_table
+    owned = set(db.session.connection().execute(
+        select(p.c.id).where(p.c.user_id == user_id, p.c.id.in_(list(moved)))
+    ).scalars())
+    moved = {pid: qty for pid, qty in moved.items() if pid in owned}
+    if not moved:
+        return moved
+
+    if from_branch:
+        _apply_branch_deltas(user_id, from_branch, {pid: -qty for pid, qty in moved.items()})
+    if to_branch:
+        _apply_branch_deltas(user_id, to_branch, moved)
+    now = datetime.utcnow()
+    db.session.execute(insert(transactions_table), [
+        {
+            "user_id": user_id,
+            "product_id": pid,
+            "branch_id": branch_id,
+            "transaction_type": "transfer",
+            "quantity": sign * qty,
+            "reference_id": "",
+            "notes": notes,
+            "date": now,
+        }
+        for pid, qty in moved.items()
+        for branch_id, sign in ((from_branch, -1), (to_branch, 1))
+    ])
+    return moved
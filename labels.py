@@ -0,0 +1,157 @@
+"""
+Server-side barcode and QR label rendering for R Sanju Invoice application.
+
+Codes are encoded once into a module geometry (bars or a QR matrix) and
+drawn as compact SVG paths, or as PNG when Pillow is installed. Both steps
+sit behind LRU caches keyed by (value, symbology, format, size), so printing
+a sheet of the same label many times encodes it only once per process.
+"""
+from functools import lru_cache
+from io import BytesIO
+from typing import NamedTuple
+
+import barcode
+import qrcode
+
+try:
+    from PIL import Image, ImageDraw
+    PNG_ENABLED = True
+except ImportError:
+    PNG_ENABLED = False
+
+
+SYMBOLOGIES = ("code128", "ean13", "qr")
+FORMATS = ("svg", "png")
+
+# Bar height of 1D codes, in modules (roughly 15% of a Code128 SKU's width)
+BAR_HEIGHT = 40
+# Quiet zone around every code, in modules
+QUIET_ZONE = {"code128": 10, "ean13": 9, "qr": 4}
+
+CACHE_SIZE = 2048
+
+
+class LabelError(ValueError):
+    """Raised for values that cannot be encoded in the requested symbology."""
+
+
+class CodeGeometry(NamedTuple):
+    """Dark modules of an encoded code as an SVG path, in module units."""
+    width: int
+    height: int
+    path: str
+
+
+def is_ean13(value: str) -> bool:
+    """True if ``value`` is 13 digits with a valid EAN-13 check digit."""
+    if len(value) != 13 or not value.isdigit():
+        return False
+    digits = [int(d) for d in value]
+    checksum = sum(digits[0:12:2]) + 3 * sum(digits[1:12:2])
+    return (10 - checksum % 10) % 10 == digits[12]
+
+
+def pick_symbology(value: str) -> str:
+    """Use EAN-13 for valid retail barcodes, Code128 for everything else."""
+    return "ean13" if is_ean13(value) else "code128"
+
+
+def _runs_to_path(rows) -> str:
+    """Turn rows of 0/1 modules into horizontal-run rectangles of an SVG path."""
+    parts = []
+    for y, row in enumerate(rows):
+        x = 0
+        width = len(row)
+        while x < width:
+            if row[x]:
+                start = x
+                while x < width and row[x]:
+                    x += 1
+                parts.append(f"M{start} {y}h{x - start}v1h-{x - start}z")
+            else:
+                x += 1
+    return "".join(parts)
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def code_geometry(value: str, symbology: str) -> CodeGeometry:
+    """Encode ``value`` and return its geometry, including the quiet zone."""
+    if not value:
+        raise LabelError("Nothing to encode.")
+    if symbology not in SYMBOLOGIES:
+        raise LabelError(f"Unknown symbology: {symbology}")
+
+    quiet = QUIET_ZONE[symbology]
+
+    if symbology == "qr":
+        code = qrcode.QRCode(border=0, error_correction=qrcode.constants.ERROR_CORRECT_M)
+        code.add_data(value)
+        code.make(fit=True)
+        matrix = code.get_matrix()
+        rows = [[0] * quiet + [int(cell) for cell in row] + [0] * quiet for row in matrix]
+        blank = [0] * (len(matrix) + 2 * quiet)
+        rows = [blank] * quiet + rows + [blank] * quiet
+        return CodeGeometry(len(blank), len(rows), _runs_to_path(rows))
+
+    if symbology == "ean13" and not is_ean13(value):
+        raise LabelError(f"{value} is not a valid EAN-13 barcode.")
+    try:
+        modules = "".join(barcode.get(symbology, value).build())
+    except Exception as e:
+        raise LabelError(f"Cannot encode {value} as {symbology}: {e}")
+
+    row = [0] * quiet + [int(m) for m in modules] + [0] * quiet
+    # 1D codes are a single row stretched vertically: one run per bar
+    bars = _runs_to_path([row]).replace("v1h", f"v{BAR_HEIGHT}h")
+    return CodeGeometry(len(row), BAR_HEIGHT, bars)
+
+
+def svg_symbol(symbol_id: str, geometry: CodeGeometry) -> str:
+    """An SVG <symbol> for a label sheet; labels reference it with <use>."""
+    return (
+        f'<symbol id="{symbol_id}" viewBox="0 0 {geometry.width} {geometry.height}" '
+        f'preserveAspectRatio="none"><path d="{geometry.path}"/></symbol>'
+    )
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def render_code(value: str, symbology: str, fmt: str = "svg", size: int = 2) -> bytes:
+    """Render a standalone SVG or PNG image; ``size`` is pixels per module."""
+    if fmt not in FORMATS:
+        raise LabelError(f"Unknown format: {fmt}")
+    size = max(1, min(int(size), 20))
+    geometry = code_geometry(value, symbology)
+    width, height = geometry.width * size, geometry.height * size
+
+    if fmt == "svg":
+        return (
+            f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}" '
+            f'viewBox="0 0 {geometry.width} {geometry.height}" preserveAspectRatio="none" '
+            f'shape-rendering="crispEdges"><rect width="100%" height="100%" fill="#fff"/>'
+            f'<path d="{geometry.path}"/></svg>'
+        ).encode("utf-8")
+
+    if not PNG_ENABLED:
+        raise LabelError("PNG output needs Pillow; use SVG instead.")
+
+    image = Image.new("1", (width, height), 1)
+    draw = ImageDraw.Draw(image)
+    for segment in geometry.path.split("z"):
+        if not segment:
+            continue
+        # Each segment is "M<x> <y>h<w>v<h>h-<w>"
+        start, rest = segment[1:].split("h", 1)
+        x, y = (int(n) for n in start.split(" "))
+        run, rest = rest.split("v", 1)
+        run_height = int(rest.split("h", 1)[0])
+        draw.rectangle(
+            [x * size, y * size, (x + int(run)) * size - 1, (y + run_height) * size - 1], fill=0
+        )
+    buffer = BytesIO()
+    image.save(buffer, format="PNG", optimize=True)
+    return buffer.getvalue()
+
+
+def cache_info() -> dict:
+    """Hit/miss counters of the geometry and image caches."""
+    return {"geometry": code_geometry.cache_info(), "images": render_code.cache_info()}
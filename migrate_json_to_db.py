@@ -172,6 +172,7 @@ def migrate_data(json_file='data.json', app_config='default'):
                     new_product_id = products_map.get(old_product_id) if old_product_id else None
                     
                     item = InvoiceItem(
+                        user_id=user_id,
                         invoice_id=invoice.id,
                         product_id=new_product_id,
                         description=old_item.get("description", ""),
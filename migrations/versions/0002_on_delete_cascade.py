@@ -0,0 +1,63 @@
+"""database-level ON DELETE CASCADE for tenant and invoice foreign keys
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-19 09:20:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0002'
+down_revision = '0001'
+branch_labels = None
+depends_on = None
+
+
+# Tables created by db.create_all() have unnamed foreign keys on SQLite, so
+# batch mode gives them predictable names through this convention.
+NAMING_CONVENTION = {"fk": "fk_%(table_name)s_%(column_0_name)s_%(referred_table_name)s"}
+
+# (table, column, referred table, ondelete)
+FOREIGN_KEYS = [
+    ('store_settings', 'user_id', 'users', 'CASCADE'),
+    ('products', 'user_id', 'users', 'CASCADE'),
+    ('products', 'supplier_id', 'suppliers', 'SET NULL'),
+    ('suppliers', 'user_id', 'users', 'CASCADE'),
+    ('invoices', 'user_id', 'users', 'CASCADE'),
+    ('invoice_items', 'invoice_id', 'invoices', 'CASCADE'),
+    ('invoice_items', 'product_id', 'products', 'CASCADE'),
+    ('expenses', 'user_id', 'users', 'CASCADE'),
+    ('stock_transactions', 'user_id', 'users', 'CASCADE'),
+    ('stock_transactions', 'product_id', 'products', 'CASCADE'),
+]
+
+
+def _existing_fk_name(table, column):
+    inspector = sa.inspect(op.get_bind())
+    for fk in inspector.get_foreign_keys(table):
+        if fk['constrained_columns'] == [column]:
+            return fk['name']
+    return None
+
+
+def _rewrite_foreign_keys(with_ondelete):
+    for table, column, referred, ondelete in FOREIGN_KEYS:
+        name = f"fk_{table}_{column}_{referred}"
+        existing = _existing_fk_name(table, column) or name
+        with op.batch_alter_table(table, naming_convention=NAMING_CONVENTION) as batch_op:
+            batch_op.drop_constraint(existing, type_='foreignkey')
+            batch_op.create_foreign_key(
+                name, referred, [column], ['id'],
+                ondelete=ondelete if with_ondelete else None,
+            )
+
+
+def upgrade():
+    _rewrite_foreign_keys(with_ondelete=True)
+
+
+def downgrade():
+    _rewrite_foreign_keys(with_ondelete=False)
@@ -0,0 +1,37 @@
+"""invoice item user id
+
+Revision ID: 0012
+Revises: 0011
+Create Date: 2026-10-19 09:36:11.794597
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0012'
+down_revision = '0011'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('invoice_items', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('user_id', sa.String(length=128), nullable=True))
+
+    # Existing lines belong to their invoice's store
+    op.execute(
+        "UPDATE invoice_items SET user_id = "
+        "(SELECT invoices.user_id FROM invoices WHERE invoices.id = invoice_items.invoice_id)"
+    )
+
+    with op.batch_alter_table('invoice_items', schema=None) as batch_op:
+        batch_op.alter_column('user_id', existing_type=sa.String(length=128), nullable=False)
+        batch_op.create_foreign_key('fk_invoice_items_user_id_users', 'users', ['user_id'], ['id'], ondelete='CASCADE')
+
+
+def downgrade():
+    with op.batch_alter_table('invoice_items', schema=None) as batch_op:
+        batch_op.drop_constraint('fk_invoice_items_user_id_users', type_='foreignkey')
+        batch_op.drop_column('user_id')
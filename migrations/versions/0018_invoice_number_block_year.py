@@ -0,0 +1,41 @@
+"""invoice number block year
+
+Revision ID: 0018
+Revises: 0017
+Create Date: 2026-10-19 10:24:19.606830
+
+"""
+from datetime import timedelta
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0018'
+down_revision = '0017'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('invoice_number_blocks', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('year', sa.Integer(), nullable=True))
+
+    # Existing blocks were numbered with the IST year they were reserved in
+    blocks = sa.table('invoice_number_blocks', sa.column('id', sa.Integer), sa.column('created_at', sa.DateTime),
+                      sa.column('year', sa.Integer))
+    connection = op.get_bind()
+    for block_id, created_at in connection.execute(sa.select(blocks.c.id, blocks.c.created_at)).all():
+        connection.execute(
+            blocks.update().where(blocks.c.id == block_id)
+            .values(year=(created_at + timedelta(hours=5, minutes=30)).year)
+        )
+
+    with op.batch_alter_table('invoice_number_blocks', schema=None) as batch_op:
+        batch_op.alter_column('year', existing_type=sa.Integer(), nullable=False)
+
+
+def downgrade():
+    with op.batch_alter_table('invoice_number_blocks', schema=None) as batch_op:
+        batch_op.drop_column('year')
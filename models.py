@@ -4,10 +4,22 @@ All models support multi-tenant architecture with user_id isolation.
 """
 from datetime import datetime
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
 
 db = SQLAlchemy()
 
 
+@event.listens_for(Engine, "connect")
+def _enable_sqlite_foreign_keys(dbapi_connection, connection_record):
+    """SQLite ignores ON DELETE CASCADE unless foreign keys are switched on per connection."""
+    import sqlite3
+    if isinstance(dbapi_connection, sqlite3.Connection):
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA foreign_keys=ON")
+        cursor.close()
+
+
 class User(db.Model):
     """User model - linked to Firebase authentication."""
     __tablename__ = 'users'
@@ -18,23 +30,43 @@ class User(db.Model):
     last_login = db.Column(db.DateTime)
     
     # Relationships
-    store_settings = db.relationship('StoreSettings', backref='user', uselist=False, cascade='all, delete-orphan')
-    invoices = db.relationship('Invoice', backref='user', cascade='all, delete-orphan')
-    products = db.relationship('Product', backref='user', cascade='all, delete-orphan')
-    expenses = db.relationship('Expense', backref='user', cascade='all, delete-orphan')
-    suppliers = db.relationship('Supplier', backref='user', cascade='all, delete-orphan')
-    stock_transactions = db.relationship('StockTransaction', backref='user', cascade='all, delete-orphan')
+    # passive_deletes: deleting a user relies on ON DELETE CASCADE in the
+    # database instead of loading every tenant collection into the session.
+    store_settings = db.relationship('StoreSettings', backref='user', uselist=False, cascade='all, delete-orphan', passive_deletes=True)
+    invoices = db.relationship('Invoice', backref='user', cascade='all, delete-orphan', passive_deletes=True)
+    products = db.relationship('Product', backref='user', cascade='all, delete-orphan', passive_deletes=True)
+    expenses = db.relationship('Expense', backref='user', cascade='all, delete-orphan', passive_deletes=True)
+    suppliers = db.relationship('Supplier', backref='user', cascade='all, delete-orphan', passive_deletes=True)
+    stock_transactions = db.relationship('StockTransaction', backref='user', cascade='all, delete-orphan', passive_deletes=True)
     
     def __repr__(self):
         return f'<User {self.email}>'
 
 
+class ApiToken(db.Model):
+    """Bearer token for the JSON API; only a hash of the token is stored."""
+    __tablename__ = 'api_tokens'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.String(128), db.ForeignKey('users.id', ondelete='CASCADE'), nullable=False, index=True)
+    
+    name = db.Column(db.String(100), nullable=False)
+    token_hash = db.Column(db.String(64), nullable=False, unique=True)
+    token_prefix = db.Column(db.String(12), nullable=False)  # Shown in settings to tell tokens apart
+    
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    last_used_at = db.Column(db.DateTime)
+    
+    def __repr__(self):
+        return f'<ApiToken {self.name} ({self.token_prefix}...)>'
+
+
 class StoreSettings(db.Model):
     """Store configuration settings per user."""
     __tablename__ = 'store_settings'
     
     id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.String(128), db.ForeignKey('users.id'), nullable=False, unique=True)
+    user_id = db.Column(db.String(128), db.ForeignKey('users.id', ondelete='CASCADE'), nullable=False, unique=True)
     
     store_name = db.Column(db.String(255), nullable=False, default='Managekarlo')
     address = db.Column(db.Text)
@@ -43,22 +75,55 @@ class StoreSettings(db.Model):
     logo_data = db.Column(db.LargeBinary)  # Store logo as binary
     logo_filename = db.Column(db.String(255))
     logo_mimetype = db.Column(db.String(100))
+    gstin = db.Column(db.String(15))  # First two digits are the state code
     
     invoice_counter = db.Column(db.Integer, nullable=False, default=0)
+    # Bumped by every write; ORM updates only apply if nobody changed the row since it was read
+    version = db.Column(db.Integer, nullable=False, default=1)
     
     created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
     
+    __mapper_args__ = {'version_id_col': version}
+    
     def __repr__(self):
         return f'<StoreSettings {self.store_name}>'
 
 
+class Branch(db.Model):
+    """A further shop of a store.
+    
+    Rows with no branch_id (invoices, expenses, stock movements) belong to
+    the store's main branch, so single-shop stores and data from before
+    branches existed need no branch rows at all.
+    """
+    __tablename__ = 'branches'
+    __table_args__ = (
+        db.Index('uq_branches_user_id_name', 'user_id', 'name', unique=True),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.String(128), db.ForeignKey('users.id', ondelete='CASCADE'), nullable=False)
+    
+    name = db.Column(db.String(100), nullable=False)
+    address = db.Column(db.Text)
+    
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<Branch {self.name}>'
+
+
 class Product(db.Model):
     """Product/inventory item."""
     __tablename__ = 'products'
+    __table_args__ = (
+        db.Index('ix_products_user_id_name', 'user_id', 'name'),
+        db.Index('uq_products_user_id_sku', 'user_id', 'sku', unique=True),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.String(128), db.ForeignKey('users.id'), nullable=False, index=True)
+    user_id = db.Column(db.String(128), db.ForeignKey('users.id', ondelete='CASCADE'), nullable=False)
     
     name = db.Column(db.String(255), nullable=False)
     description = db.Column(db.Text)
@@ -72,14 +137,23 @@ class Product(db.Model):
     stock_quantity = db.Column(db.Float, nullable=False, default=0.0)
     min_stock_level = db.Column(db.Float, nullable=False, default=0.0)
     
-    supplier_id = db.Column(db.Integer, db.ForeignKey('suppliers.id'), nullable=True)
+    # GST
+    hsn_code = db.Column(db.String(20))
+    gst_rate = db.Column(db.Float, nullable=False, default=0.0)  # Percent, e.g. 18
+    
+    supplier_id = db.Column(db.Integer, db.ForeignKey('suppliers.id', ondelete='SET NULL'), nullable=True)
+    
+    # Bumped by every write, including the stock engine's atomic UPDATEs
+    version = db.Column(db.Integer, nullable=False, default=1)
     
     created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
     
+    __mapper_args__ = {'version_id_col': version}
+    
     # Relationships
-    invoice_items = db.relationship('InvoiceItem', backref='product', cascade='all, delete-orphan')
-    stock_transactions = db.relationship('StockTransaction', backref='product', cascade='all, delete-orphan')
+    invoice_items = db.relationship('InvoiceItem', backref='product', cascade='all, delete-orphan', passive_deletes=True)
+    stock_transactions = db.relationship('StockTransaction', backref='product', cascade='all, delete-orphan', passive_deletes=True)
     
     def __repr__(self):
         return f'<Product {self.name} ({self.sku})>'
@@ -98,6 +172,8 @@ class Product(db.Model):
             'cost_price': self.cost_price,
             'stock_quantity': self.stock_quantity,
             'min_stock_level': self.min_stock_level,
+            'hsn_code': self.hsn_code or '',
+            'gst_rate': self.gst_rate or 0.0,
         }
 
 
@@ -106,7 +182,7 @@ class Supplier(db.Model):
     __tablename__ = 'suppliers'
     
     id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.String(128), db.ForeignKey('users.id'), nullable=False, index=True)
+    user_id = db.Column(db.String(128), db.ForeignKey('users.id', ondelete='CASCADE'), nullable=False, index=True)
     
     name = db.Column(db.String(255), nullable=False)
     contact_person = db.Column(db.String(255))
@@ -118,7 +194,7 @@ class Supplier(db.Model):
     updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     # Relationships
-    products = db.relationship('Product', backref='supplier')
+    products = db.relationship('Product', backref='supplier', passive_deletes=True)
     
     def __repr__(self):
         return f'<Supplier {self.name}>'
@@ -127,9 +203,16 @@ class Supplier(db.Model):
 class Invoice(db.Model):
     """Sales invoice."""
     __tablename__ = 'invoices'
+    __table_args__ = (
+        db.Index('ix_invoices_user_id_created_at', 'user_id', 'created_at', 'id'),
+        db.Index('ix_invoices_user_id_invoice_date', 'user_id', 'invoice_date'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.String(128), db.ForeignKey('users.id'), nullable=False, index=True)
+    user_id = db.Column(db.String(128), db.ForeignKey('users.id', ondelete='CASCADE'), nullable=False)
+    
+    # None for the main branch
+    branch_id = db.Column(db.Integer, db.ForeignKey('branches.id', ondelete='SET NULL'), nullable=True)
     
     invoice_number = db.Column(db.String(50), nullable=False, unique=True, index=True)
     invoice_date = db.Column(db.Date, nullable=False, index=True)
@@ -152,11 +235,18 @@ class Invoice(db.Model):
     
     notes = db.Column(db.Text)
     
+    # active, or void: a voided invoice keeps its number but its stock is returned
+    # and it no longer counts in reports
+    status = db.Column(db.String(20), nullable=False, default='active')
+    voided_at = db.Column(db.DateTime)
+    
     created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, index=True)
     updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     # Relationships
-    items = db.relationship('InvoiceItem', backref='invoice', cascade='all, delete-orphan', lazy='joined')
+    # Loaded lazily; routes that render line items ask for selectinload().
+    items = db.relationship('InvoiceItem', backref='invoice', cascade='all, delete-orphan', passive_deletes=True)
+    tax_summaries = db.relationship('InvoiceTaxSummary', backref='invoice', cascade='all, delete-orphan', passive_deletes=True)
     
     def __repr__(self):
         return f'<Invoice {self.invoice_number}>'
@@ -167,30 +257,130 @@ class InvoiceItem(db.Model):
     __tablename__ = 'invoice_items'
     
     id = db.Column(db.Integer, primary_key=True)
-    invoice_id = db.Column(db.Integer, db.ForeignKey('invoices.id'), nullable=False, index=True)
-    product_id = db.Column(db.Integer, db.ForeignKey('products.id'), nullable=True)
+    # Copied from the invoice so lines can be partitioned by tenant (see partitioning.py)
+    user_id = db.Column(db.String(128), db.ForeignKey('users.id', ondelete='CASCADE'), nullable=False)
+    invoice_id = db.Column(db.Integer, db.ForeignKey('invoices.id', ondelete='CASCADE'), nullable=False, index=True)
+    product_id = db.Column(db.Integer, db.ForeignKey('products.id', ondelete='CASCADE'), nullable=True)
     
     description = db.Column(db.String(500), nullable=False)
     quantity = db.Column(db.Float, nullable=False)
     unit_price = db.Column(db.Float, nullable=False)
     line_total = db.Column(db.Float, nullable=False)
     
+    # GST at the time of sale; taxable_value is line_total less its share of the discount
+    hsn_code = db.Column(db.String(20))
+    gst_rate = db.Column(db.Float, nullable=False, default=0.0)
+    taxable_value = db.Column(db.Float, nullable=False, default=0.0)
+    cgst = db.Column(db.Float, nullable=False, default=0.0)
+    sgst = db.Column(db.Float, nullable=False, default=0.0)
+    igst = db.Column(db.Float, nullable=False, default=0.0)
+    
     def __repr__(self):
         return f'<InvoiceItem {self.description} x{self.quantity}>'
 
 
+class InvoiceTaxSummary(db.Model):
+    """Tax totals of one invoice at one GST rate, written when the invoice is saved.
+    
+    Monthly GSTR-1 summaries aggregate these rows in SQL instead of
+    re-reading every invoice line.
+    """
+    __tablename__ = 'invoice_tax_summaries'
+    __table_args__ = (
+        db.Index('ix_invoice_tax_summaries_user_id_invoice_date', 'user_id', 'invoice_date'),
+        db.Index('uq_invoice_tax_summaries_invoice_id_gst_rate', 'invoice_id', 'gst_rate', unique=True),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.String(128), db.ForeignKey('users.id', ondelete='CASCADE'), nullable=False)
+    invoice_id = db.Column(db.Integer, db.ForeignKey('invoices.id', ondelete='CASCADE'), nullable=False)
+    invoice_date = db.Column(db.Date, nullable=False)
+    
+    supply_type = db.Column(db.String(10), nullable=False)  # B2B (customer GSTIN given) or B2C
+    inter_state = db.Column(db.Boolean, nullable=False, default=False)
+    gst_rate = db.Column(db.Float, nullable=False)
+    taxable_value = db.Column(db.Float, nullable=False, default=0.0)
+    cgst = db.Column(db.Float, nullable=False, default=0.0)
+    sgst = db.Column(db.Float, nullable=False, default=0.0)
+    igst = db.Column(db.Float, nullable=False, default=0.0)
+    
+    def __repr__(self):
+        return f'<InvoiceTaxSummary invoice={self.invoice_id} {self.gst_rate}%>'
+
+
+class IdempotencyKey(db.Model):
+    """Client-generated key of an invoice submission and the invoice it created.
+    
+    A retried submission carrying the same key gets the original invoice
+    back instead of creating a duplicate (see services.create_invoice_once).
+    """
+    __tablename__ = 'idempotency_keys'
+    __table_args__ = (
+        db.Index('uq_idempotency_keys_user_id_key', 'user_id', 'key', unique=True),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.String(128), db.ForeignKey('users.id', ondelete='CASCADE'), nullable=False)
+    key = db.Column(db.String(64), nullable=False)
+    # Set in the same transaction that claims the key
+    invoice_id = db.Column(db.Integer, db.ForeignKey('invoices.id', ondelete='CASCADE'), nullable=True)
+    
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<IdempotencyKey {self.key} invoice={self.invoice_id}>'
+
+
+class InvoiceNumberBlock(db.Model):
+    """A run of invoice numbers reserved for one billing terminal.
+    
+    Terminals that bill offline number their invoices from their own blocks,
+    so numbers never clash however long they stay offline; the numbers come
+    out of StoreSettings.invoice_counter like any other invoice's.
+    """
+    __tablename__ = 'invoice_number_blocks'
+    __table_args__ = (
+        db.Index('ix_invoice_number_blocks_user_id_terminal_id', 'user_id', 'terminal_id'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.String(128), db.ForeignKey('users.id', ondelete='CASCADE'), nullable=False)
+    terminal_id = db.Column(db.String(64), nullable=False)
+    
+    # Counter values first..last, inclusive
+    first = db.Column(db.Integer, nullable=False)
+    last = db.Column(db.Integer, nullable=False)
+    # Year in the numbers, fixed when the block is reserved as for any invoice numbered then
+    year = db.Column(db.Integer, nullable=False)
+    
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<InvoiceNumberBlock {self.terminal_id} {self.first}-{self.last}>'
+
+
 class Expense(db.Model):
     """Business expense tracking."""
     __tablename__ = 'expenses'
+    __table_args__ = (
+        db.Index('ix_expenses_user_id_date_id', 'user_id', 'date', 'id'),
+        db.Index('ix_expenses_user_id_import_hash', 'user_id', 'import_hash'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.String(128), db.ForeignKey('users.id'), nullable=False, index=True)
+    user_id = db.Column(db.String(128), db.ForeignKey('users.id', ondelete='CASCADE'), nullable=False)
+    
+    # None for the main branch
+    branch_id = db.Column(db.Integer, db.ForeignKey('branches.id', ondelete='SET NULL'), nullable=True)
     
     date = db.Column(db.Date, nullable=False, index=True)
     description = db.Column(db.String(500), nullable=False)
     category = db.Column(db.String(100), index=True)
     amount = db.Column(db.Float, nullable=False)
     
+    # Hash of (date, amount, description) used to skip duplicates on import
+    import_hash = db.Column(db.String(64))
+    
     created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
     
     def __repr__(self):
@@ -200,12 +390,18 @@ class Expense(db.Model):
 class StockTransaction(db.Model):
     """Stock movement history."""
     __tablename__ = 'stock_transactions'
+    __table_args__ = (
+        db.Index('ix_stock_transactions_user_id_date', 'user_id', 'date'),
+        db.Index('ix_stock_transactions_product_id_date', 'product_id', 'date'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.String(128), db.ForeignKey('users.id'), nullable=False, index=True)
-    product_id = db.Column(db.Integer, db.ForeignKey('products.id'), nullable=False, index=True)
+    user_id = db.Column(db.String(128), db.ForeignKey('users.id', ondelete='CASCADE'), nullable=False)
+    product_id = db.Column(db.Integer, db.ForeignKey('products.id', ondelete='CASCADE'), nullable=False)
+    # Branch whose stock moved; None for the main branch
+    branch_id = db.Column(db.Integer, db.ForeignKey('branches.id', ondelete='SET NULL'), nullable=True)
     
-    transaction_type = db.Column(db.String(50), nullable=False)  # sale, purchase, adjustment, return
+    transaction_type = db.Column(db.String(50), nullable=False)  # sale, purchase, adjustment, return, transfer
     quantity = db.Column(db.Float, nullable=False)
     reference_id = db.Column(db.String(100))  # Invoice ID, PO ID, etc.
     notes = db.Column(db.Text)
@@ -214,3 +410,208 @@ class StockTransaction(db.Model):
     
     def __repr__(self):
         return f'<StockTransaction {self.transaction_type} {self.quantity}>'
+
+
+class BranchStock(db.Model):
+    """Stock of one product at one branch.
+    
+    Product.stock_quantity stays the store-wide total; the main branch holds
+    whatever of it is not at a branch. Every product has a row for every
+    branch, so stock moves are plain UPDATEs.
+    """
+    __tablename__ = 'branch_stocks'
+    __table_args__ = (
+        db.Index('uq_branch_stocks_branch_id_product_id', 'branch_id', 'product_id', unique=True),
+        db.Index('ix_branch_stocks_user_id', 'user_id'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.String(128), db.ForeignKey('users.id', ondelete='CASCADE'), nullable=False)
+    branch_id = db.Column(db.Integer, db.ForeignKey('branches.id', ondelete='CASCADE'), nullable=False)
+    product_id = db.Column(db.Integer, db.ForeignKey('products.id', ondelete='CASCADE'), nullable=False)
+    
+    quantity = db.Column(db.Float, nullable=False, default=0.0)
+    
+    def __repr__(self):
+        return f'<BranchStock branch={self.branch_id} product={self.product_id} {self.quantity}>'
+
+
+class StockSnapshot(db.Model):
+    """Per-product stock checkpoint taken from Product.stock_quantity.
+    
+    A snapshot covers every StockTransaction dated before ``as_of``, so a
+    point-in-time valuation only replays the ledger after the latest one.
+    """
+    __tablename__ = 'stock_snapshots'
+    __table_args__ = (
+        db.Index('ix_stock_snapshots_user_id_as_of', 'user_id', 'as_of'),
+        db.Index('uq_stock_snapshots_product_id_as_of', 'product_id', 'as_of', unique=True),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.String(128), db.ForeignKey('users.id', ondelete='CASCADE'), nullable=False)
+    product_id = db.Column(db.Integer, db.ForeignKey('products.id', ondelete='CASCADE'), nullable=False)
+    
+    as_of = db.Column(db.DateTime, nullable=False)
+    quantity = db.Column(db.Float, nullable=False)
+    unit_cost = db.Column(db.Float, nullable=False, default=0.0)
+    
+    def __repr__(self):
+        return f'<StockSnapshot product={self.product_id} {self.as_of} qty={self.quantity}>'
+
+
+class InvoiceArchive(db.Model):
+    """One closed financial year of a store's invoices and stock ledger, in cold storage.
+    
+    archival.py moves the rows out of the hot tables into the compressed
+    column-wise blobs below; ``summary`` keeps the monthly totals and GST
+    rollups so reports on the year do not need to unpack them.
+    """
+    __tablename__ = 'invoice_archives'
+    __table_args__ = (
+        db.Index('uq_invoice_archives_user_id_financial_year', 'user_id', 'financial_year', unique=True),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.String(128), db.ForeignKey('users.id', ondelete='CASCADE'), nullable=False)
+    financial_year = db.Column(db.Integer, nullable=False)  # 2023 is April 2023 - March 2024
+    
+    invoice_count = db.Column(db.Integer, nullable=False, default=0)
+    ledger_count = db.Column(db.Integer, nullable=False, default=0)
+    # Range of the archived invoice ids, to find the archive holding an id
+    min_invoice_id = db.Column(db.Integer)
+    max_invoice_id = db.Column(db.Integer)
+    summary = db.Column(db.Text, nullable=False)  # JSON, see archival.month_summary()
+    
+    invoices = db.Column(db.LargeBinary, nullable=False)
+    invoice_items = db.Column(db.LargeBinary, nullable=False)
+    tax_summaries = db.Column(db.LargeBinary, nullable=False)
+    stock_transactions = db.Column(db.LargeBinary, nullable=False)
+    
+    archived_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<InvoiceArchive {self.user_id} FY{self.financial_year}>'
+
+
+class PurchaseOrder(db.Model):
+    """Purchase order raised against a supplier."""
+    __tablename__ = 'purchase_orders'
+    __table_args__ = (
+        db.Index('ix_purchase_orders_user_id_created_at', 'user_id', 'created_at'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.String(128), db.ForeignKey('users.id', ondelete='CASCADE'), nullable=False)
+    supplier_id = db.Column(db.Integer, db.ForeignKey('suppliers.id', ondelete='SET NULL'), nullable=True)
+    
+    po_number = db.Column(db.String(50), nullable=False)
+    status = db.Column(db.String(20), nullable=False, default='ordered')  # ordered, partial, received
+    order_date = db.Column(db.Date, nullable=False)
+    notes = db.Column(db.Text)
+    
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    # Relationships
+    supplier = db.relationship('Supplier')
+    items = db.relationship('PurchaseOrderItem', backref='purchase_order', cascade='all, delete-orphan', passive_deletes=True)
+    
+    def __repr__(self):
+        return f'<PurchaseOrder {self.po_number}>'
+
+
+class PurchaseOrderItem(db.Model):
+    """Line item in a purchase order."""
+    __tablename__ = 'purchase_order_items'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    purchase_order_id = db.Column(db.Integer, db.ForeignKey('purchase_orders.id', ondelete='CASCADE'), nullable=False, index=True)
+    product_id = db.Column(db.Integer, db.ForeignKey('products.id', ondelete='CASCADE'), nullable=False)
+    
+    quantity = db.Column(db.Float, nullable=False)
+    unit_cost = db.Column(db.Float, nullable=False, default=0.0)
+    received_quantity = db.Column(db.Float, nullable=False, default=0.0)
+    
+    # Relationships
+    product = db.relationship('Product')
+    
+    def __repr__(self):
+        return f'<PurchaseOrderItem product={self.product_id} x{self.quantity}>'
+
+
+class GoodsReceipt(db.Model):
+    """Goods received note: one delivery applied to stock in a single transaction."""
+    __tablename__ = 'goods_receipts'
+    __table_args__ = (
+        db.Index('ix_goods_receipts_user_id_received_at', 'user_id', 'received_at'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.String(128), db.ForeignKey('users.id', ondelete='CASCADE'), nullable=False)
+    purchase_order_id = db.Column(db.Integer, db.ForeignKey('purchase_orders.id', ondelete='SET NULL'), nullable=True, index=True)
+    supplier_id = db.Column(db.Integer, db.ForeignKey('suppliers.id', ondelete='SET NULL'), nullable=True)
+    
+    grn_number = db.Column(db.String(50), nullable=False)
+    total_cost = db.Column(db.Float, nullable=False, default=0.0)
+    notes = db.Column(db.Text)
+    
+    received_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    
+    # Relationships
+    supplier = db.relationship('Supplier')
+    purchase_order = db.relationship('PurchaseOrder')
+    items = db.relationship('GoodsReceiptItem', backref='goods_receipt', cascade='all, delete-orphan', passive_deletes=True)
+    
+    def __repr__(self):
+        return f'<GoodsReceipt {self.grn_number}>'
+
+
+class GoodsReceiptItem(db.Model):
+    """Line item in a goods received note."""
+    __tablename__ = 'goods_receipt_items'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    goods_receipt_id = db.Column(db.Integer, db.ForeignKey('goods_receipts.id', ondelete='CASCADE'), nullable=False, index=True)
+    product_id = db.Column(db.Integer, db.ForeignKey('products.id', ondelete='CASCADE'), nullable=False)
+    
+    quantity = db.Column(db.Float, nullable=False)
+    unit_cost = db.Column(db.Float, nullable=False, default=0.0)
+    
+    def __repr__(self):
+        return f'<GoodsReceiptItem product={self.product_id} x{self.quantity}>'
+
+
+class ReorderSuggestion(db.Model):
+    """A product the reorder engine says to buy, from its last run.
+    
+    reorder.py replaces a store's rows on every run; the inventory pages
+    read them instead of recomputing the forecast on each request.
+    """
+    __tablename__ = 'reorder_suggestions'
+    __table_args__ = (
+        db.Index('ix_reorder_suggestions_user_id_supplier_id', 'user_id', 'supplier_id'),
+        db.Index('uq_reorder_suggestions_product_id', 'product_id', unique=True),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.String(128), db.ForeignKey('users.id', ondelete='CASCADE'), nullable=False)
+    product_id = db.Column(db.Integer, db.ForeignKey('products.id', ondelete='CASCADE'), nullable=False)
+    supplier_id = db.Column(db.Integer, db.ForeignKey('suppliers.id', ondelete='SET NULL'), nullable=True)
+    
+    weekly_demand = db.Column(db.Float, nullable=False, default=0.0)  # Forecast units per week
+    safety_stock = db.Column(db.Float, nullable=False, default=0.0)
+    reorder_point = db.Column(db.Float, nullable=False, default=0.0)
+    on_hand = db.Column(db.Float, nullable=False, default=0.0)
+    on_order = db.Column(db.Float, nullable=False, default=0.0)  # Outstanding on open purchase orders
+    quantity = db.Column(db.Float, nullable=False)  # Suggested order quantity
+    unit_cost = db.Column(db.Float, nullable=False, default=0.0)
+    
+    computed_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    
+    # Relationships
+    product = db.relationship('Product')
+    supplier = db.relationship('Supplier')
+    
+    def __repr__(self):
+        return f'<ReorderSuggestion product={self.product_id} x{self.quantity}>'
@@ -0,0 +1,53 @@
+"""
+PostgreSQL partitioning job for R Sanju Invoice application.
+Run this once, after `flask --app app db upgrade`, to partition invoices,
+invoice items and the stock ledger (see partitioning.py). Running it again
+only adds the stock ledger's partition for the coming financial year, so
+it can also be scheduled (e.g. a monthly Render cron job).
+"""
+import os
+import sys
+from pathlib import Path
+
+# Add parent directory to path to import modules
+sys.path.insert(0, str(Path(__file__).parent))
+
+from flask import Flask
+from models import db
+from config import config
+from partitioning import partition_tables
+from services import unit_of_work
+
+
+def run_partitioning(app_config='default'):
+    """
+    Partition the large tables that are not partitioned yet.
+    
+    Args:
+        app_config: Configuration to use ('development', 'production', or 'default')
+    """
+    app = Flask(__name__)
+    app.config.from_object(config[app_config])
+    db.init_app(app)
+    
+    with app.app_context():
+        with unit_of_work():
+            converted = partition_tables(db.session.connection(), app.config['PARTITION_COUNT'])
+        if converted:
+            print(f"✓ Partitioned {', '.join(converted)}")
+        else:
+            print("✓ Tables already partitioned; ledger partitions are up to date")
+    
+    return converted
+
+
+if __name__ == '__main__':
+    env = os.environ.get('FLASK_ENV', 'development')
+    
+    try:
+        run_partitioning(env)
+    except Exception as e:
+        print(f"\n❌ Error partitioning tables: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
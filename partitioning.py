@@ -0,0 +1,188 @@
+"""
+Opt-in PostgreSQL table partitioning for R Sanju Invoice application.
+
+models.py and the migrations describe ordinary tables; that is what SQLite
+and a new PostgreSQL database get. Once a PostgreSQL database grows,
+``python partition_tables.py`` converts the biggest tables in place:
+
+- invoices and invoice_items are partitioned by HASH (user_id), so each
+  store's rows sit in one smaller heap with smaller indexes, and per-store
+  queries (which always filter on user_id) only touch that partition.
+- stock_transactions is partitioned by RANGE (date), one partition per
+  financial year (April to March), so old years can be detached whole and
+  recent-ledger scans skip them.
+
+PostgreSQL requires the primary key and unique indexes of a partitioned
+table to include the partition key. After conversion the primary keys are
+(id, user_id) and (id, date), invoice numbers are unique per store, and
+foreign keys to invoices become (invoice_id, user_id). Ids still come from
+the same sequences, so the ORM keeps addressing rows by id alone.
+"""
+from datetime import date
+
+from sqlalchemy import text
+
+from models import db, Invoice, InvoiceItem, StockTransaction
+
+
+DEFAULT_HASH_PARTITIONS = 16
+
+# Converted together, in this order: invoices must have its (id, user_id)
+# key before invoice_items can refer to it
+HASH_PARTITIONED = (Invoice.__table__, InvoiceItem.__table__)
+LEDGER = StockTransaction.__table__
+
+
+def financial_year(day: date) -> int:
+    """The calendar year in which the April-March financial year containing ``day`` starts."""
+    return day.year if day.month >= 4 else day.year - 1
+
+
+def partitioned_tables(connection) -> set:
+    """Names of partitioned parent tables; always empty off PostgreSQL."""
+    if connection.dialect.name != "postgresql":
+        return set()
+    return set(connection.execute(text(
+        "SELECT c.relname FROM pg_partitioned_table p JOIN pg_class c ON c.oid = p.partrelid "
+        "WHERE c.relnamespace = current_schema()::regnamespace"
+    )).scalars())
+
+
+def partition_names(connection) -> set:
+    """Names of the partitions themselves, which are not in models.py."""
+    if connection.dialect.name != "postgresql":
+        return set()
+    return set(connection.execute(text(
+        "SELECT relname FROM pg_class "
+        "WHERE relispartition AND relnamespace = current_schema()::regnamespace"
+    )).scalars())
+
+
+def _foreign_key_sql(fk, hashed: set) -> str:
+    """ADD CONSTRAINT for a models.py foreign key, widened to (column, user_id) for hashed tables."""
+    table = fk.parent.name
+    columns = [column.name for column in fk.columns]
+    referred = fk.referred_table.name
+    referred_columns = [element.column.name for element in fk.elements]
+    if referred in hashed:
+        columns.append("user_id")
+        referred_columns.append("user_id")
+    # Same names as migration 0002 gives them
+    name = fk.name or f"fk_{table}_{columns[0]}_{referred}"
+    sql = (f"ALTER TABLE {table} ADD CONSTRAINT {name} FOREIGN KEY ({', '.join(columns)}) "
+           f"REFERENCES {referred} ({', '.join(referred_columns)})")
+    if fk.ondelete:
+        sql += f" ON DELETE {fk.ondelete}"
+    return sql
+
+
+def _rebuild_partitioned(connection, table, partition_by: str, key: str, partitions: list) -> None:
+    """Swap ``table`` for a partitioned copy holding the same rows.
+
+    ``partitions`` are ``(suffix, bound)`` pairs. Indexes come from models.py,
+    with ``key`` appended to unique ones. Foreign keys pointing at the old
+    table are dropped with it; the caller adds them back.
+    """
+    name = table.name
+    old = f"{name}_unpartitioned"
+    execute = connection.exec_driver_sql
+
+    execute(f"ALTER TABLE {name} RENAME TO {old}")
+    execute(f"CREATE TABLE {name} (LIKE {old} INCLUDING DEFAULTS INCLUDING STORAGE) "
+            f"PARTITION BY {partition_by}")
+    for suffix, bound in partitions:
+        execute(f"CREATE TABLE {name}_{suffix} PARTITION OF {name} {bound}")
+    execute(f"INSERT INTO {name} SELECT * FROM {old}")
+
+    # The id sequence belongs to the old table and would be dropped with it
+    sequence = connection.execute(text("SELECT pg_get_serial_sequence(:t, 'id')"), {"t": old}).scalar()
+    if sequence:
+        execute(f"ALTER SEQUENCE {sequence} OWNED BY {name}.id")
+    execute(f"DROP TABLE {old} CASCADE")
+
+    execute(f"ALTER TABLE {name} ADD CONSTRAINT {name}_pkey PRIMARY KEY (id, {key})")
+    for index in table.indexes:
+        columns = [column.name for column in index.columns]
+        if index.unique and key not in columns:
+            columns.append(key)
+        unique = "UNIQUE " if index.unique else ""
+        execute(f"CREATE {unique}INDEX {index.name} ON {name} ({', '.join(columns)})")
+
+
+def ensure_ledger_partitions(connection, through: date) -> list:
+    """Create the stock ledger's yearly partitions up to the financial year after ``through``.
+
+    Run ahead of time: a year's partition cannot be created once rows for
+    it have landed in the default partition. Returns the partitions created.
+    """
+    if LEDGER.name not in partitioned_tables(connection):
+        return []
+    prefix = f"{LEDGER.name}_fy"
+    years = [int(name[len(prefix):]) for name in partition_names(connection)
+             if name.startswith(prefix) and name[len(prefix):].isdigit()]
+    start = max(years) + 1 if years else financial_year(through)
+
+    created = []
+    for year in range(start, financial_year(through) + 2):
+        partition = f"{prefix}{year}"
+        connection.exec_driver_sql(
+            f"CREATE TABLE {partition} PARTITION OF {LEDGER.name} "
+            f"FOR VALUES FROM ('{year}-04-01') TO ('{year + 1}-04-01')"
+        )
+        created.append(partition)
+    return created
+
+
+def partition_tables(connection, hash_partitions: int = DEFAULT_HASH_PARTITIONS,
+                     today: date = None) -> list:
+    """Partition whichever of the tables are not partitioned yet; returns their names.
+
+    Safe to run again: partitioned tables are skipped and only missing
+    ledger years are added. Everything happens in the caller's transaction,
+    which holds exclusive locks on the tables until it commits.
+    """
+    if connection.dialect.name != "postgresql":
+        raise RuntimeError("Table partitioning needs PostgreSQL; SQLite keeps ordinary tables.")
+    today = today or date.today()
+    existing = partitioned_tables(connection)
+    hashed = {table.name for table in HASH_PARTITIONED}
+    converting = [table for table in HASH_PARTITIONED if table.name not in existing]
+
+    for table in converting:
+        bounds = [
+            (f"p{remainder}", f"FOR VALUES WITH (MODULUS {hash_partitions}, REMAINDER {remainder})")
+            for remainder in range(hash_partitions)
+        ]
+        _rebuild_partitioned(connection, table, "HASH (user_id)", "user_id", bounds)
+        for fk in table.foreign_key_constraints:
+            connection.exec_driver_sql(_foreign_key_sql(fk, hashed))
+
+    # Foreign keys from other tables that pointed at the rebuilt ones
+    rebuilt = {table.name for table in converting}
+    for other in db.metadata.sorted_tables:
+        if other.name in rebuilt:
+            continue
+        for fk in other.foreign_key_constraints:
+            if fk.referred_table.name in rebuilt:
+                connection.exec_driver_sql(_foreign_key_sql(fk, hashed))
+
+    converted = [table.name for table in converting]
+    if LEDGER.name not in existing:
+        first = connection.execute(text(f"SELECT min(date) FROM {LEDGER.name}")).scalar()
+        start = financial_year(first.date() if first else today)
+        bounds = [
+            (f"fy{year}", f"FOR VALUES FROM ('{year}-04-01') TO ('{year + 1}-04-01')")
+            for year in range(start, financial_year(today) + 2)
+        ]
+        # Catches rows dated outside every year instead of failing the insert
+        bounds.append(("default", "DEFAULT"))
+        _rebuild_partitioned(connection, LEDGER, "RANGE (date)", "date", bounds)
+        for fk in LEDGER.foreign_key_constraints:
+            connection.exec_driver_sql(_foreign_key_sql(fk, hashed))
+        converted.append(LEDGER.name)
+    else:
+        ensure_ledger_partitions(connection, today)
+
+    for name in converted:
+        connection.exec_driver_sql(f"ANALYZE {name}")
+    return converted
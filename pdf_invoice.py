@@ -0,0 +1,333 @@
+"""
+PDF invoice rendering for R Sanju Invoice application.
+
+Invoices are drawn with fpdf2, a pure-Python PDF writer, using its built-in
+Helvetica font, so there are no font files to load. Everything that depends
+only on the store settings is compiled once into an InvoiceLayout and cached
+per settings version: the header lines, the column widths and the logo,
+already downscaled to PNG. Batch rendering runs in a process pool whose
+workers receive that layout once at start-up instead of with every invoice,
+and stream_zip packs the results into a ZIP as they complete.
+"""
+import hashlib
+import os
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from datetime import timezone, timedelta
+from functools import lru_cache
+from io import BytesIO
+from pathlib import Path
+from typing import NamedTuple, Optional
+
+from fpdf import FPDF
+from fpdf.enums import XPos, YPos
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+
+IST = timezone(timedelta(hours=5, minutes=30))
+
+DEFAULT_LOGO = Path(__file__).parent / "static" / "images" / "managekarlo-logo.png"
+
+# Column widths (mm) of the item table on an A4 page with 15 mm margins
+ITEM_COLUMNS = (("#", 10, "C"), ("Description", 90, "L"), ("Qty", 20, "R"), ("Rate", 30, "R"), ("Amount", 30, "R"))
+LOGO_MAX_PX = 300
+
+
+class InvoiceLayout(NamedTuple):
+    """Store-dependent parts of the invoice page, compiled once per settings version."""
+    version: str
+    store_name: str
+    header_lines: tuple
+    logo_png: Optional[bytes]
+
+
+def _text(value) -> str:
+    """Core PDF fonts are Latin-1 only; spell out the rupee sign and drop the rest."""
+    text = "" if value is None else str(value)
+    return text.replace("₹", "Rs.").encode("latin-1", "replace").decode("latin-1")
+
+
+def _money(amount) -> str:
+    return f"Rs. {amount or 0:,.2f}"
+
+
+@lru_cache(maxsize=64)
+def _prepare_logo(data: bytes) -> Optional[bytes]:
+    """Downscale a logo to a small PNG once, so each PDF embeds only a thumbnail."""
+    if not data:
+        return None
+    if Image is None:
+        return data
+    try:
+        image = Image.open(BytesIO(data))
+        image.thumbnail((LOGO_MAX_PX, LOGO_MAX_PX))
+        if image.mode not in ("RGB", "RGBA", "L"):
+            image = image.convert("RGBA")
+        buffer = BytesIO()
+        image.save(buffer, format="PNG", optimize=True)
+        return buffer.getvalue()
+    except Exception:
+        return None
+
+
+@lru_cache(maxsize=1)
+def _default_logo() -> bytes:
+    return DEFAULT_LOGO.read_bytes() if DEFAULT_LOGO.exists() else b""
+
+
+_layouts = {}
+
+
+def get_layout(settings) -> InvoiceLayout:
+    """Compiled layout for a StoreSettings row, reused until its printed fields change."""
+    logo = settings.logo_data or _default_logo()
+    fingerprint = hashlib.md5(repr((
+        settings.user_id, settings.store_name, settings.address, settings.phone, settings.email,
+        settings.gstin,
+    )).encode("utf-8") + logo).hexdigest()
+
+    layout = _layouts.get(settings.user_id)
+    if layout is None or layout.version != fingerprint:
+        header_lines = tuple(
+            _text(line) for line in (
+                settings.address or "",
+                f"Phone: {settings.phone}" if settings.phone else "",
+                f"Email: {settings.email}" if settings.email else "",
+                f"GSTIN: {settings.gstin}" if settings.gstin else "",
+            ) if line
+        )
+        layout = InvoiceLayout(
+            version=fingerprint,
+            store_name=_text(settings.store_name or "Managekarlo"),
+            header_lines=header_lines,
+            logo_png=_prepare_logo(logo),
+        )
+        _layouts[settings.user_id] = layout
+    return layout
+
+
+def _new_pdf() -> FPDF:
+    pdf = FPDF(format="A4")
+    pdf.set_margins(15, 15, 15)
+    pdf.set_auto_page_break(True, margin=15)
+    return pdf
+
+
+def _draw_invoice(pdf: FPDF, layout: InvoiceLayout, doc) -> None:
+    """Draw one invoice starting on a new page."""
+    pdf.add_page()
+    top = pdf.get_y()
+
+    text_left = pdf.l_margin
+    if layout.logo_png:
+        try:
+            pdf.image(BytesIO(layout.logo_png), x=pdf.l_margin, y=top, h=22)
+            text_left += 28
+        except Exception:
+            pass
+
+    pdf.set_xy(text_left, top)
+    pdf.set_font("Helvetica", "B", 16)
+    pdf.cell(100, 8, layout.store_name, new_x=XPos.LMARGIN, new_y=YPos.NEXT)
+    pdf.set_font("Helvetica", "", 9)
+    for line in layout.header_lines:
+        pdf.set_x(text_left)
+        pdf.multi_cell(100, 4.5, line, new_x=XPos.LMARGIN, new_y=YPos.NEXT)
+    header_bottom = pdf.get_y()
+
+    created = doc.created_at
+    if created is not None:
+        if created.tzinfo is None:
+            created = created.replace(tzinfo=timezone.utc)
+        created = created.astimezone(IST)
+
+    pdf.set_xy(125, top)
+    pdf.set_font("Helvetica", "B", 14)
+    pdf.cell(70, 8, "INVOICE", align="R", new_x=XPos.LEFT, new_y=YPos.NEXT)
+    pdf.set_font("Helvetica", "", 9)
+    for line in (
+        f"No: {doc.invoice_number}",
+        f"Date: {doc.invoice_date.strftime('%d-%m-%Y')}",
+        f"Time: {created.strftime('%I:%M %p')} IST" if created else "",
+    ):
+        pdf.set_x(125)
+        pdf.cell(70, 4.5, _text(line), align="R", new_x=XPos.LEFT, new_y=YPos.NEXT)
+
+    pdf.set_y(max(header_bottom, pdf.get_y(), top + 24) + 4)
+    pdf.line(pdf.l_margin, pdf.get_y(), 210 - pdf.r_margin, pdf.get_y())
+    pdf.ln(3)
+
+    pdf.set_font("Helvetica", "B", 10)
+    pdf.cell(0, 5, "Bill To", new_x=XPos.LMARGIN, new_y=YPos.NEXT)
+    pdf.set_font("Helvetica", "", 9)
+    for line in (
+        doc.customer_name or "Walk-in customer",
+        f"Phone: {doc.customer_phone}" if doc.customer_phone else "",
+        doc.customer_address or "",
+        f"GSTIN: {doc.customer_gstin}" if doc.customer_gstin else "",
+    ):
+        if line:
+            pdf.multi_cell(0, 4.5, _text(line), new_x=XPos.LMARGIN, new_y=YPos.NEXT)
+    pdf.ln(3)
+
+    pdf.set_font("Helvetica", "B", 9)
+    pdf.set_fill_color(240, 240, 240)
+    for title, width, align in ITEM_COLUMNS:
+        pdf.cell(width, 7, title, border=1, align=align, fill=True)
+    pdf.ln()
+
+    pdf.set_font("Helvetica", "", 9)
+    for number, line in enumerate(doc.items, start=1):
+        values = (
+            str(number),
+            _text(line.description)[:70],
+            f"{line.quantity:g}",
+            f"{line.unit_price:,.2f}",
+            f"{line.line_total:,.2f}",
+        )
+        for (_, width, align), value in zip(ITEM_COLUMNS, values):
+            pdf.cell(width, 6, value, border=1, align=align)
+        pdf.ln()
+
+    pdf.ln(2)
+    totals = [("Subtotal", doc.subtotal)]
+    if doc.discount:
+        totals.append(("Discount", -doc.discount))
+    if doc.tax:
+        totals.append(("Tax", doc.tax))
+    for label, amount in totals:
+        pdf.cell(150, 5.5, label, align="R")
+        pdf.cell(30, 5.5, _money(amount), align="R", new_x=XPos.LMARGIN, new_y=YPos.NEXT)
+    pdf.set_font("Helvetica", "B", 11)
+    pdf.cell(150, 7, "Total", align="R")
+    pdf.cell(30, 7, _money(doc.total), align="R", new_x=XPos.LMARGIN, new_y=YPos.NEXT)
+
+    pdf.ln(3)
+    pdf.set_font("Helvetica", "", 9)
+    payment = f"Payment: {doc.payment_mode or 'CASH'}"
+    if doc.payment_reference:
+        payment += f" (Ref: {doc.payment_reference})"
+    pdf.cell(0, 5, _text(payment), new_x=XPos.LMARGIN, new_y=YPos.NEXT)
+    if doc.notes:
+        pdf.multi_cell(0, 4.5, _text(f"Notes: {doc.notes}"), new_x=XPos.LMARGIN, new_y=YPos.NEXT)
+
+    pdf.ln(6)
+    pdf.set_font("Helvetica", "I", 9)
+    pdf.cell(0, 5, "Thank you for your business!", align="C")
+
+
+def render_invoice_pdf(layout: InvoiceLayout, doc) -> bytes:
+    """Render a single InvoiceDocument to PDF bytes."""
+    pdf = _new_pdf()
+    _draw_invoice(pdf, layout, doc)
+    return bytes(pdf.output())
+
+
+def render_combined_pdf(layout: InvoiceLayout, docs) -> bytes:
+    """Render many invoices into one PDF, one invoice per page (or more)."""
+    pdf = _new_pdf()
+    for doc in docs:
+        _draw_invoice(pdf, layout, doc)
+    if not pdf.page:
+        pdf.add_page()
+        pdf.set_font("Helvetica", "", 11)
+        pdf.cell(0, 10, "No invoices in this period.")
+    return bytes(pdf.output())
+
+
+def pdf_filename(doc) -> str:
+    return f"invoice-{doc.invoice_number}.pdf"
+
+
+# Process pool workers receive the compiled layout once, in the initializer
+_worker_layout = None
+
+
+def _init_worker(layout: InvoiceLayout) -> None:
+    global _worker_layout
+    _worker_layout = layout
+
+
+def _render_in_worker(doc) -> tuple:
+    return pdf_filename(doc), render_invoice_pdf(_worker_layout, doc)
+
+
+def iter_rendered(layout: InvoiceLayout, docs, workers: int = None, max_in_flight: int = None):
+    """Yield ``(filename, pdf_bytes)`` for each document as soon as it is rendered.
+
+    Documents are pulled from ``docs`` lazily and at most ``max_in_flight``
+    renders are pending at once, so memory stays flat for any number of
+    invoices. Output order follows completion, not input order.
+    """
+    workers = workers or min(4, os.cpu_count() or 1)
+    max_in_flight = max_in_flight or workers * 2
+
+    if workers <= 1:
+        for doc in docs:
+            yield pdf_filename(doc), render_invoice_pdf(layout, doc)
+        return
+
+    docs = iter(docs)
+    pool = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(layout,))
+    try:
+        pending = set()
+        exhausted = False
+        while True:
+            while not exhausted and len(pending) < max_in_flight:
+                try:
+                    pending.add(pool.submit(_render_in_worker, next(docs)))
+                except StopIteration:
+                    exhausted = True
+            if not pending:
+                return
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield future.result()
+    finally:
+        # Also reached when a download is abandoned half way through
+        pool.shutdown(wait=True, cancel_futures=True)
+
+
+class _ChunkSink:
+    """Write-only file object that collects what ZipFile writes until drained.
+
+    It has no ``tell``/``seek``, so ZipFile streams entries with data
+    descriptors instead of seeking back to patch local headers.
+    """
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self) -> None:
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def stream_zip(entries):
+    """Yield a ZIP archive chunk by chunk from ``(filename, bytes)`` entries.
+
+    Each entry is yielded as soon as it is written, so the response can start
+    before the last invoice is rendered. PDFs are stored as-is (they are
+    already compressed internally); anything else is deflated.
+    """
+    sink = _ChunkSink()
+    with zipfile.ZipFile(sink, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+        for filename, data in entries:
+            compress = zipfile.ZIP_STORED if filename.endswith(".pdf") else zipfile.ZIP_DEFLATED
+            archive.writestr(filename, data, compress_type=compress)
+            chunk = sink.drain()
+            if chunk:
+                yield chunk
+    yield sink.drain()
@@ -0,0 +1,177 @@
+"""
+Purchase orders and goods receiving for R Sanju Invoice application.
+
+Deliveries are applied to stock through inventory.receive_stock, so a
+goods received note of any size is one bulk UPDATE plus one bulk ledger
+insert, flushed together with the receipt itself. Functions flush but do not
+commit; callers wrap them in services.unit_of_work().
+"""
+from datetime import date
+
+from sqlalchemy import update, bindparam
+
+from models import db, Product, Supplier, PurchaseOrder, PurchaseOrderItem, GoodsReceipt, GoodsReceiptItem
+import inventory
+
+
+class StockLineError(ValueError):
+    """Raised when pasted delivery lines cannot be parsed or matched to products."""
+
+
+def parse_stock_lines(user_id: str, text: str) -> list:
+    """Parse ``SKU, quantity, unit cost`` lines into ``(product_id, qty, cost)``.
+
+    The unit cost is optional and defaults to the product's current cost price.
+    All SKUs are resolved with a single query.
+    """
+    parsed = []
+    for line_no, raw in enumerate((text or "").splitlines(), start=1):
+        raw = raw.strip()
+        if not raw:
+            continue
+        parts = [part.strip() for part in raw.split(",")]
+        if len(parts) < 2:
+            raise StockLineError(f"Line {line_no}: expected 'SKU, quantity, unit cost'")
+        try:
+            quantity = float(parts[1])
+            unit_cost = float(parts[2]) if len(parts) > 2 and parts[2] else None
+        except ValueError:
+            raise StockLineError(f"Line {line_no}: quantity and cost must be numbers")
+        parsed.append((parts[0], quantity, unit_cost))
+
+    if not parsed:
+        raise StockLineError("Enter at least one line.")
+
+    skus = {sku for sku, _, _ in parsed}
+    products = {
+        sku: (product_id, cost_price)
+        for product_id, sku, cost_price in db.session.query(Product.id, Product.sku, Product.cost_price)
+        .filter(Product.user_id == user_id, Product.sku.in_(skus))
+    }
+    missing = sorted(skus - products.keys())
+    if missing:
+        raise StockLineError(f"Unknown SKU(s): {', '.join(missing)}")
+
+    lines = []
+    for sku, quantity, unit_cost in parsed:
+        product_id, cost_price = products[sku]
+        lines.append((product_id, quantity, cost_price if unit_cost is None else unit_cost))
+    return lines
+
+
+def get_or_create_supplier(user_id: str, supplier_id=None, name: str = "") -> Supplier:
+    """Pick an existing supplier by id, or find/create one by name."""
+    if supplier_id:
+        return Supplier.query.filter_by(id=int(supplier_id), user_id=user_id).first()
+    name = (name or "").strip()
+    if not name:
+        return None
+    supplier = Supplier.query.filter_by(user_id=user_id, name=name).first()
+    if not supplier:
+        supplier = Supplier(user_id=user_id, name=name)
+        db.session.add(supplier)
+        db.session.flush()
+    return supplier
+
+
+def create_purchase_order(user_id: str, lines: list, supplier: Supplier = None,
+                          order_date: date = None, notes: str = "") -> PurchaseOrder:
+    """Create a purchase order from ``(product_id, quantity, unit_cost)`` lines."""
+    order = PurchaseOrder(
+        user_id=user_id,
+        supplier_id=supplier.id if supplier else None,
+        po_number="",
+        status="ordered",
+        order_date=order_date or date.today(),
+        notes=notes,
+    )
+    db.session.add(order)
+    db.session.flush()
+    order.po_number = f"PO-{order.id:05d}"
+
+    db.session.add_all([
+        PurchaseOrderItem(
+            purchase_order_id=order.id,
+            product_id=product_id,
+            quantity=quantity,
+            unit_cost=unit_cost,
+        )
+        for product_id, quantity, unit_cost in lines
+    ])
+    db.session.flush()
+    return order
+
+
+def receive_goods(user_id: str, lines: list, supplier: Supplier = None,
+                  purchase_order: PurchaseOrder = None, notes: str = "") -> GoodsReceipt:
+    """Record a goods received note and apply it to stock in one transaction."""
+    if not any(quantity > 0 for _, quantity, _ in lines):
+        raise StockLineError("Nothing to receive.")
+
+    receipt = GoodsReceipt(
+        user_id=user_id,
+        purchase_order_id=purchase_order.id if purchase_order else None,
+        supplier_id=supplier.id if supplier else (purchase_order.supplier_id if purchase_order else None),
+        grn_number="",
+        notes=notes,
+    )
+    db.session.add(receipt)
+    db.session.flush()
+    receipt.grn_number = f"GRN-{receipt.id:05d}"
+
+    reference = purchase_order.po_number if purchase_order else receipt.grn_number
+    received = inventory.receive_stock(
+        user_id, lines, reference_id=receipt.grn_number, notes=f"Goods received ({reference})"
+    )
+
+    db.session.add_all([
+        GoodsReceiptItem(goods_receipt_id=receipt.id, product_id=pid, quantity=qty, unit_cost=cost)
+        for pid, (qty, cost) in received.items()
+    ])
+    receipt.total_cost = sum(qty * cost for qty, cost in received.values())
+
+    if purchase_order:
+        _apply_receipt_to_order(purchase_order, received)
+
+    db.session.flush()
+    return receipt
+
+
+def receive_purchase_order(user_id: str, order: PurchaseOrder, quantities: dict = None,
+                           notes: str = "") -> GoodsReceipt:
+    """Receive a purchase order; ``quantities`` maps item id -> qty (default: all outstanding)."""
+    lines = []
+    for item in order.items:
+        outstanding = max(item.quantity - item.received_quantity, 0.0)
+        qty = outstanding if quantities is None else float(quantities.get(item.id) or 0)
+        if qty > 0:
+            lines.append((item.product_id, qty, item.unit_cost))
+    return receive_goods(user_id, lines, purchase_order=order, notes=notes)
+
+
+def _apply_receipt_to_order(order: PurchaseOrder, received: dict) -> None:
+    """Book received quantities against order lines and update the order status."""
+    remaining = {pid: qty for pid, (qty, _) in received.items()}
+    params = []
+    fully_received = True
+    for item in order.items:
+        outstanding = max(item.quantity - item.received_quantity, 0.0)
+        take = min(remaining.get(item.product_id, 0.0), outstanding)
+        if take > 0:
+            remaining[item.product_id] -= take
+            params.append({"item_id": item.id, "take": take})
+        if take < outstanding:
+            fully_received = False
+
+    if params:
+        items_table = PurchaseOrderItem.__table__
+        db.session.execute(
+            update(items_table)
+            .where(items_table.c.id == bindparam("item_id"))
+            .values(received_quantity=items_table.c.received_quantity + bindparam("take")),
+            params,
+        )
+        for item in order.items:
+            db.session.expire(item, ["received_quantity"])
+
+    order.status = "received" if fully_received else "partial"
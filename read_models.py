@@ -0,0 +1,295 @@
+"""
+Read-only projections for R Sanju Invoice application.
+
+List pages and CSV exports only display a handful of columns, so they read
+plain rows through SQLAlchemy Core selects instead of hydrating ORM objects.
+Rows returned here are never added to the session's identity map, are not
+change-tracked and never trigger relationship loading.
+"""
+from datetime import date
+from typing import NamedTuple, Optional
+
+from sqlalchemy import select, func, or_, and_, true
+
+from models import db, Invoice, InvoiceItem, Expense, Product
+
+
+# Selects the main branch in a ``branch`` filter
+MAIN_BRANCH = 0
+
+invoices_table = Invoice.__table__
+items_table = InvoiceItem.__table__
+expenses_table = Expense.__table__
+products_table = Product.__table__
+
+
+class InvoiceRow(NamedTuple):
+    """Invoice columns shown on list pages, reports and exports."""
+    id: int
+    invoice_number: str
+    invoice_date: date
+    created_at: object
+    customer_name: Optional[str]
+    customer_phone: Optional[str]
+    total: float
+    payment_mode: Optional[str]
+    status: str
+    branch_id: Optional[int]  # None for the main branch
+
+
+class InvoiceLine(NamedTuple):
+    """One printed line of an invoice."""
+    description: str
+    quantity: float
+    unit_price: float
+    line_total: float
+
+
+class InvoiceDocument(NamedTuple):
+    """Everything needed to print an invoice, as plain picklable data."""
+    id: int
+    invoice_number: str
+    invoice_date: date
+    created_at: object
+    customer_name: Optional[str]
+    customer_phone: Optional[str]
+    customer_address: Optional[str]
+    customer_gstin: Optional[str]
+    subtotal: float
+    discount: float
+    tax: float
+    total: float
+    payment_mode: Optional[str]
+    payment_reference: Optional[str]
+    notes: Optional[str]
+    items: tuple
+
+
+class ExpenseRow(NamedTuple):
+    """Expense columns shown on the expenses page, reports and exports."""
+    id: int
+    date: date
+    description: str
+    category: Optional[str]
+    amount: float
+
+
+class ProductRow(NamedTuple):
+    """Product columns shown on the products list and inventory dashboard."""
+    id: int
+    name: str
+    sku: str
+    barcode: Optional[str]
+    category: Optional[str]
+    stock_quantity: float
+    min_stock_level: float
+    unit_price: float
+    cost_price: float
+
+
+def branch_filter(column, branch: Optional[int]):
+    """WHERE clause for a ``branch`` filter: None matches every branch."""
+    if branch is None:
+        return true()
+    if branch == MAIN_BRANCH:
+        # The main branch's rows carry no branch_id
+        return column.is_(None)
+    return column == branch
+
+
+def _columns(table, row_type):
+    return [table.c[name] for name in row_type._fields]
+
+
+def _fetch(stmt, row_type) -> list:
+    """Execute a Core select and wrap each result row in ``row_type``."""
+    result = db.session.connection().execute(stmt)
+    make = row_type._make
+    return [make(row) for row in result]
+
+
+def list_invoices(user_id: str, phone: str = "", on_date: date = None) -> list:
+    """Invoices for a user, newest first, optionally filtered by phone/date."""
+    stmt = select(*_columns(invoices_table, InvoiceRow)).where(invoices_table.c.user_id == user_id)
+
+    if phone:
+        stmt = stmt.where(invoices_table.c.customer_phone.contains(phone))
+    if on_date:
+        stmt = stmt.where(invoices_table.c.invoice_date == on_date)
+
+    stmt = stmt.order_by(invoices_table.c.created_at.desc())
+    return _fetch(stmt, InvoiceRow)
+
+
+def invoices_between(user_id: str, start: date, end: date, branch: Optional[int] = None) -> list:
+    """Active (not voided) invoices with ``start <= invoice_date < end``, of one branch or all.
+
+    ``branch`` is None for every branch, MAIN_BRANCH or a branch id.
+    """
+    stmt = select(*_columns(invoices_table, InvoiceRow)).where(
+        invoices_table.c.user_id == user_id,
+        invoices_table.c.invoice_date >= start,
+        invoices_table.c.invoice_date < end,
+        invoices_table.c.status == "active",
+        branch_filter(invoices_table.c.branch_id, branch),
+    )
+    return _fetch(stmt, InvoiceRow)
+
+
+def list_expenses(user_id: str, start: date = None, end: date = None) -> list:
+    """Expenses for a user, most recent date first, optionally with ``start <= date < end``."""
+    stmt = select(*_columns(expenses_table, ExpenseRow)).where(expenses_table.c.user_id == user_id)
+
+    if start:
+        stmt = stmt.where(expenses_table.c.date >= start)
+    if end:
+        stmt = stmt.where(expenses_table.c.date < end)
+
+    stmt = stmt.order_by(expenses_table.c.date.desc())
+    return _fetch(stmt, ExpenseRow)
+
+
+def expenses_between(user_id: str, start: date, end: date, branch: Optional[int] = None) -> list:
+    """Expenses with ``start <= date < end``, of one branch or all (see invoices_between)."""
+    stmt = select(*_columns(expenses_table, ExpenseRow)).where(
+        expenses_table.c.user_id == user_id,
+        expenses_table.c.date >= start,
+        expenses_table.c.date < end,
+        branch_filter(expenses_table.c.branch_id, branch),
+    )
+    return _fetch(stmt, ExpenseRow)
+
+
+class CategoryTotal(NamedTuple):
+    """Expense total of one category over a period."""
+    category: str
+    total: float
+    count: int
+
+
+def expenses_page(user_id: str, start: date = None, end: date = None,
+                  after: tuple = None, limit: int = 50) -> tuple:
+    """One page of expenses, newest first, keyset-paginated on (date, id).
+
+    ``start``/``end`` bound the date as ``start <= date < end`` and ``after``
+    is the ``(date, id)`` of the last row of the previous page. Returns
+    ``(rows, next_key)`` where ``next_key`` is None on the last page.
+    """
+    t = expenses_table
+    stmt = select(*_columns(t, ExpenseRow)).where(t.c.user_id == user_id)
+
+    if start:
+        stmt = stmt.where(t.c.date >= start)
+    if end:
+        stmt = stmt.where(t.c.date < end)
+    if after:
+        after_date, after_id = after
+        stmt = stmt.where(or_(
+            t.c.date < after_date,
+            and_(t.c.date == after_date, t.c.id < after_id),
+        ))
+
+    stmt = stmt.order_by(t.c.date.desc(), t.c.id.desc()).limit(limit + 1)
+    rows = _fetch(stmt, ExpenseRow)
+
+    if len(rows) > limit:
+        rows = rows[:limit]
+        return rows, (rows[-1].date, rows[-1].id)
+    return rows, None
+
+
+def expense_category_totals(user_id: str, start: date, end: date) -> list:
+    """Expense totals per category for ``start <= date < end``, largest first."""
+    t = expenses_table
+    category = func.coalesce(func.nullif(t.c.category, ""), "Uncategorized")
+    stmt = select(
+        category, func.sum(t.c.amount), func.count(t.c.id),
+    ).where(
+        t.c.user_id == user_id,
+        t.c.date >= start,
+        t.c.date < end,
+    ).group_by(category).order_by(func.sum(t.c.amount).desc())
+    return _fetch(stmt, CategoryTotal)
+
+
+def list_products(user_id: str, q: str = "", stock_status: str = "") -> list:
+    """Products for a user ordered by name, with optional search and stock filter."""
+    stmt = select(*_columns(products_table, ProductRow)).where(products_table.c.user_id == user_id)
+
+    if q:
+        stmt = stmt.where(
+            or_(
+                products_table.c.name.ilike(f"%{q}%"),
+                products_table.c.sku.ilike(f"%{q}%"),
+                products_table.c.barcode.ilike(f"%{q}%"),
+            )
+        )
+
+    if stock_status == "low":
+        stmt = stmt.where(products_table.c.stock_quantity <= products_table.c.min_stock_level)
+    elif stock_status == "in_stock":
+        stmt = stmt.where(products_table.c.stock_quantity > 0)
+
+    stmt = stmt.order_by(products_table.c.name)
+    return _fetch(stmt, ProductRow)
+
+
+def invoice_document(invoice: Invoice) -> InvoiceDocument:
+    """Snapshot a loaded ORM invoice (with items) as an InvoiceDocument."""
+    fields = {name: getattr(invoice, name) for name in InvoiceDocument._fields if name != "items"}
+    lines = tuple(
+        InvoiceLine(item.description, item.quantity, item.unit_price, item.line_total)
+        for item in sorted(invoice.items, key=lambda item: item.id)
+    )
+    return InvoiceDocument(items=lines, **fields)
+
+
+def iter_invoice_documents(user_id: str, start: date, end: date, batch_size: int = 200):
+    """Yield active InvoiceDocuments with ``start <= invoice_date < end`` in date order.
+
+    Invoices are read in keyset batches on (invoice_date, id), with one query
+    for each batch's items, so memory stays bounded however long the range is.
+    """
+    header_columns = [invoices_table.c[name] for name in InvoiceDocument._fields if name != "items"]
+    last_key = None
+
+    while True:
+        stmt = select(*header_columns).where(
+            invoices_table.c.user_id == user_id,
+            invoices_table.c.invoice_date >= start,
+            invoices_table.c.invoice_date < end,
+            invoices_table.c.status == "active",
+        )
+        if last_key is not None:
+            last_date, last_id = last_key
+            stmt = stmt.where(or_(
+                invoices_table.c.invoice_date > last_date,
+                and_(invoices_table.c.invoice_date == last_date, invoices_table.c.id > last_id),
+            ))
+        stmt = stmt.order_by(invoices_table.c.invoice_date, invoices_table.c.id).limit(batch_size)
+
+        headers = db.session.connection().execute(stmt).all()
+        if not headers:
+            return
+
+        lines = {}
+        item_rows = db.session.connection().execute(
+            select(
+                items_table.c.invoice_id,
+                items_table.c.description,
+                items_table.c.quantity,
+                items_table.c.unit_price,
+                items_table.c.line_total,
+            ).where(
+                items_table.c.user_id == user_id,
+                items_table.c.invoice_id.in_([row.id for row in headers]),
+            ).order_by(items_table.c.invoice_id, items_table.c.id)
+        )
+        for invoice_id, *line in item_rows:
+            lines.setdefault(invoice_id, []).append(InvoiceLine(*line))
+
+        for row in headers:
+            yield InvoiceDocument(*row, items=tuple(lines.get(row.id, ())))
+
+        last_key = (headers[-1].invoice_date, headers[-1].id)
+
@@ -0,0 +1,236 @@
+"""
+Reorder engine for R Sanju Invoice application.
+
+Replaces the hand-typed Product.min_stock_level as the only buying signal
+with a forecast from the stock ledger. For every product of a store at once:
+
+- Weekly demand is net sales (sales minus returns) per week, read for all
+  products with one grouped query over the last HISTORY_WEEKS weeks.
+- The forecast is the moving average of the last RECENT_WEEKS weeks, scaled
+  by a seasonal index when the product has a year of history: how the weeks
+  about to come sold a year ago, relative to that year's average week.
+- Safety stock covers demand swings over the supplier lead time at the
+  configured service level; the reorder point is lead-time demand plus
+  safety stock, and never less than min_stock_level.
+- A product at or below its reorder point (counting stock already on open
+  purchase orders) is suggested up to lead time plus review period demand
+  plus safety stock.
+
+reorder_products.py runs this on a schedule and stores the results as
+ReorderSuggestion rows, which the inventory pages group into one draft
+purchase list per supplier. Functions flush but do not commit; callers wrap
+them in services.unit_of_work().
+"""
+import math
+from datetime import date, datetime, timedelta
+from statistics import NormalDist, pstdev
+from typing import NamedTuple, Optional
+
+from sqlalchemy import select, insert, delete, func
+
+from models import db, Product, Supplier, StockTransaction, PurchaseOrder, PurchaseOrderItem, ReorderSuggestion
+import purchasing
+
+
+RECENT_WEEKS = 8
+SEASON_WEEKS = 52
+# A year plus the longest horizon the seasonal index looks ahead
+HISTORY_WEEKS = SEASON_WEEKS + 4
+# Bounds on the seasonal index, so one odd week last year cannot swamp the forecast
+SEASONAL_RANGE = (0.5, 2.0)
+
+LEAD_TIME_DAYS = 7
+REVIEW_DAYS = 7
+SERVICE_LEVEL = 0.95
+
+products_table = Product.__table__
+transactions_table = StockTransaction.__table__
+orders_table = PurchaseOrder.__table__
+order_items_table = PurchaseOrderItem.__table__
+suggestions_table = ReorderSuggestion.__table__
+
+
+class Forecast(NamedTuple):
+    """Demand forecast and reorder figures of one product."""
+    product_id: int
+    supplier_id: Optional[int]
+    weekly_demand: float
+    safety_stock: float
+    reorder_point: float
+    on_hand: float
+    on_order: float
+    quantity: float  # Suggested order quantity, 0 when no order is due
+    unit_cost: float
+
+
+class SupplierList(NamedTuple):
+    """The suggestions of one supplier (None for products without one)."""
+    supplier: Optional[Supplier]
+    suggestions: list
+    total_cost: float
+
+
+def _weekly_demand(user_id: str, today: date) -> dict:
+    """``{product_id: [units sold this week, last week, ...]}`` from one grouped query."""
+    tx = transactions_table
+    since = today - timedelta(weeks=HISTORY_WEEKS) + timedelta(days=1)
+    day = func.date(tx.c.date)
+    stmt = select(tx.c.product_id, day, func.sum(tx.c.quantity)).where(
+        tx.c.user_id == user_id,
+        tx.c.transaction_type.in_(("sale", "return")),
+        tx.c.date >= datetime.combine(since, datetime.min.time()),
+    ).group_by(tx.c.product_id, day)
+
+    weeks = {}
+    for product_id, sold_on, moved in db.session.connection().execute(stmt):
+        # SQLite returns the day as text, PostgreSQL as a date
+        age = (today - date.fromisoformat(str(sold_on))).days // 7
+        if 0 <= age < HISTORY_WEEKS:
+            # Sales are negative ledger rows and returns positive ones
+            weeks.setdefault(product_id, [0.0] * HISTORY_WEEKS)[age] -= moved or 0.0
+    return weeks
+
+
+def _on_order(user_id: str) -> dict:
+    """Outstanding quantity per product on ordered and partly received purchase orders."""
+    o, li = orders_table, order_items_table
+    stmt = select(li.c.product_id, func.sum(li.c.quantity - li.c.received_quantity)).select_from(
+        li.join(o, o.c.id == li.c.purchase_order_id)
+    ).where(
+        o.c.user_id == user_id,
+        o.c.status.in_(("ordered", "partial")),
+    ).group_by(li.c.product_id)
+    return {product_id: max(quantity or 0.0, 0.0)
+            for product_id, quantity in db.session.connection().execute(stmt)}
+
+
+def _seasonal_index(weeks: list, horizon_weeks: int) -> float:
+    year_mean = sum(weeks[:SEASON_WEEKS]) / SEASON_WEEKS
+    if year_mean <= 0:
+        return 1.0
+    # The weeks that, a year ago, were the ones about to come now
+    ahead = weeks[SEASON_WEEKS - horizon_weeks:SEASON_WEEKS]
+    low, high = SEASONAL_RANGE
+    return min(max(sum(ahead) / len(ahead) / year_mean, low), high)
+
+
+def compute_forecasts(user_id: str, today: date = None, lead_time_days: int = LEAD_TIME_DAYS,
+                      review_days: int = REVIEW_DAYS, service_level: float = SERVICE_LEVEL) -> list:
+    """Forecast and reorder figures for every product of a store, in three queries."""
+    today = today or date.today()
+    z = NormalDist().inv_cdf(service_level)
+    horizon_weeks = max(1, min(math.ceil((lead_time_days + review_days) / 7), HISTORY_WEEKS - SEASON_WEEKS))
+    # Products created before this have a full season of history
+    seasoned_before = datetime.combine(today - timedelta(weeks=SEASON_WEEKS), datetime.min.time())
+
+    demand = _weekly_demand(user_id, today)
+    on_order = _on_order(user_id)
+    p = products_table
+    products = db.session.connection().execute(
+        select(p.c.id, p.c.supplier_id, p.c.stock_quantity, p.c.min_stock_level, p.c.cost_price, p.c.created_at)
+        .where(p.c.user_id == user_id)
+    )
+
+    empty = [0.0] * HISTORY_WEEKS
+    forecasts = []
+    for product_id, supplier_id, on_hand, min_level, cost_price, created_at in products:
+        weeks = demand.get(product_id, empty)
+        recent = weeks[:RECENT_WEEKS]
+        weekly = sum(recent) / RECENT_WEEKS
+        if created_at <= seasoned_before:
+            weekly *= _seasonal_index(weeks, horizon_weeks)
+        weekly = max(weekly, 0.0)
+
+        safety = z * pstdev(recent) * math.sqrt(lead_time_days / 7)
+        reorder_point = max(weekly * lead_time_days / 7 + safety, min_level or 0.0)
+        order_up_to = max(weekly * (lead_time_days + review_days) / 7 + safety, min_level or 0.0)
+
+        ordered = on_order.get(product_id, 0.0)
+        position = (on_hand or 0.0) + ordered
+        quantity = 0.0
+        if position <= reorder_point and order_up_to > position:
+            quantity = float(math.ceil(order_up_to - position))
+
+        forecasts.append(Forecast(
+            product_id, supplier_id, round(weekly, 3), round(safety, 3), round(reorder_point, 3),
+            on_hand or 0.0, ordered, quantity, cost_price or 0.0,
+        ))
+    return forecasts
+
+
+def settings(config) -> dict:
+    """compute_forecasts() keyword arguments from the app's REORDER_* settings."""
+    return {
+        "lead_time_days": config["REORDER_LEAD_TIME_DAYS"],
+        "review_days": config["REORDER_REVIEW_DAYS"],
+        "service_level": config["REORDER_SERVICE_LEVEL"],
+    }
+
+
+def refresh_suggestions(user_id: str, today: date = None, **options) -> int:
+    """Recompute a store's suggestions and replace the stored ones; returns how many were written.
+
+    ``options`` are passed on to compute_forecasts().
+    """
+    due = [forecast for forecast in compute_forecasts(user_id, today, **options) if forecast.quantity > 0]
+    connection = db.session.connection()
+    connection.execute(delete(suggestions_table).where(suggestions_table.c.user_id == user_id))
+    if due:
+        computed_at = datetime.utcnow()
+        connection.execute(insert(suggestions_table), [
+            dict(forecast._asdict(), user_id=user_id, computed_at=computed_at) for forecast in due
+        ])
+    return len(due)
+
+
+def stores_with_products() -> list:
+    """Ids of the stores that have at least one product."""
+    p = products_table
+    return list(db.session.connection().execute(select(p.c.user_id).distinct()).scalars())
+
+
+def supplier_lists(user_id: str) -> list:
+    """The stored suggestions as one draft purchase list per supplier, named suppliers first."""
+    suggestions = ReorderSuggestion.query.filter_by(user_id=user_id).all()
+    grouped = {}
+    for suggestion in suggestions:
+        grouped.setdefault(suggestion.supplier_id, []).append(suggestion)
+
+    lists = []
+    for rows in grouped.values():
+        rows.sort(key=lambda row: row.product.name)
+        lists.append(SupplierList(
+            rows[0].supplier, rows, round(sum(row.quantity * row.unit_cost for row in rows), 2),
+        ))
+    lists.sort(key=lambda group: (group.supplier is None, group.supplier.name if group.supplier else ""))
+    return lists
+
+
+def last_computed(user_id: str) -> Optional[datetime]:
+    s = suggestions_table
+    return db.session.connection().execute(
+        select(func.max(s.c.computed_at)).where(s.c.user_id == user_id)
+    ).scalar()
+
+
+def order_supplier_list(user_id: str, supplier_id: Optional[int], order_date: date = None) -> PurchaseOrder:
+    """Turn one supplier's suggestions into a purchase order and drop them from the list."""
+    s = suggestions_table
+    in_list = (s.c.user_id == user_id,
+               s.c.supplier_id.is_(None) if supplier_id is None else s.c.supplier_id == supplier_id)
+    connection = db.session.connection()
+    lines = [
+        (product_id, quantity, unit_cost)
+        for product_id, quantity, unit_cost in connection.execute(
+            select(s.c.product_id, s.c.quantity, s.c.unit_cost).where(*in_list).order_by(s.c.id)
+        )
+    ]
+    if not lines:
+        raise ValueError("There is nothing left to order from this supplier.")
+
+    supplier = Supplier.query.filter_by(id=supplier_id, user_id=user_id).first() if supplier_id else None
+    order = purchasing.create_purchase_order(
+        user_id, lines, supplier=supplier, order_date=order_date, notes="From reorder suggestions",
+    )
+    connection.execute(delete(s).where(*in_list))
+    return order
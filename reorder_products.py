@@ -0,0 +1,57 @@
+"""
+Reorder suggestion job for R Sanju Invoice application.
+Run this script on a schedule (e.g. a nightly Render cron job) to forecast
+demand from the stock ledger and refresh every store's reorder suggestions,
+which the inventory page groups into draft purchase lists per supplier.
+"""
+import os
+import sys
+from pathlib import Path
+
+# Add parent directory to path to import modules
+sys.path.insert(0, str(Path(__file__).parent))
+
+from flask import Flask
+from models import db
+from config import config
+from reorder import refresh_suggestions, settings, stores_with_products
+from services import unit_of_work
+
+
+def run_reorder(app_config='default', user_id=None):
+    """
+    Recompute reorder suggestions.
+    
+    Args:
+        app_config: Configuration to use ('development', 'production', or 'default')
+        user_id: Limit the run to a single store (all stores if None)
+    """
+    app = Flask(__name__)
+    app.config.from_object(config[app_config])
+    db.init_app(app)
+    
+    total = 0
+    with app.app_context():
+        options = settings(app.config)
+        for owner in ([user_id] if user_id else stores_with_products()):
+            # One transaction per store, so a store's list is never half replaced
+            with unit_of_work():
+                count = refresh_suggestions(owner, **options)
+            total += count
+            print(f"✓ {owner}: {count} product(s) to reorder")
+        print(f"✓ Wrote {total} reorder suggestion(s)")
+    
+    return total
+
+
+if __name__ == '__main__':
+    env = os.environ.get('FLASK_ENV', 'development')
+    user_id = sys.argv[1] if len(sys.argv) > 1 else None
+    
+    try:
+        run_reorder(env, user_id)
+    except Exception as e:
+        print(f"\n❌ Error computing reorder suggestions: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
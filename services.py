@@ -0,0 +1,908 @@
+"""
+Business operations for R Sanju Invoice application.
+
+Each function takes the acting ``user_id`` explicitly and works only on the
+database session: no Flask request, session or url_for. The HTML routes and
+the JSON API both call these, so an invoice or product is created the same
+way whichever way it arrives. Functions flush but never commit: callers
+wrap each business operation in ``unit_of_work()``, which commits once at
+the end, so a batch of operations succeeds or fails as a whole. Batch jobs
+only need an application context.
+"""
+import hashlib
+import random
+import time
+from contextlib import contextmanager
+from datetime import datetime, date, timezone, timedelta
+from typing import NamedTuple, Optional
+
+from sqlalchemy import select, update, insert, delete, func
+from sqlalchemy.exc import OperationalError, IntegrityError
+from sqlalchemy.orm.exc import StaleDataError
+
+from models import db, User, StoreSettings, Supplier, Product, Invoice, InvoiceItem, InvoiceTaxSummary, Expense, StockTransaction, IdempotencyKey, InvoiceNumberBlock
+import gst
+import inventory
+import expense_import
+import read_models
+import cache
+import analytics
+import branches
+
+
+IST = timezone(timedelta(hours=5, minutes=30))
+
+
+EXPENSES_PER_PAGE = 50
+ROLLUP_MONTHS = 6
+MAX_ROLLUP_MONTHS = 24
+CONFLICT_RETRIES = 4
+# SQLSTATEs of serialization failures and deadlocks (PostgreSQL)
+RETRYABLE_SQLSTATES = ("40001", "40P01")
+
+
+class ValidationError(ValueError):
+    """Raised when input for a business operation is invalid."""
+
+
+class ConflictError(RuntimeError):
+    """Raised when an operation kept colliding with concurrent writes and gave up."""
+
+
+class DuplicateKeyError(RuntimeError):
+    """Raised when a concurrent request inserted the same unique row first.
+
+    That is an idempotency key, or the user and settings rows of a new
+    store. Retrying runs the lookup again, which then finds that row.
+    """
+
+
+@contextmanager
+def unit_of_work():
+    """Commit once when the outermost block finishes, or roll back on error.
+
+    Blocks nest: an inner block joins the outer transaction, so an operation
+    built from other operations still commits exactly once.
+    """
+    info = db.session.info
+    depth = info.get("unit_of_work_depth", 0)
+    info["unit_of_work_depth"] = depth + 1
+    try:
+        yield db.session
+        if depth == 0:
+            db.session.commit()
+    except BaseException:
+        if depth == 0:
+            info.pop("after_commit", None)
+            db.session.rollback()
+        raise
+    finally:
+        info["unit_of_work_depth"] = depth
+
+    if depth == 0:
+        for callback in info.pop("after_commit", []):
+            callback()
+
+
+def after_commit(callback) -> None:
+    """Run ``callback()`` once the current unit of work has committed.
+
+    Used for cache invalidation: dropping a cached value before the commit
+    would let a concurrent reader cache the old data again. Outside a unit
+    of work the callback runs at once; a rollback discards it.
+    """
+    if not db.session.info.get("unit_of_work_depth"):
+        callback()
+        return
+    db.session.info.setdefault("after_commit", []).append(callback)
+
+
+def _is_conflict(error: Exception) -> bool:
+    """Whether ``error`` means another writer got there first and a retry may succeed."""
+    if isinstance(error, (StaleDataError, inventory.StockConflictError, DuplicateKeyError)):
+        return True
+    if isinstance(error, IntegrityError):
+        # A row referenced by the write (a product on an invoice line) was
+        # deleted meanwhile; the retry finds it gone and reports that
+        sqlstate = getattr(error.orig, "pgcode", None) or getattr(error.orig, "sqlstate", None)
+        return sqlstate == "23503" or "FOREIGN KEY constraint failed" in str(error.orig)
+    if isinstance(error, OperationalError):
+        sqlstate = getattr(error.orig, "pgcode", None) or getattr(error.orig, "sqlstate", None)
+        return sqlstate in RETRYABLE_SQLSTATES or "database is locked" in str(error.orig)
+    return False
+
+
+def run_in_unit_of_work(operation, *args, retries: int = CONFLICT_RETRIES, **kwargs):
+    """Run ``operation(*args, **kwargs)`` in its own unit of work, retrying write conflicts.
+
+    A conflict (a failed version check, a product that vanished under a stock
+    update, a serialization failure or a locked database) rolls everything
+    back, waits a short random backoff and runs the operation again from
+    scratch, so it must load what it needs itself rather than reuse objects
+    read before. Called inside another unit of work it simply joins it, as
+    only the outermost block can retry. Raises ConflictError if every attempt
+    conflicted.
+    """
+    if db.session.info.get("unit_of_work_depth"):
+        return operation(*args, **kwargs)
+
+    for attempt in range(retries + 1):
+        try:
+            with unit_of_work():
+                return operation(*args, **kwargs)
+        except Exception as e:
+            if not _is_conflict(e):
+                raise
+            conflict = e
+            time.sleep(random.uniform(0, 0.01 * 2 ** attempt))
+    raise ConflictError("The record was changed by someone else at the same time; please try again.") from conflict
+
+
+def _float(value, field: str) -> float:
+    try:
+        return float(value or 0)
+    except (TypeError, ValueError):
+        raise ValidationError(f"{field} must be a number.")
+
+
+def _date(value, field: str) -> date:
+    if isinstance(value, date):
+        return value
+    try:
+        return datetime.strptime(value, "%Y-%m-%d").date()
+    except (TypeError, ValueError):
+        raise ValidationError(f"{field} must be a date (YYYY-MM-DD).")
+
+
+def _text(data: dict, field: str) -> str:
+    value = data.get(field)
+    if value is None:
+        return ""
+    if not isinstance(value, str):
+        raise ValidationError(f"{field} must be a string.")
+    return value.strip()
+
+
+def _items(data: dict) -> list:
+    """The ``items`` of an invoice: a list of objects."""
+    items = data.get("items")
+    if items is None:
+        return []
+    if not isinstance(items, list) or not all(isinstance(item, dict) for item in items):
+        raise ValidationError("items must be a list of objects.")
+    return items
+
+
+def _supplier_id(user_id: str, data: dict) -> Optional[int]:
+    """The ``supplier_id`` of ``data``, which must be one of the user's suppliers; None if blank."""
+    value = data.get("supplier_id")
+    if value in (None, ""):
+        return None
+    try:
+        supplier_id = int(value)
+    except (TypeError, ValueError):
+        raise ValidationError("supplier_id must be an integer.")
+    if not Supplier.query.filter_by(id=supplier_id, user_id=user_id).first():
+        raise ValidationError(f"Unknown supplier id: {supplier_id}")
+    return supplier_id
+
+
+def _branch(user_id: str, data: dict) -> Optional[int]:
+    """The branch_id of ``data["branch_id"]``; None for the main branch."""
+    try:
+        return branches.resolve_branch(user_id, data.get("branch_id"))
+    except branches.BranchError as e:
+        raise ValidationError(str(e))
+
+
+def ensure_user(user_id: str, email: str = None) -> User:
+    """Get the user row, creating it if needed.
+
+    Two first requests of a new user may both insert it; the loser raises
+    DuplicateKeyError, so run_in_unit_of_work retries and finds the row.
+    """
+    user = db.session.get(User, user_id)
+    if not user:
+        user = User(id=user_id, email=email or f"{user_id}@example.com")
+        db.session.add(user)
+        try:
+            db.session.flush()
+        except IntegrityError as e:
+            raise DuplicateKeyError(f"User {user_id} was created concurrently.") from e
+    return user
+
+
+def ensure_store_settings(user_id: str) -> StoreSettings:
+    """Get the user's store settings, creating defaults if needed (retryable like ensure_user)."""
+    settings = StoreSettings.query.filter_by(user_id=user_id).first()
+    if not settings:
+        ensure_user(user_id)
+        settings = StoreSettings(user_id=user_id, store_name="Managekarlo", address="", phone="", email="")
+        db.session.add(settings)
+        try:
+            db.session.flush()
+        except IntegrityError as e:
+            raise DuplicateKeyError(f"Store settings of {user_id} were created concurrently.") from e
+    return settings
+
+
+def get_store_settings(user_id: str) -> StoreSettings:
+    """The user's store settings; defaults are created and committed on first use."""
+    settings = StoreSettings.query.filter_by(user_id=user_id).first()
+    if settings is None:
+        settings = run_in_unit_of_work(ensure_store_settings, user_id)
+    return settings
+
+
+def store_profile(user_id: str) -> dict:
+    """The store's printed details for page headers, cached until the settings are saved."""
+    def load():
+        settings = get_store_settings(user_id)
+        return {
+            "store_name": settings.store_name or "Managekarlo",
+            "address": settings.address or "",
+            "phone": settings.phone or "",
+            "email": settings.email or "",
+            "gstin": settings.gstin or "",
+            "has_logo": bool(settings.logo_data),
+        }
+
+    return cache.get_or_set(("store_profile", user_id), load, tags=(cache.user_tag(user_id),))
+
+
+def save_store_settings(user_id: str, data: dict, logo: tuple = None) -> StoreSettings:
+    """Update the store profile; ``logo`` is an optional ``(bytes, filename, mimetype)``.
+
+    The settings row is loaded here, so run_in_unit_of_work can retry the
+    save when a sale bumps the row's version meanwhile.
+    """
+    settings = ensure_store_settings(user_id)
+    settings.store_name = _text(data, "store_name") or "Managekarlo"
+    settings.address = _text(data, "address")
+    settings.phone = _text(data, "phone")
+    settings.email = _text(data, "email")
+    settings.gstin = _text(data, "gstin").upper()
+
+    if logo:
+        settings.logo_data, settings.logo_filename, settings.logo_mimetype = logo
+    db.session.flush()
+    after_commit(lambda: cache.invalidate(("store_profile", user_id)))
+    return settings
+
+
+def record_login(user_id: str, email: str = None) -> User:
+    user = ensure_user(user_id, email)
+    user.last_login = datetime.now(IST)
+    db.session.flush()
+    return user
+
+
+def _bump_invoice_counter(settings: StoreSettings, by: int = 1) -> int:
+    """Atomically increase the invoice counter in the database and return the new value.
+
+    The UPDATE takes the row lock until the caller commits, so two
+    terminals billing at once always get different numbers.
+    """
+    s = StoreSettings.__table__
+    db.session.execute(
+        update(s).where(s.c.id == settings.id).values(
+            invoice_counter=s.c.invoice_counter + by,
+            version=s.c.version + 1,
+        )
+    )
+    db.session.refresh(settings, ["invoice_counter", "version"])
+    return settings.invoice_counter
+
+
+def invoice_number_prefix(user_id: str) -> str:
+    """The store's part of its invoice numbers: RS-<user_hash>."""
+    return f"RS-{hashlib.md5(user_id.encode()).hexdigest()[:4].upper()}"
+
+
+def invoice_number_year() -> int:
+    """The year printed in invoice numbers taken now."""
+    return datetime.now(IST).year
+
+
+def next_invoice_number(user_id: str) -> str:
+    """Reserve the next invoice number: RS-<user_hash>-<year>-0001 style.
+
+    The counter is bumped in the caller's transaction, so a rolled-back
+    invoice does not use up a number.
+    """
+    settings = ensure_store_settings(user_id)
+    prefix = invoice_number_prefix(user_id)
+    year = invoice_number_year()
+
+    for _ in range(10):
+        invoice_number = f"{prefix}-{year}-{_bump_invoice_counter(settings):04d}"
+        if not Invoice.query.filter_by(invoice_number=invoice_number).first():
+            return invoice_number
+
+    # Fallback: use timestamp to guarantee uniqueness
+    _bump_invoice_counter(settings)
+    return f"{prefix}-{year}-{int(time.time())}"
+
+
+def create_invoice(user_id: str, data: dict, invoice_number: str = None,
+                   stock_lines: list = None) -> Invoice:
+    """Create an invoice with its lines, GST and stock movements.
+
+    ``data`` holds the customer and payment fields plus ``items``: a list of
+    dicts with description, quantity, unit_price and optionally product_id
+    and gst_rate. Product lines always use the product's own GST rate and
+    HSN code; the given gst_rate only applies to manual lines.
+
+    ``branch_id`` in ``data`` is the branch that sold it (stock is taken
+    from there); without one it belongs to the main branch.
+
+    ``invoice_number`` is for numbers already allocated (from a terminal's
+    block); otherwise the next one is taken. With ``stock_lines``, the stock
+    movements are appended to that list for the caller to apply for many
+    invoices at once, instead of being issued here.
+    """
+    raw_items = [item for item in _items(data) if _text(item, "description")]
+    if not raw_items:
+        raise ValidationError("An invoice needs at least one item.")
+
+    product_ids = set()
+    for item in raw_items:
+        if item.get("product_id"):
+            try:
+                product_ids.add(int(item["product_id"]))
+            except (TypeError, ValueError):
+                raise ValidationError("product_id must be an integer.")
+
+    # GST rate and HSN code of every product on the invoice, in one query
+    product_tax = {
+        pid: (rate, hsn)
+        for pid, rate, hsn in db.session.query(Product.id, Product.gst_rate, Product.hsn_code)
+        .filter(Product.user_id == user_id, Product.id.in_(product_ids))
+    } if product_ids else {}
+    missing = product_ids - product_tax.keys()
+    if missing:
+        raise ValidationError(f"Unknown product id(s): {', '.join(map(str, sorted(missing)))}")
+
+    items = []
+    subtotal = 0.0
+    for raw in raw_items:
+        qty = _float(raw.get("quantity"), "quantity")
+        price = _float(raw.get("unit_price"), "unit_price")
+        line_total = qty * price
+        subtotal += line_total
+
+        product_id = int(raw["product_id"]) if raw.get("product_id") else None
+        if product_id:
+            gst_rate, hsn_code = product_tax[product_id]
+        else:
+            gst_rate, hsn_code = _float(raw.get("gst_rate"), "gst_rate"), None
+
+        items.append(InvoiceItem(
+            user_id=user_id,
+            description=_text(raw, "description"),
+            quantity=qty,
+            unit_price=price,
+            line_total=line_total,
+            product_id=product_id,
+            gst_rate=gst_rate or 0.0,
+            hsn_code=hsn_code,
+        ))
+
+    discount = min(max(_float(data.get("discount"), "discount"), 0.0), subtotal)
+    invoice_date = _date(data["invoice_date"], "invoice_date") if data.get("invoice_date") else datetime.now(IST).date()
+    branch_id = _branch(user_id, data)
+    settings = ensure_store_settings(user_id)
+
+    invoice = Invoice(
+        user_id=user_id,
+        branch_id=branch_id,
+        invoice_number=invoice_number or next_invoice_number(user_id),
+        invoice_date=invoice_date,
+        customer_name=_text(data, "customer_name"),
+        customer_phone=_text(data, "customer_phone"),
+        customer_address=_text(data, "customer_address"),
+        customer_gstin=_text(data, "customer_gstin").upper(),
+        subtotal=subtotal,
+        discount=discount,
+        payment_mode=_text(data, "payment_mode") or None,
+        payment_reference=_text(data, "payment_reference"),
+        notes=_text(data, "notes"),
+    )
+    db.session.add(invoice)
+    db.session.flush()
+
+    tax_summaries = gst.apply_to_invoice(invoice, items, store_gstin=settings.gstin)
+    invoice.total = subtotal - discount + invoice.tax
+
+    for item in items:
+        item.invoice_id = invoice.id
+    db.session.add_all(items)
+    db.session.add_all(tax_summaries)
+
+    if stock_lines is None:
+        inventory.issue_stock(
+            user_id,
+            [(item.product_id, item.quantity) for item in items],
+            reference_id=str(invoice.id),
+            notes=f"Invoice {invoice.invoice_number}",
+            branch_id=branch_id,
+        )
+    else:
+        stock_lines.extend(
+            (item.product_id, item.quantity, str(invoice.id), f"Invoice {invoice.invoice_number}")
+            for item in items
+        )
+    db.session.flush()
+    after_commit(lambda: analytics.invalidate(user_id, [invoice_date]))
+    return invoice
+
+
+IDEMPOTENCY_KEY_CHARS = frozenset("ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789-_")
+
+
+def create_invoice_once(user_id: str, data: dict, key: str, **options) -> tuple:
+    """create_invoice() guarded by a client-generated idempotency ``key``.
+
+    Returns ``(invoice, replayed)``. The first request with a key claims it
+    and creates the invoice in the same transaction; a replay (a resubmitted
+    form, a retried API call) finds the key with one indexed lookup and gets
+    the original invoice back without numbering, inserting or moving stock
+    again. A request that fails validation releases its key on rollback.
+    ``options`` are passed on to create_invoice().
+    """
+    key = (key or "").strip()
+    if not 8 <= len(key) <= 64 or not IDEMPOTENCY_KEY_CHARS.issuperset(key):
+        raise ValidationError("The idempotency key must be 8-64 letters, digits, '-' or '_'.")
+
+    k = IdempotencyKey.__table__
+    connection = db.session.connection()
+    invoice_id = connection.execute(
+        select(k.c.invoice_id).where(k.c.user_id == user_id, k.c.key == key)
+    ).scalar()
+    if invoice_id is not None:
+        return db.session.get(Invoice, invoice_id), True
+
+    # Claim the key before doing any work: a concurrent duplicate blocks on
+    # the unique index here and fails once this transaction commits
+    ensure_user(user_id)
+    try:
+        claimed = connection.execute(
+            insert(k).values(user_id=user_id, key=key, created_at=datetime.utcnow())
+        ).inserted_primary_key[0]
+    except IntegrityError as e:
+        raise DuplicateKeyError(f"Idempotency key {key} is already in use.") from e
+
+    invoice = create_invoice(user_id, data, **options)
+    connection.execute(update(k).where(k.c.id == claimed).values(invoice_id=invoice.id))
+    return invoice, False
+
+
+NUMBER_BLOCK_SIZE = 50
+MAX_NUMBER_BLOCK_SIZE = 500
+
+
+class SyncResult(NamedTuple):
+    """Outcome of one queued invoice: created, duplicate (synced before) or rejected."""
+    key: str
+    status: str
+    id: Optional[int]
+    invoice_number: Optional[str]
+    error: Optional[str]
+
+
+def _terminal_id(terminal_id: str) -> str:
+    terminal_id = (terminal_id or "").strip()
+    if not 1 <= len(terminal_id) <= 64 or not IDEMPOTENCY_KEY_CHARS.issuperset(terminal_id):
+        raise ValidationError("The terminal id must be 1-64 letters, digits, '-' or '_'.")
+    return terminal_id
+
+
+def reserve_number_block(user_id: str, terminal_id: str, size: int = NUMBER_BLOCK_SIZE) -> InvoiceNumberBlock:
+    """Set aside the next ``size`` invoice numbers for a terminal to use offline."""
+    terminal_id = _terminal_id(terminal_id)
+    size = max(1, min(int(size), MAX_NUMBER_BLOCK_SIZE))
+    settings = ensure_store_settings(user_id)
+    last = _bump_invoice_counter(settings, size)
+    block = InvoiceNumberBlock(
+        user_id=user_id, terminal_id=terminal_id, first=last - size + 1, last=last, year=invoice_number_year(),
+    )
+    db.session.add(block)
+    db.session.flush()
+    return block
+
+
+def sync_invoices(user_id: str, terminal_id: str, records: list, branch_id=None) -> list:
+    """Save invoices a terminal billed offline; returns a SyncResult per record, in order.
+
+    Each record is an invoice as for create_invoice() plus ``key`` (its
+    idempotency key, so a batch re-sent after a lost response is not billed
+    twice) and ``sequence`` (the counter value from one of the terminal's
+    blocks that its number was printed with). The number is built from the
+    block's year, as it was printed, not from the invoice date; a number
+    already used by another invoice is rejected. A record that fails
+    validation is rejected on its own savepoint without failing the rest.
+    The stock of the whole batch is then issued in one pass, from the
+    terminal's ``branch_id`` (None for the main branch).
+    """
+    terminal_id = _terminal_id(terminal_id)
+    branch_id = _branch(user_id, {"branch_id": branch_id})
+    b, i, k = InvoiceNumberBlock.__table__, Invoice.__table__, IdempotencyKey.__table__
+    connection = db.session.connection()
+    blocks = connection.execute(
+        select(b.c.first, b.c.last, b.c.year).where(b.c.user_id == user_id, b.c.terminal_id == terminal_id)
+    ).all()
+    prefix = invoice_number_prefix(user_id)
+
+    stock_lines = []
+    results = []
+    for record in records:
+        key = str(record.get("key") or "")
+        number = None
+        # Kept apart until the record is saved, so a rejected one moves no stock
+        lines = []
+        try:
+            with db.session.begin_nested():
+                try:
+                    sequence = int(record.get("sequence"))
+                except (TypeError, ValueError):
+                    raise ValidationError("sequence must be an integer.")
+                year = next((year for first, last, year in blocks if first <= sequence <= last), None)
+                if year is None:
+                    raise ValidationError(f"Number {sequence} was not reserved for terminal {terminal_id}.")
+                number = f"{prefix}-{year}-{sequence:04d}"
+                # A re-sent record finds its own invoice under its key; any other holder is a clash
+                holder = connection.execute(select(i.c.id).where(i.c.invoice_number == number)).scalar()
+                if holder is not None and holder != connection.execute(
+                    select(k.c.invoice_id).where(k.c.user_id == user_id, k.c.key == key)
+                ).scalar():
+                    raise ValidationError(f"Invoice number {number} is already used.")
+                invoice, replayed = create_invoice_once(
+                    user_id, dict(record, branch_id=branch_id), key, invoice_number=number, stock_lines=lines,
+                )
+        except ValidationError as e:
+            results.append(SyncResult(key, "rejected", None, None, str(e)))
+        except IntegrityError:
+            results.append(SyncResult(key, "rejected", None, None, f"Invoice number {number} is already used."))
+        else:
+            stock_lines.extend(lines)
+            status = "duplicate" if replayed else "created"
+            results.append(SyncResult(key, status, invoice.id, invoice.invoice_number, None))
+
+    inventory.issue_stock_batch(user_id, stock_lines, branch_id=branch_id)
+    return results
+
+
+def _sku_taken(user_id: str, sku: str) -> bool:
+    return db.session.query(Product.id).filter_by(user_id=user_id, sku=sku).first() is not None
+
+
+def create_product(user_id: str, data: dict) -> Product:
+    """Create a product; opening stock is recorded in the ledger."""
+    ensure_user(user_id)
+
+    name = _text(data, "name")
+    if not name:
+        raise ValidationError("Product name is required.")
+    sku = _text(data, "sku")
+    if not sku:
+        # Several products created in the same second (a batch) get -2, -3, ...
+        base = sku = f"SKU-{int(datetime.now(IST).timestamp())}"
+        suffix = 1
+        while _sku_taken(user_id, sku):
+            suffix += 1
+            sku = f"{base}-{suffix}"
+    elif _sku_taken(user_id, sku):
+        raise ValidationError(f"SKU '{sku}' is already in use.")
+    barcode = _text(data, "barcode") or sku
+
+    product = Product(
+        user_id=user_id,
+        name=name,
+        description=_text(data, "description"),
+        sku=sku,
+        barcode=barcode,
+        category=_text(data, "category"),
+        brand=_text(data, "brand"),
+        unit_price=_float(data.get("unit_price"), "unit_price"),
+        cost_price=_float(data.get("cost_price"), "cost_price"),
+        stock_quantity=_float(data.get("stock_quantity"), "stock_quantity"),
+        min_stock_level=_float(data.get("min_stock_level"), "min_stock_level"),
+        hsn_code=_text(data, "hsn_code"),
+        gst_rate=_float(data.get("gst_rate"), "gst_rate"),
+        supplier_id=_supplier_id(user_id, data),
+    )
+
+    db.session.add(product)
+    db.session.flush()
+    branches.add_product(user_id, product.id)
+
+    # Opening stock goes through the ledger so historical valuation can replay it
+    if product.stock_quantity:
+        db.session.add(StockTransaction(
+            user_id=user_id,
+            product_id=product.id,
+            transaction_type="adjustment",
+            quantity=product.stock_quantity,
+            notes="Opening stock",
+        ))
+        db.session.flush()
+
+    return product
+
+
+def get_product(user_id: str, product_id: int) -> Optional[Product]:
+    return Product.query.filter_by(id=product_id, user_id=user_id).first()
+
+
+def update_product(user_id: str, product_id: int, data: dict) -> Optional[Product]:
+    """Update a product from form/JSON data; a changed stock level is recorded in the ledger.
+
+    Returns None if the user has no such product. The product is loaded
+    here, so the whole update can be retried by run_in_unit_of_work.
+    """
+    product = get_product(user_id, product_id)
+    if not product:
+        return None
+    name = _text(data, "name")
+    if not name:
+        raise ValidationError("Product name is required.")
+    sku = _text(data, "sku") or product.sku or f"SKU-{product.id}"
+    if sku != product.sku and _sku_taken(product.user_id, sku):
+        raise ValidationError(f"SKU '{sku}' is already in use.")
+
+    product.name = name
+    product.description = _text(data, "description")
+    product.sku = sku
+    product.barcode = _text(data, "barcode") or product.barcode or sku
+    product.category = _text(data, "category")
+    product.brand = _text(data, "brand")
+    product.unit_price = _float(data.get("unit_price"), "unit_price")
+    product.cost_price = _float(data.get("cost_price"), "cost_price")
+    product.min_stock_level = _float(data.get("min_stock_level"), "min_stock_level")
+    product.hsn_code = _text(data, "hsn_code")
+    product.gst_rate = _float(data.get("gst_rate"), "gst_rate")
+    product.supplier_id = _supplier_id(user_id, data)
+
+    # Manual stock edits are recorded as ledger adjustments. The change is
+    # taken relative to the figure the user saw (``stock_seen``), so sales
+    # made while the form was open are kept.
+    new_quantity = _float(data.get("stock_quantity"), "stock_quantity")
+    if data.get("stock_seen") not in (None, ""):
+        seen = _float(data.get("stock_seen"), "stock_seen")
+    else:
+        seen = product.stock_quantity or 0
+    delta = new_quantity - seen
+    db.session.flush()
+    if delta:
+        adjust_stock(product.user_id, product.id, delta, notes="Manual stock edit")
+        db.session.refresh(product, ["stock_quantity", "version", "updated_at"])
+    return product
+
+
+def delete_product(user_id: str, product_id: int) -> bool:
+    """Delete a product; it is loaded here, so run_in_unit_of_work can retry a version conflict."""
+    product = get_product(user_id, product_id)
+    if not product:
+        return False
+    db.session.delete(product)
+    db.session.flush()
+    return True
+
+
+def adjust_stock(user_id: str, product_id: int, delta: float, transaction_type: str = "adjustment",
+                 reference_id: str = "", notes: str = "") -> bool:
+    """Add ``delta`` (negative to remove) to a product's stock and record it in the ledger.
+
+    The stock is changed by one UPDATE relative to the stored value, so
+    concurrent sales are not overwritten. Returns False if the user has no
+    such product.
+    """
+    p = Product.__table__
+    now = datetime.utcnow()
+    result = db.session.execute(
+        update(p).where(p.c.id == product_id, p.c.user_id == user_id).values(
+            stock_quantity=p.c.stock_quantity + delta,
+            version=p.c.version + 1,
+            updated_at=now,
+        )
+    )
+    if not result.rowcount:
+        return False
+    db.session.execute(insert(StockTransaction.__table__).values(
+        user_id=user_id,
+        product_id=product_id,
+        transaction_type=transaction_type,
+        quantity=delta,
+        reference_id=reference_id,
+        notes=notes,
+        date=now,
+    ))
+    return True
+
+
+def _owned_invoices(user_id: str, invoice_ids) -> list:
+    """``(id, invoice_number, invoice_date, status, branch_id)`` of the given invoices that belong to the user."""
+    i = Invoice.__table__
+    return db.session.connection().execute(
+        select(i.c.id, i.c.invoice_number, i.c.invoice_date, i.c.status, i.c.branch_id).where(
+            i.c.user_id == user_id, i.c.id.in_(list(invoice_ids)),
+        )
+    ).all()
+
+
+def _invoice_stock_lines(user_id: str, invoices: list, action: str) -> dict:
+    """``{branch_id: ledger lines}`` that return the stock of ``invoices``, from one grouped read of their items."""
+    if not invoices:
+        return {}
+    numbers = {invoice.id: invoice.invoice_number for invoice in invoices}
+    sold_at = {invoice.id: invoice.branch_id for invoice in invoices}
+    li = InvoiceItem.__table__
+    rows = db.session.connection().execute(
+        select(li.c.invoice_id, li.c.product_id, func.sum(li.c.quantity)).where(
+            li.c.user_id == user_id,
+            li.c.invoice_id.in_(list(numbers)),
+            li.c.product_id.is_not(None),
+        ).group_by(li.c.invoice_id, li.c.product_id)
+    ).all()
+    lines = {}
+    for invoice_id, product_id, quantity in rows:
+        lines.setdefault(sold_at[invoice_id], []).append(
+            (product_id, quantity, str(invoice_id), f"Invoice {numbers[invoice_id]} {action}")
+        )
+    return lines
+
+
+def _check_still_active(result, expected: int) -> None:
+    # Another terminal voided or deleted some of them first; re-reading and
+    # retrying (run_in_unit_of_work) keeps their stock from being returned twice
+    if result.rowcount != expected:
+        raise inventory.StockConflictError("Some invoices were changed at the same time.")
+
+
+def void_invoices(user_id: str, invoice_ids) -> list:
+    """Void active invoices and put their stock back; returns the ids voided.
+
+    However many invoices are voided, this is one grouped read of their
+    lines, one stock UPDATE row per product and one bulk ledger insert (per
+    branch that sold them), one status UPDATE and one DELETE of their GST
+    summary rows, so they drop out of GSTR-1 as well. Already void or
+    unknown ids are skipped.
+    """
+    invoices = [row for row in _owned_invoices(user_id, invoice_ids) if row.status == "active"]
+    if not invoices:
+        return []
+    ids = [invoice.id for invoice in invoices]
+    lines = _invoice_stock_lines(user_id, invoices, "voided")
+
+    i = Invoice.__table__
+    now = datetime.utcnow()
+    result = db.session.execute(
+        update(i).where(i.c.user_id == user_id, i.c.id.in_(ids), i.c.status == "active")
+        .values(status="void", voided_at=now, updated_at=now)
+    )
+    _check_still_active(result, len(ids))
+    # Stock goes back to the branch that sold it: one return per branch involved
+    for branch_id, branch_lines in lines.items():
+        inventory.return_stock(user_id, branch_lines, branch_id=branch_id)
+
+    s = InvoiceTaxSummary.__table__
+    db.session.execute(delete(s).where(s.c.invoice_id.in_(ids)))
+    db.session.expire_all()
+    after_commit(lambda: analytics.invalidate(user_id, [invoice.invoice_date for invoice in invoices]))
+    return ids
+
+
+def delete_invoices(user_id: str, invoice_ids) -> list:
+    """Delete invoices, putting back the stock of those not already voided; returns the ids deleted."""
+    invoices = _owned_invoices(user_id, invoice_ids)
+    if not invoices:
+        return []
+    active = [invoice for invoice in invoices if invoice.status == "active"]
+    # Read the lines before the cascade removes them
+    lines = _invoice_stock_lines(user_id, active, "deleted")
+
+    # Items and GST summaries go with the invoices (ON DELETE CASCADE)
+    i = Invoice.__table__
+    if active:
+        result = db.session.execute(
+            delete(i).where(
+                i.c.user_id == user_id,
+                i.c.id.in_([invoice.id for invoice in active]),
+                i.c.status == "active",
+            )
+        )
+        _check_still_active(result, len(active))
+    voided = [invoice.id for invoice in invoices if invoice.status != "active"]
+    if voided:
+        db.session.execute(delete(i).where(i.c.user_id == user_id, i.c.id.in_(voided)))
+    for branch_id, branch_lines in lines.items():
+        inventory.return_stock(user_id, branch_lines, branch_id=branch_id)
+    db.session.expire_all()
+    after_commit(lambda: analytics.invalidate(user_id, [invoice.invoice_date for invoice in active]))
+    return [invoice.id for invoice in invoices]
+
+
+def delete_invoice(user_id: str, invoice_id: int) -> bool:
+    return bool(delete_invoices(user_id, [invoice_id]))
+
+
+def convert_credit_to_cash(user_id: str, invoice_id: int) -> Optional[Invoice]:
+    """Mark a CREDIT invoice as paid in cash, noting when; None if there is no such invoice."""
+    invoice = Invoice.query.filter_by(id=invoice_id, user_id=user_id).first()
+    if not invoice:
+        return None
+    if invoice.status == "void":
+        raise ValidationError("A voided invoice cannot be changed.")
+    if (invoice.payment_mode or "").upper() != "CREDIT":
+        raise ValidationError("Invoice is not in CREDIT payment mode.")
+
+    invoice.payment_mode = "CASH"
+    timestamp = datetime.now(IST).strftime("%Y-%m-%d %H:%M:%S")
+    conversion_note = f"[Converted from CREDIT to CASH on {timestamp}]"
+    invoice.notes = f"{invoice.notes}\n{conversion_note}" if invoice.notes else conversion_note
+    db.session.flush()
+    return invoice
+
+
+def create_expense(user_id: str, data: dict) -> Expense:
+    """Record one expense, at ``data["branch_id"]`` or the main branch."""
+    description = _text(data, "description")
+    if not description:
+        raise ValidationError("Expense description is required.")
+    expense_date = _date(data["date"], "date") if data.get("date") else datetime.now(IST).date()
+    amount = _float(data.get("amount"), "amount")
+
+    expense = Expense(
+        user_id=user_id,
+        branch_id=_branch(user_id, data),
+        date=expense_date,
+        description=description,
+        category=_text(data, "category"),
+        amount=amount,
+        import_hash=expense_import.expense_hash(expense_date, amount, description),
+    )
+    db.session.add(expense)
+    db.session.flush()
+    return expense
+
+
+def month_range(year: int, month: int) -> tuple:
+    """Return the [first day, first day of next month) range for a month."""
+    start = date(year, month, 1)
+    if month == 12:
+        return start, date(year + 1, 1, 1)
+    return start, date(year, month + 1, 1)
+
+
+def expense_rollups(user_id: str, start: date = None, end: date = None) -> list:
+    """Per-category expense totals for each month overlapping [start, end), newest first.
+
+    Each month's totals come from one grouped query and are cached per
+    (user, month) until an expense in that month is added. Without a range,
+    the last ROLLUP_MONTHS months are shown.
+    """
+    last = (end - timedelta(days=1)) if end else datetime.now(IST).date()
+    if start:
+        count = (last.year - start.year) * 12 + last.month - start.month + 1
+    else:
+        count = ROLLUP_MONTHS
+    count = max(1, min(count, MAX_ROLLUP_MONTHS))
+
+    rollups = []
+    year, month = last.year, last.month
+    for _ in range(count):
+        month_start, month_end = month_range(year, month)
+        key = f"{year}-{month:02d}"
+        totals = cache.get_or_set(
+            ("expense_rollup", user_id, key),
+            lambda: read_models.expense_category_totals(user_id, month_start, month_end),
+            tags=(cache.user_tag(user_id),),
+        )
+        rollups.append({"month": key, "categories": totals, "total": sum(t.total for t in totals)})
+        year, month = (year, month - 1) if month > 1 else (year - 1, 12)
+    return rollups
+
+
+def invalidate_expense_rollups(user_id: str, days) -> None:
+    """Drop cached rollups for the months containing ``days``."""
+    cache.invalidate(*{("expense_rollup", user_id, f"{d.year}-{d.month:02d}") for d in days})
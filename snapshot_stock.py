@@ -0,0 +1,50 @@
+"""
+Stock snapshot job for R Sanju Invoice application.
+Run this script on a schedule (e.g. a daily Render cron job) to checkpoint
+every product's stock so historical valuation stays fast.
+"""
+import os
+import sys
+from pathlib import Path
+
+# Add parent directory to path to import modules
+sys.path.insert(0, str(Path(__file__).parent))
+
+from flask import Flask
+from models import db
+from config import config
+from inventory import take_stock_snapshots
+from services import unit_of_work
+
+
+def run_snapshots(app_config='default', user_id=None):
+    """
+    Write one stock snapshot row per product.
+    
+    Args:
+        app_config: Configuration to use ('development', 'production', or 'default')
+        user_id: Limit the snapshot to a single store (all stores if None)
+    """
+    app = Flask(__name__)
+    app.config.from_object(config[app_config])
+    db.init_app(app)
+    
+    with app.app_context():
+        with unit_of_work():
+            count = take_stock_snapshots(user_id)
+        print(f"✓ Wrote {count} stock snapshot(s)")
+    
+    return count
+
+
+if __name__ == '__main__':
+    env = os.environ.get('FLASK_ENV', 'development')
+    user_id = sys.argv[1] if len(sys.argv) > 1 else None
+    
+    try:
+        run_snapshots(env, user_id)
+    except Exception as e:
+        print(f"\n❌ Error taking stock snapshots: {e}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
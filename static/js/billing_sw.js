@@ -0,0 +1,50 @@
+// Service worker of the billing page. It keeps the last copy of the new
+// invoice page and the static files it loads, so the page opens without a
+// connection; offline_billing.js then queues the bills made on it.
+const CACHE = 'billing-v1';
+const PAGE_PATH = '/invoice/new';
+
+self.addEventListener('install', () => self.skipWaiting());
+
+self.addEventListener('activate', (event) => {
+  event.waitUntil(
+    caches.keys()
+      .then((names) => Promise.all(names.filter((name) => name !== CACHE).map((name) => caches.delete(name))))
+      .then(() => self.clients.claim())
+  );
+});
+
+function networkFirst(request) {
+  return fetch(request).then((response) => {
+    // Only a real page is kept, not a redirect to the login screen
+    if (response.ok && !response.redirected) {
+      const copy = response.clone();
+      caches.open(CACHE).then((cache) => cache.put(PAGE_PATH, copy));
+    }
+    return response;
+  }).catch(() => caches.match(PAGE_PATH).then((cached) => cached || Response.error()));
+}
+
+function cacheFirst(request) {
+  // Static URLs carry a hash of their content, so a cached copy never goes stale
+  return caches.match(request).then((cached) => cached || fetch(request).then((response) => {
+    if (response.ok) {
+      const copy = response.clone();
+      caches.open(CACHE).then((cache) => cache.put(request, copy));
+    }
+    return response;
+  }));
+}
+
+self.addEventListener('fetch', (event) => {
+  const request = event.request;
+  if (request.method !== 'GET') return;
+  const url = new URL(request.url);
+  if (url.origin !== self.location.origin) return;
+
+  if (request.mode === 'navigate' && url.pathname === PAGE_PATH) {
+    event.respondWith(networkFirst(request));
+  } else if (url.pathname.startsWith('/static/')) {
+    event.respondWith(cacheFirst(request));
+  }
+});
@@ -5,8 +5,13 @@
   const subtotalDisplay = document.getElementById('subtotal-display');
   const totalDisplay = document.getElementById('total-display');
   const discountInput = document.getElementById('discount');
-  const taxInput = document.getElementById('tax');
-  const products = (window.INVOICE_PRODUCTS || []).slice();
+  const taxDisplay = document.getElementById('tax-display');
+  const offline = window.OfflineBilling;
+  const products = offline
+    ? offline.catalog((window.INVOICE_PRODUCTS || []).slice(), window.INVOICE_PRODUCTS_AT || '')
+    : (window.INVOICE_PRODUCTS || []).slice();
+  const invoiceForm = document.getElementById('invoice-form');
+  const invoiceResult = document.getElementById('invoice-result');
 
   // Quick Add UI
   const quickAddInput = document.getElementById('quick-add-input');
@@ -36,9 +41,11 @@
 
   function recalcTotals() {
     let subtotal = 0;
+    const lines = [];
     itemsBody.querySelectorAll('tr:not(#empty-state)').forEach((row) => {
       const qtyInput = row.querySelector("input[name='item_quantity[]']");
       const priceInput = row.querySelector("input[name='item_unit_price[]']");
+      const rateInput = row.querySelector("[name='item_gst_rate[]']");
       const lineTotalCell = row.querySelector('.line-total');
 
       if (!qtyInput || !priceInput) return;
@@ -48,12 +55,19 @@
       const lineTotal = qty * price;
       lineTotalCell.textContent = lineTotal.toFixed(2);
       subtotal += lineTotal;
+      lines.push({ amount: lineTotal, rate: parseFloat((rateInput && rateInput.value) || '0') });
     });
 
     subtotalDisplay.textContent = subtotal.toFixed(2);
 
-    const discount = parseFloat(discountInput.value || '0');
-    const tax = parseFloat(taxInput.value || '0');
+    // Preview only: the server recomputes GST per line from product rates
+    const discount = Math.min(Math.max(parseFloat(discountInput.value || '0'), 0), subtotal);
+    let tax = 0;
+    lines.forEach((line) => {
+      const taxable = subtotal ? line.amount - discount * line.amount / subtotal : 0;
+      tax += Math.round(taxable * line.rate) / 100;
+    });
+    taxDisplay.textContent = tax.toFixed(2);
     const total = subtotal - discount + tax;
     totalDisplay.textContent = total.toFixed(2);
   }
@@ -65,6 +79,7 @@
     const qty = 1;
     const sku = product && product.sku ? ` [${product.sku}]` : '';
     const stock = product ? (product.stock_quantity || 0) : 0;
+    const gstRate = product ? (product.gst_rate || 0) : 0;
     const stockWarning = product && stock <= 0 ? ' ⚠️ Out of stock' : '';
 
     return `
@@ -84,6 +99,9 @@
         <td>
           <input type="number" name="item_unit_price[]" min="0" step="0.01" value="${price}" 
                  style="font-size: 1rem; text-align: right;" />
+          ${product
+            ? `<input type="hidden" name="item_gst_rate[]" value="${gstRate}" /><small style="color: #6b7280;">GST ${gstRate}%</small>`
+            : `<select name="item_gst_rate[]" style="font-size: 0.8rem;">${[0, 0.25, 3, 5, 12, 18, 28].map(r => `<option value="${r}">GST ${r}%</option>`).join('')}</select>`}
         </td>
         <td class="line-total" style="font-weight: 600; text-align: right;">0.00</td>
         <td style="text-align: center;">
@@ -130,9 +148,11 @@
   function attachRowEvents(row) {
     const qtyInput = row.querySelector("input[name='item_quantity[]']");
     const priceInput = row.querySelector("input[name='item_unit_price[]']");
+    const rateInput = row.querySelector("select[name='item_gst_rate[]']");
     const removeBtn = row.querySelector('.remove-row');
 
     if (qtyInput) qtyInput.addEventListener('input', recalcTotals);
+    if (rateInput) rateInput.addEventListener('change', recalcTotals);
     if (priceInput) priceInput.addEventListener('input', recalcTotals);
     if (removeBtn) {
       removeBtn.addEventListener('click', () => {
@@ -578,7 +598,114 @@
   });
 
   if (discountInput) discountInput.addEventListener('input', recalcTotals);
-  if (taxInput) taxInput.addEventListener('input', recalcTotals);
+
+  // --- Save through the JSON API ---
+  // The invoice is posted as JSON and the form is reset for the next bill,
+  // without loading the invoice page. If the API cannot be reached, the bill
+  // is queued under a reserved number to sync later (offline_billing.js),
+  // or, with no reserved number left, the form is submitted normally.
+  function invoicePayload() {
+    const data = new FormData(invoiceForm);
+    const payload = {};
+    ['invoice_date', 'customer_name', 'customer_phone', 'customer_address', 'customer_gstin',
+      'discount', 'payment_mode', 'payment_reference', 'notes', 'branch_id'].forEach((field) => {
+      if (data.has(field)) payload[field] = data.get(field);
+    });
+    const rates = data.getAll('item_gst_rate[]');
+    const productIds = data.getAll('item_product_id[]');
+    const quantities = data.getAll('item_quantity[]');
+    const prices = data.getAll('item_unit_price[]');
+    payload.items = data.getAll('item_description[]').map((description, i) => ({
+      description,
+      quantity: quantities[i],
+      unit_price: prices[i],
+      product_id: productIds[i] || null,
+      gst_rate: rates[i] || 0,
+    }));
+    return payload;
+  }
+
+  function showResult(html, isError) {
+    invoiceResult.className = `flash ${isError ? 'flash-error' : 'flash-success'}`;
+    invoiceResult.innerHTML = html;
+    invoiceResult.hidden = false;
+    invoiceResult.scrollIntoView({ behavior: 'smooth', block: 'nearest' });
+  }
+
+  // A new key per bill; retries of the same bill (including the plain form
+  // fallback below) reuse it, so the server saves the bill only once.
+  const idempotencyInput = document.getElementById('idempotency-key');
+
+  function newIdempotencyKey() {
+    if (window.crypto && crypto.randomUUID) return crypto.randomUUID();
+    return `${Date.now().toString(36)}-${Math.random().toString(36).slice(2)}${Math.random().toString(36).slice(2)}`;
+  }
+
+  // A page kept by the service worker carries the key of an earlier render
+  if (idempotencyInput) idempotencyInput.value = newIdempotencyKey();
+
+  function queueOffline(payload) {
+    const number = offline && offline.enqueue(payload, idempotencyInput ? idempotencyInput.value : newIdempotencyKey(), products);
+    if (!number) return false;
+    showResult(`Saved offline as invoice <strong>${number}</strong>. It will be synced when the connection is back.`, false);
+    resetInvoiceForm();
+    return true;
+  }
+
+  function resetInvoiceForm() {
+    invoiceForm.reset();
+    if (idempotencyInput) idempotencyInput.value = newIdempotencyKey();
+    itemsBody.querySelectorAll('tr:not(#empty-state)').forEach((row) => row.remove());
+    updateEmptyState();
+    recalcTotals();
+    if (quickAddInput) quickAddInput.focus();
+  }
+
+  if (invoiceForm && invoiceResult && window.fetch) {
+    let saving = false;
+    invoiceForm.addEventListener('submit', (e) => {
+      e.preventDefault();
+      if (saving) return;
+      saving = true;
+      const payload = invoicePayload();
+
+      if (navigator.onLine === false && queueOffline(payload)) {
+        saving = false;
+        return;
+      }
+
+      fetch(invoiceForm.dataset.apiUrl, {
+        method: 'POST',
+        credentials: 'same-origin',
+        headers: {
+          'Content-Type': 'application/json',
+          'Accept': 'application/json',
+          'Idempotency-Key': idempotencyInput ? idempotencyInput.value : '',
+        },
+        body: JSON.stringify(payload),
+      }).then((response) => response.json().then((body) => ({ response, body }))).then(({ response, body }) => {
+        if (response.status === 201) {
+          const invoice = body.data;
+          const viewUrl = invoiceForm.dataset.viewUrl.replace('/0', `/${invoice.id}`);
+          const pdfUrl = invoiceForm.dataset.pdfUrl.replace('/0', `/${invoice.id}`);
+          showResult(`Invoice <strong>${invoice.invoice_number}</strong> saved (total ${Number(invoice.total).toFixed(2)}).
+            <a href="${viewUrl}">View</a> | <a href="${pdfUrl}">PDF</a>`, false);
+          resetInvoiceForm();
+        } else if (response.status === 400) {
+          showResult(body.error.message.replace(/</g, '&lt;'), true);
+        } else {
+          throw new Error(`HTTP ${response.status}`);
+        }
+      }).catch((error) => {
+        // fetch() itself failing means the server could not be reached
+        if (error instanceof TypeError && queueOffline(payload)) return;
+        // Let the server handle it the classic way (it also shows the error page or login)
+        invoiceForm.submit();
+      }).finally(() => {
+        saving = false;
+      });
+    });
+  }
 
   // Add CSS animations
   const style = document.createElement('style');
@@ -0,0 +1,185 @@
+// Offline billing for the new invoice page.
+//
+// Each browser is one billing terminal. It keeps in localStorage the product
+// catalog, blocks of invoice numbers reserved for it on the server, and the
+// bills made while the server could not be reached. Queued bills are sent to
+// the sync endpoint in batches when the connection is back; the server
+// checks each number against the terminal's blocks and saves each bill once.
+window.OfflineBilling = (function () {
+  const form = document.getElementById('invoice-form');
+  if (!form || !window.fetch || !window.localStorage) return null;
+
+  const statusEl = document.getElementById('offline-status');
+  // One namespace per store, so two logins on one browser keep apart
+  const namespace = `billing:${form.dataset.numberPrefix}:`;
+  // Reserve more numbers when fewer than this are left
+  const LOW_WATER = 10;
+  // Same as the API's MAX_BATCH
+  const SYNC_BATCH = 100;
+  const SYNC_INTERVAL_MS = 60000;
+
+  function load(name, fallback) {
+    try {
+      const value = JSON.parse(localStorage.getItem(namespace + name));
+      return value === null ? fallback : value;
+    } catch (e) {
+      return fallback;
+    }
+  }
+
+  function save(name, value) {
+    localStorage.setItem(namespace + name, JSON.stringify(value));
+  }
+
+  function randomId() {
+    if (window.crypto && crypto.randomUUID) return crypto.randomUUID();
+    return `${Date.now().toString(36)}-${Math.random().toString(36).slice(2)}`;
+  }
+
+  function terminalId() {
+    let id = load('terminal', null);
+    if (!id) {
+      id = `t-${randomId()}`;
+      save('terminal', id);
+    }
+    return id;
+  }
+
+  function postJson(url, body) {
+    return fetch(url, {
+      method: 'POST',
+      credentials: 'same-origin',
+      headers: { 'Content-Type': 'application/json', 'Accept': 'application/json' },
+      body: JSON.stringify(body),
+    }).then((response) => response.json().then((data) => ({ response, data })));
+  }
+
+  // --- Catalog ---
+  // The page embeds the catalog with the time it was rendered. A cached
+  // catalog at least as new has the stock of offline bills taken off, so
+  // it wins over a copy of the page the service worker kept.
+  function catalog(products, renderedAt) {
+    const cached = load('catalog', null);
+    if (cached && (!products.length || cached.renderedAt >= renderedAt)) return cached.products;
+    save('catalog', { renderedAt, products });
+    return products;
+  }
+
+  function takeStock(products, items) {
+    const cached = load('catalog', null);
+    items.forEach((item) => {
+      const product = item.product_id && products.find((p) => String(p.id) === String(item.product_id));
+      if (product) product.stock_quantity = (product.stock_quantity || 0) - (parseFloat(item.quantity) || 0);
+    });
+    if (cached) save('catalog', { renderedAt: cached.renderedAt, products });
+  }
+
+  // --- Invoice numbers ---
+  function numbersLeft() {
+    return load('blocks', []).reduce((left, block) => left + block.last - block.next + 1, 0);
+  }
+
+  let reserving = null;
+  function reserveNumbers() {
+    if (reserving || numbersLeft() >= LOW_WATER) return reserving || Promise.resolve();
+    const url = form.dataset.blocksUrl.replace('__terminal__', encodeURIComponent(terminalId()));
+    reserving = postJson(url, {}).then(({ response, data }) => {
+      if (response.status === 201) {
+        const blocks = load('blocks', []);
+        blocks.push({
+          prefix: data.data.prefix, year: data.data.year, first: data.data.first, last: data.data.last, next: data.data.first,
+        });
+        save('blocks', blocks);
+      }
+    }).catch(() => { }).finally(() => {
+      reserving = null;
+    });
+    return reserving;
+  }
+
+  // The number carries the year the block was reserved in, like numbers the
+  // server hands out; blocks stored before the server sent it use this year
+  function takeNumber() {
+    const blocks = load('blocks', []).filter((block) => block.next <= block.last);
+    if (!blocks.length) return null;
+    const block = blocks[0];
+    const sequence = block.next;
+    block.next += 1;
+    save('blocks', blocks);
+    const year = block.year || new Date().getFullYear();
+    return { sequence, invoiceNumber: `${block.prefix}-${year}-${String(sequence).padStart(4, '0')}` };
+  }
+
+  // --- Queue ---
+  function showStatus() {
+    if (!statusEl) return;
+    const queued = load('queue', []).length;
+    const rejected = load('rejected', []);
+    const parts = [];
+    if (queued) parts.push(`${queued} bill${queued === 1 ? '' : 's'} waiting to sync`);
+    if (rejected.length) {
+      parts.push(`${rejected.length} not accepted by the server: ` +
+        rejected.map((r) => `${r.invoice_number} (${r.error})`).join('; ').replace(/</g, '&lt;'));
+    }
+    statusEl.innerHTML = parts.join('<br>');
+    statusEl.hidden = !parts.length;
+  }
+
+  // Queue a bill; returns its invoice number, or null when no number is left
+  function enqueue(payload, key, products) {
+    const number = takeNumber();
+    if (!number) return null;
+    const queue = load('queue', []);
+    queue.push(Object.assign({}, payload, { key, sequence: number.sequence, invoice_number: number.invoiceNumber }));
+    save('queue', queue);
+    if (products) takeStock(products, payload.items || []);
+    showStatus();
+    return number.invoiceNumber;
+  }
+
+  let syncing = false;
+  function sync() {
+    const batch = load('queue', []).slice(0, SYNC_BATCH);
+    if (syncing || !batch.length) return Promise.resolve();
+    syncing = true;
+    // A batch is billed at one branch; bills queued at another go in the next one
+    const branchId = batch[0].branch_id;
+    const body = {
+      terminal_id: terminalId(),
+      branch_id: branchId,
+      invoices: batch.filter((record) => record.branch_id === branchId),
+    };
+    return postJson(form.dataset.syncUrl, body).then(({ response, data }) => {
+      if (response.status !== 200) return false;
+      const done = {};
+      const rejected = load('rejected', []);
+      data.data.forEach((result, i) => {
+        done[result.key] = true;
+        if (result.status === 'rejected') rejected.push(Object.assign({}, body.invoices[i], { error: result.error }));
+      });
+      // Bills queued while the batch was in flight stay in the queue
+      save('queue', load('queue', []).filter((record) => !done[record.key]));
+      save('rejected', rejected);
+      return true;
+    }).catch(() => false).then((synced) => {
+      syncing = false;
+      showStatus();
+      if (synced && load('queue', []).length) return sync();
+      return undefined;
+    });
+  }
+
+  window.addEventListener('online', () => {
+    sync();
+    reserveNumbers();
+  });
+  setInterval(sync, SYNC_INTERVAL_MS);
+  if (navigator.serviceWorker && form.dataset.serviceWorkerUrl) {
+    navigator.serviceWorker.register(form.dataset.serviceWorkerUrl, { scope: '/invoice/' }).catch(() => { });
+  }
+  showStatus();
+  sync();
+  reserveNumbers();
+
+  return { catalog, enqueue, sync, reserveNumbers };
+})();
@@ -0,0 +1,69 @@
+"""
+Bytes on the wire and latency per route with and without compression (user-046).
+
+Each route is fetched with Accept-Encoding: identity (the middleware passes
+the response through untouched), gzip and, when the brotli package is
+installed, br. Prints the body size, the median time to read the whole
+body in-process, and that time plus the transfer time on a LINK_MBIT link.
+A body under COMPRESSION_MIN_SIZE is sent as is whatever was asked for;
+its ratio reads "passed through".
+
+    python tests/benchmarks/bench_compression.py [invoices]
+"""
+import sys
+
+from common import app, reset, seed_store, timed, logged_in_client, print_table
+import compression
+
+USER_ID = "bench-store"
+# A shop's mobile or DSL connection
+LINK_MBIT = 10
+ROUTES = [
+    "/",
+    "/invoice/new",
+    # The first month seed_store() bills in, so it has invoices at any size
+    "/reports?period=monthly&month=2024-04",
+    "/products",
+    "/invoices/export",
+    "/reports/export?period=monthly&month=2024-04",
+    "/api/v1/products",
+]
+
+
+def main(invoices: int = 1000) -> None:
+    reset()
+    seed_store(USER_ID, invoices, products=200)
+    client = logged_in_client(USER_ID)
+    encodings = ["identity", "gzip"] + (["br"] if compression.brotli else [])
+
+    rows = []
+    for route in ROUTES:
+        sizes, times, sent = [], [], []
+        for encoding in encodings:
+            headers = {"Accept-Encoding": encoding}
+            response = client.get(route, headers=headers)
+            assert response.status_code == 200, (route, response.status_code)
+            sent.append(response.headers.get("Content-Encoding", "identity"))
+            sizes.append(len(response.get_data()))
+            times.append(timed(lambda: client.get(route, headers=headers).get_data(), repeat=10))
+        rows.append((
+            route,
+            *(f"{size / 1024:.1f}" for size in sizes),
+            *(f"{ms:.1f}" for ms in times),
+            *(f"{ms + size * 8 / (LINK_MBIT * 1000):.0f}" for size, ms in zip(sizes, times)),
+            *(f"{sizes[0] / size:.1f}x" if used == encoding else "passed through"
+              for size, used, encoding in zip(sizes[1:], sent[1:], encodings[1:])),
+        ))
+
+    print(f"{invoices} invoices, 200 products; min size {app.config['COMPRESSION_MIN_SIZE']} B, "
+          f"gzip level {app.config['COMPRESSION_GZIP_LEVEL']}, brotli quality {app.config['COMPRESSION_BROTLI_QUALITY']}")
+    print_table(
+        ["route", *(f"{name} KB" for name in encodings), *(f"{name} ms" for name in encodings),
+         *(f"{name} @{LINK_MBIT}Mbit ms" for name in encodings),
+         *(f"{name} ratio" for name in encodings[1:])],
+        rows,
+    )
+
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:]))
@@ -0,0 +1,73 @@
+"""
+ORM objects versus read_models rows for the invoice list (user-026).
+
+Loads one store's invoices three ways and reads the columns the list page
+shows: ORM objects with the items joined in (the old lazy='joined'
+relationship), plain ORM objects, and read_models.list_invoices(). Prints
+the median time and the peak memory allocated per row.
+
+    python tests/benchmarks/bench_read_models.py [invoices]
+"""
+import sys
+import tracemalloc
+
+from sqlalchemy.orm import joinedload
+
+from common import app, db, reset, seed_store, timed, print_table
+from models import Invoice
+import read_models
+
+USER_ID = "bench-store"
+FIELDS = read_models.InvoiceRow._fields
+
+
+def orm_joined():
+    invoices = (Invoice.query.options(joinedload(Invoice.items)).filter_by(user_id=USER_ID)
+                .order_by(Invoice.created_at.desc()).all())
+    return [[getattr(invoice, name) for name in FIELDS] for invoice in invoices]
+
+
+def orm():
+    invoices = Invoice.query.filter_by(user_id=USER_ID).order_by(Invoice.created_at.desc()).all()
+    return [[getattr(invoice, name) for name in FIELDS] for invoice in invoices]
+
+
+def core_rows():
+    return [list(row) for row in read_models.list_invoices(USER_ID)]
+
+
+def measure(load):
+    """``(median ms, peak KB allocated per 1000 rows)`` of one load in a fresh session."""
+    def run():
+        with app.app_context():
+            load()
+            db.session.remove()
+
+    ms = timed(run, repeat=10)
+    with app.app_context():
+        tracemalloc.start()
+        rows = len(load())
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        db.session.remove()
+    return ms, peak / 1024 / rows * 1000
+
+
+def main(invoices: int = 5000) -> None:
+    reset()
+    seed_store(USER_ID, invoices)
+
+    results = [(name, *measure(load)) for name, load in (
+        ("ORM + joined items", orm_joined), ("ORM", orm), ("read_models", core_rows),
+    )]
+    baseline_ms, baseline_kb = results[0][1:]
+    print(f"{invoices} invoices, 3 items each")
+    print_table(
+        ["path", "median ms", "KB / 1000 rows", "time vs joined", "memory vs joined"],
+        [(name, f"{ms:.1f}", f"{kb:.0f}", f"{ms / baseline_ms:.2f}x", f"{kb / baseline_kb:.2f}x")
+         for name, ms, kb in results],
+    )
+
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:]))
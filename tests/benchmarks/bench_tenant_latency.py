@@ -0,0 +1,63 @@
+"""
+Per-store query latency as the other stores' data grows (user-041).
+
+One store's data stays the same while other stores of the same size are
+added. The store's invoice list, a month's invoices, the month's HSN
+summary and a stock valuation are timed at each step; with every query
+led by user_id (composite indexes, or partitions on PostgreSQL) their
+times should stay flat instead of growing with the tables.
+
+On PostgreSQL (BENCH_DATABASE_URL) set BENCH_PARTITION=1 to partition the
+tables first, as partition_tables.py does.
+
+    python tests/benchmarks/bench_tenant_latency.py [invoices per store] [steps ...]
+"""
+import os
+import sys
+from datetime import date, datetime
+
+from common import app, db, reset, seed_store, timed, print_table
+import gst
+import inventory
+import partitioning
+import read_models
+
+USER_ID = "bench-store"
+MONTH = (date(2024, 5, 1), date(2024, 6, 1))
+VALUED_AT = datetime(2024, 5, 15)
+
+QUERIES = {
+    "invoice list": lambda: read_models.list_invoices(USER_ID),
+    "month invoices": lambda: read_models.invoices_between(USER_ID, *MONTH),
+    "month HSN": lambda: gst.hsn_summary(USER_ID, *MONTH),
+    "valuation": lambda: inventory.stock_valuation(USER_ID, VALUED_AT),
+}
+
+
+def main(invoices: int = 1000, *steps: int) -> None:
+    steps = steps or (0, 10, 30)
+    reset()
+    seed_store(USER_ID, invoices)
+    if os.environ.get("BENCH_PARTITION"):
+        with app.app_context():
+            partitioning.partition_tables(db.session.connection())
+            db.session.commit()
+
+    rows = []
+    others = 0
+    for step in steps:
+        for n in range(others, step):
+            seed_store(f"other-{n}", invoices)
+        others = step
+        with app.app_context():
+            dialect = db.engine.dialect.name
+            timings = [timed(query) for query in QUERIES.values()]
+            db.session.remove()
+        rows.append((step + 1, (step + 1) * invoices, *(f"{ms:.2f}" for ms in timings)))
+
+    print(f"{invoices} invoices per store on {dialect}")
+    print_table(["stores", "invoices", *(f"{name} ms" for name in QUERIES)], rows)
+
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:]))
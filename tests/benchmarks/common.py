@@ -0,0 +1,121 @@
+"""
+Shared setup for the benchmark scripts of the R Sanju Invoice test suite.
+
+The scripts are run by hand (``python tests/benchmarks/bench_<name>.py``)
+and are not collected by pytest. They use a throwaway SQLite database, or
+BENCH_DATABASE_URL when it is set; that database is dropped and recreated,
+so never point it at real data. DATABASE_URL is ignored on purpose.
+"""
+import os
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[2]
+os.environ["DATABASE_URL"] = (
+    os.environ.get("BENCH_DATABASE_URL")
+    or f"sqlite:///{Path(tempfile.mkdtemp(prefix='invoice-bench-')) / 'bench.db'}"
+)
+os.environ.setdefault("CACHE_BACKEND", "memory")
+sys.path.insert(0, str(ROOT))
+
+from sqlalchemy import insert  # noqa: E402
+
+from app import app  # noqa: E402
+from models import db, User, Product, Invoice, InvoiceItem, StockTransaction  # noqa: E402
+import cache  # noqa: E402
+
+BATCH = 1000
+
+
+def reset() -> None:
+    """Drop and recreate every table and empty the cache."""
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+    cache.clear()
+
+
+def seed_store(user_id: str, invoices: int, items_per_invoice: int = 3, products: int = 20,
+               first_day: date = date(2024, 4, 1)) -> None:
+    """Bulk-insert a store with ``invoices`` invoices spread one per hour from ``first_day``.
+
+    Rows go in through Core executemany INSERTs, as billing them through
+    services would take minutes at benchmark sizes. Every item sells one of
+    the store's products and has a matching ledger row.
+    """
+    now = datetime.utcnow()
+    with app.app_context():
+        connection = db.session.connection()
+        connection.execute(insert(User.__table__), [{"id": user_id, "email": f"{user_id}@example.com", "created_at": now}])
+        product_ids = [
+            connection.execute(insert(Product.__table__).values(
+                user_id=user_id, name=f"Product {n}", sku=f"SKU-{n}", barcode=f"SKU-{n}", unit_price=10.0 + n,
+                cost_price=6.0 + n, stock_quantity=1_000_000, min_stock_level=5, version=1,
+                created_at=now, updated_at=now,
+            )).inserted_primary_key[0]
+            for n in range(products)
+        ]
+
+        invoice_id = (db.session.query(db.func.max(Invoice.id)).scalar() or 0) + 1
+        for start in range(0, invoices, BATCH):
+            invoice_rows, item_rows, ledger_rows = [], [], []
+            for n in range(start, min(start + BATCH, invoices)):
+                created_at = datetime.combine(first_day, datetime.min.time()) + timedelta(hours=n)
+                lines = [
+                    (product_ids[(n + line) % products], 1 + line, 10.0 + (n + line) % products)
+                    for line in range(items_per_invoice)
+                ]
+                total = sum(quantity * price for _, quantity, price in lines)
+                invoice_rows.append({
+                    "id": invoice_id, "user_id": user_id, "invoice_number": f"{user_id}-{n + 1:07d}",
+                    "invoice_date": (created_at + timedelta(hours=5, minutes=30)).date(),
+                    "customer_name": f"Customer {n % 97}", "customer_phone": f"98{n % 97:08d}",
+                    "subtotal": total, "discount": 0.0, "tax": 0.0, "total": total, "payment_mode": "CASH",
+                    "status": "active", "created_at": created_at, "updated_at": created_at,
+                })
+                for product_id, quantity, price in lines:
+                    item_rows.append({
+                        "user_id": user_id, "invoice_id": invoice_id, "product_id": product_id,
+                        "description": f"Product {product_id}", "quantity": quantity, "unit_price": price,
+                        "line_total": quantity * price, "gst_rate": 0.0, "taxable_value": quantity * price,
+                        "cgst": 0.0, "sgst": 0.0, "igst": 0.0,
+                    })
+                    ledger_rows.append({
+                        "user_id": user_id, "product_id": product_id, "transaction_type": "sale",
+                        "quantity": -quantity, "reference_id": str(invoice_id), "date": created_at,
+                    })
+                invoice_id += 1
+            connection.execute(insert(Invoice.__table__), invoice_rows)
+            connection.execute(insert(InvoiceItem.__table__), item_rows)
+            connection.execute(insert(StockTransaction.__table__), ledger_rows)
+        db.session.commit()
+
+
+def timed(run, repeat: int = 20) -> float:
+    """Median wall time of ``run()`` in milliseconds, after one warm-up call."""
+    run()
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        run()
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples)
+
+
+def logged_in_client(user_id: str):
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session["logged_in"] = True
+        session["user_id"] = user_id
+        session["email"] = f"{user_id}@example.com"
+    return client
+
+
+def print_table(headers: list, rows: list) -> None:
+    widths = [max(len(str(value)) for value in column) for column in zip(headers, *rows)]
+    for row in [headers, *rows]:
+        print("  ".join(str(value).rjust(width) for value, width in zip(row, widths)))
@@ -0,0 +1,103 @@
+"""
+Shared fixtures for the R Sanju Invoice test suite.
+
+The app reads DATABASE_URL when it is imported, so the tests point it at a
+throwaway SQLite file first. Each test gets freshly created tables, an empty
+cache and a client logged in as USER_ID.
+"""
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+import pytest
+from sqlalchemy import event
+
+ROOT = Path(__file__).resolve().parent.parent
+DB_PATH = Path(tempfile.mkdtemp(prefix="invoice-tests-")) / "test.db"
+os.environ["DATABASE_URL"] = f"sqlite:///{DB_PATH}"
+os.environ.setdefault("CACHE_BACKEND", "memory")
+sys.path.insert(0, str(ROOT))
+
+from app import app as flask_app  # noqa: E402
+from models import db  # noqa: E402
+import cache  # noqa: E402
+import services  # noqa: E402
+
+
+USER_ID = "test-user"
+OTHER_USER_ID = "other-user"
+
+
+@pytest.fixture
+def app():
+    flask_app.config["TESTING"] = True
+    with flask_app.app_context():
+        db.drop_all()
+        db.create_all()
+    cache.clear()
+    yield flask_app
+    with flask_app.app_context():
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture
+def client(app):
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session["logged_in"] = True
+        session["user_id"] = USER_ID
+        session["email"] = "owner@example.com"
+    return client
+
+
+@pytest.fixture
+def make_product(app):
+    """Create a product for USER_ID (or ``user_id``) and return its id."""
+    def make(name="Widget", sku=None, stock=50, price=10, user_id=USER_ID, **fields):
+        data = {
+            "name": name,
+            "sku": sku or name.upper(),
+            "unit_price": price,
+            "cost_price": price * 0.6,
+            "stock_quantity": stock,
+            "min_stock_level": 5,
+        }
+        data.update(fields)
+        with app.app_context():
+            return services.run_in_unit_of_work(services.create_product, user_id, data).id
+    return make
+
+
+@pytest.fixture
+def make_invoice(app):
+    """Bill ``lines`` of ``(product_id, quantity)`` for USER_ID and return the invoice id."""
+    def make(lines, user_id=USER_ID, **fields):
+        data = {
+            "customer_name": "Customer",
+            "payment_mode": "CASH",
+            "items": [
+                {"description": f"Item {product_id}", "quantity": quantity, "unit_price": 10, "product_id": product_id}
+                for product_id, quantity in lines
+            ],
+        }
+        data.update(fields)
+        with app.app_context():
+            return services.run_in_unit_of_work(services.create_invoice, user_id, data).id
+    return make
+
+
+@pytest.fixture
+def statements(app):
+    """The ``(sql, parameters)`` of every statement the app runs while the test does."""
+    log = []
+
+    def record(connection, cursor, statement, parameters, context, executemany):
+        log.append((statement, parameters))
+
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, "before_cursor_execute", record)
+    yield log
+    event.remove(engine, "before_cursor_execute", record)
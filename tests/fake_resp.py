@@ -0,0 +1,115 @@
+"""
+A small in-process stand-in for a Redis-protocol server, for the cache tests.
+
+It speaks RESP over TCP and implements the commands cache.RedisBackend
+sends: GET, SET (with PX), DEL, SADD, SMEMBERS, EXPIRE, RENAME, SCAN, AUTH
+and SELECT. Commands are logged so tests can check what was sent.
+"""
+import fnmatch
+import socketserver
+import threading
+import time
+
+
+class FakeRespServer(socketserver.ThreadingTCPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), _Handler)
+        self.data = {}
+        self.expires = {}
+        self.commands = []
+        self.lock = threading.Lock()
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        return f"redis://:secret@127.0.0.1:{self.server_address[1]}/1"
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+    def _alive(self, key: bytes) -> bool:
+        if key in self.expires and self.expires[key] < time.time():
+            self.data.pop(key, None)
+            self.expires.pop(key, None)
+        return key in self.data
+
+    def execute(self, args: list):
+        command, args = args[0].upper().decode(), args[1:]
+        self.commands.append(command)
+        if command == "GET":
+            return self.data[args[0]] if self._alive(args[0]) else None
+        if command == "SET":
+            self.data[args[0]] = args[1]
+            self.expires.pop(args[0], None)
+            if len(args) >= 4 and args[2].upper() == b"PX":
+                self.expires[args[0]] = time.time() + int(args[3]) / 1000
+            return "OK"
+        if command == "DEL":
+            removed = [key for key in args if self._alive(key)]
+            for key in removed:
+                del self.data[key]
+                self.expires.pop(key, None)
+            return len(removed)
+        if command == "SADD":
+            members = self.data[args[0]] if self._alive(args[0]) else self.data.setdefault(args[0], set())
+            before = len(members)
+            members.update(args[1:])
+            return len(members) - before
+        if command == "SMEMBERS":
+            return sorted(self.data[args[0]]) if self._alive(args[0]) else []
+        if command == "EXPIRE":
+            if not self._alive(args[0]):
+                return 0
+            self.expires[args[0]] = time.time() + int(args[1])
+            return 1
+        if command == "RENAME":
+            if not self._alive(args[0]):
+                return ValueError("ERR no such key")
+            self.data[args[1]] = self.data.pop(args[0])
+            if args[0] in self.expires:
+                self.expires[args[1]] = self.expires.pop(args[0])
+            return "OK"
+        if command == "SCAN":
+            pattern = args[args.index(b"MATCH") + 1].decode()
+            keys = [key for key in list(self.data) if self._alive(key) and fnmatch.fnmatchcase(key.decode(), pattern)]
+            return [b"0", keys]
+        if command in ("AUTH", "SELECT"):
+            return "OK"
+        return ValueError(f"ERR unknown command '{command}'")
+
+
+def _encode(value) -> bytes:
+    if value is None:
+        return b"$-1\r\n"
+    if isinstance(value, int):
+        return b":%d\r\n" % value
+    if isinstance(value, str):
+        return b"+%s\r\n" % value.encode()
+    if isinstance(value, Exception):
+        return b"-%s\r\n" % str(value).encode()
+    if isinstance(value, bytes):
+        return b"$%d\r\n%s\r\n" % (len(value), value)
+    return b"*%d\r\n" % len(value) + b"".join(_encode(item) for item in value)
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    def handle(self):
+        while True:
+            header = self.rfile.readline()
+            if not header:
+                return
+            args = []
+            for _ in range(int(header[1:])):
+                length = int(self.rfile.readline()[1:])
+                args.append(self.rfile.read(length + 2)[:-2])
+            with self.server.lock:
+                reply = self.server.execute(args)
+            self.wfile.write(_encode(reply))
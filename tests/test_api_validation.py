@@ -0,0 +1,70 @@
+"""Malformed JSON API input gets the 400 validation_error envelope, never a 500 (user-037)."""
+import pytest
+
+from models import db, Product
+import purchasing
+import services
+
+from conftest import USER_ID, OTHER_USER_ID
+
+
+def _supplier(app, user_id, name):
+    with app.app_context():
+        services.ensure_user(user_id)
+        supplier = purchasing.get_or_create_supplier(user_id, name=name)
+        db.session.commit()
+        return supplier.id
+
+
+def _assert_validation_error(response, text):
+    assert response.status_code == 400, response.get_json()
+    error = response.get_json()["error"]
+    assert error["code"] == "validation_error"
+    assert text in error["message"]
+
+
+@pytest.mark.parametrize("field, value", [("name", 5), ("sku", ["A"]), ("hsn_code", 8471), ("category", {"a": 1})])
+def test_product_text_fields_must_be_strings(client, field, value):
+    record = {"name": "Widget", "unit_price": 10}
+    record[field] = value
+    _assert_validation_error(client.post("/api/v1/products", json=record), f"{field} must be a string")
+
+
+def test_invoice_items_must_be_objects(client):
+    response = client.post("/api/v1/invoices", json={"items": ["Widget"]})
+    _assert_validation_error(response, "items must be a list of objects")
+    response = client.post("/api/v1/invoices", json={"items": "Widget"})
+    _assert_validation_error(response, "items must be a list of objects")
+
+
+def test_invoice_item_fields_must_be_strings(client):
+    response = client.post("/api/v1/invoices", json={"items": [{"description": 7, "quantity": 1, "unit_price": 5}]})
+    _assert_validation_error(response, "description must be a string")
+    response = client.post("/api/v1/invoices", json={
+        "customer_name": 42, "items": [{"description": "Widget", "quantity": 1, "unit_price": 5}],
+    })
+    _assert_validation_error(response, "customer_name must be a string")
+
+
+def test_supplier_id_must_be_an_integer(client):
+    response = client.post("/api/v1/products", json={"name": "Widget", "supplier_id": "abc"})
+    _assert_validation_error(response, "supplier_id must be an integer")
+
+
+def test_supplier_of_another_store_is_rejected(app, client, make_product):
+    theirs = _supplier(app, OTHER_USER_ID, "Their supplier")
+    ours = _supplier(app, USER_ID, "Our supplier")
+
+    response = client.post("/api/v1/products", json={"name": "Widget", "supplier_id": theirs})
+    _assert_validation_error(response, f"Unknown supplier id: {theirs}")
+
+    product_id = make_product()
+    form = {"name": "Widget", "sku": "WIDGET", "unit_price": 10, "stock_quantity": 50, "supplier_id": theirs}
+    client.post(f"/products/{product_id}/edit", data=form)
+    with app.app_context():
+        assert db.session.get(Product, product_id).supplier_id is None
+
+    response = client.post("/api/v1/products", json={"name": "Gadget", "supplier_id": ours})
+    assert response.status_code == 201
+    with app.app_context():
+        assert db.session.get(Product, response.get_json()["data"]["id"]).supplier_id == ours
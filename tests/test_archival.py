@@ -0,0 +1,71 @@
+"""Stock valuation inside archived years (user-042)."""
+from datetime import date, datetime
+
+import pytest
+
+from models import db, Product, StockTransaction
+import archival
+import inventory
+
+from conftest import USER_ID
+
+# (date, quantity) of the product's ledger, spread over financial years 2021 to 2025
+MOVEMENTS = [
+    (datetime(2022, 1, 10), 100),
+    (datetime(2022, 6, 1), -30),
+    (datetime(2022, 9, 1), -20),
+    (datetime(2023, 5, 1), -10),
+    (datetime(2025, 5, 1), -5),
+]
+
+VALUED_AT = [
+    datetime(2022, 3, 1),
+    datetime(2022, 7, 1),
+    datetime(2023, 1, 1),
+    datetime(2024, 1, 1),
+    datetime(2025, 1, 1),
+    datetime(2026, 1, 1),
+]
+
+
+@pytest.fixture
+def product_id(app, make_product):
+    product_id = make_product(stock=0)
+    with app.app_context():
+        db.session.query(StockTransaction).delete()
+        product = db.session.get(Product, product_id)
+        product.created_at = datetime(2022, 1, 1)
+        product.stock_quantity = sum(quantity for _, quantity in MOVEMENTS)
+        db.session.add_all(
+            StockTransaction(user_id=USER_ID, product_id=product_id, transaction_type="adjustment",
+                             quantity=quantity, date=day)
+            for day, quantity in MOVEMENTS
+        )
+        db.session.commit()
+    return product_id
+
+
+def _quantities(user_id=USER_ID):
+    return [[row.quantity for row in inventory.stock_valuation(user_id, at)] for at in VALUED_AT]
+
+
+def test_valuation_is_unchanged_by_archiving(app, product_id):
+    with app.app_context():
+        before = _quantities()
+        assert before == [[100], [70], [50], [40], [40], [35]]
+
+        for year in (2021, 2022, 2023):
+            archival.archive_financial_year(USER_ID, year, today=date(2026, 10, 19))
+        db.session.commit()
+        assert archival.archive_boundary(USER_ID) == archival._ledger_time(date(2024, 4, 1))
+        assert db.session.query(StockTransaction).count() == 1
+
+        assert _quantities() == before
+
+
+def test_valuation_before_first_checkpoint(app, product_id):
+    with app.app_context():
+        archival.archive_financial_year(USER_ID, 2022, today=date(2026, 10, 19))
+        db.session.commit()
+        # Financial year 2021 is still hot; the checkpoint at the end of 2022 is the nearest
+        assert _quantities() == [[100], [70], [50], [40], [40], [35]]
@@ -0,0 +1,40 @@
+"""Minified, fingerprinted static assets (user-045)."""
+import os
+
+from flask import Flask, url_for
+
+import assets
+
+
+def test_css_strings_are_kept_as_written():
+    css = """
+    /* it's a comment */
+    a :hover { content: "a  /* b */" ; background: url("a b.png") }
+    b > c , d { font-family: 'My  Font', "x\\"  y" ; }
+    """
+    assert assets.minify_css(css) == (
+        'a :hover{content:"a  /* b */";background:url("a b.png")}'
+        "b>c,d{font-family:'My  Font',\"x\\\"  y\"}"
+    )
+
+
+def test_debug_turned_on_after_setup_rebuilds_edited_files(tmp_path):
+    style = tmp_path / "style.css"
+    style.write_text("a { color: red; }")
+    app = Flask(__name__, static_folder=str(tmp_path))
+    assets.init_app(app)
+
+    def static_url():
+        with app.test_request_context():
+            return url_for("static", filename="style.css")
+
+    before = static_url()
+    style.write_text("a { color: blue; }")
+    os.utime(style, (1, 1))
+    # Not in debug mode: the manifest built at startup stands
+    assert static_url() == before
+
+    app.debug = True
+    after = static_url()
+    assert after != before
+    assert app.test_client().get(after).get_data() == b"a{color:blue}"
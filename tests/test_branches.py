@@ -0,0 +1,21 @@
+"""Branch switching only redirects within the site (user-049)."""
+import pytest
+
+
+@pytest.mark.parametrize("target", [
+    "https://evil.example/",
+    "//evil.example/path",
+    "/\\evil.example",
+    "/\t/evil.example",
+    "javascript:alert(1)",
+    "invoices",
+])
+def test_switch_branch_ignores_offsite_next(client, target):
+    response = client.post("/branches/switch", data={"branch_id": "0", "next": target})
+    assert response.status_code == 302
+    assert response.headers["Location"] == "/branches"
+
+
+def test_switch_branch_follows_local_next(client):
+    response = client.post("/branches/switch", data={"branch_id": "0", "next": "/invoice/new?x=1"})
+    assert response.headers["Location"] == "/invoice/new?x=1"
@@ -0,0 +1,170 @@
+"""The same contract for every cache backend, Redis against a local stand-in (user-050)."""
+import time
+
+import pytest
+
+import cache
+
+from fake_resp import FakeRespServer
+
+
+@pytest.fixture
+def resp_server():
+    server = FakeRespServer().start()
+    yield server
+    server.stop()
+
+
+@pytest.fixture(params=["memory", "sqlite", "redis"])
+def backend(request, tmp_path):
+    if request.param == "memory":
+        backend = cache.MemoryBackend(max_entries=100)
+    elif request.param == "sqlite":
+        backend = cache.SQLiteBackend(str(tmp_path / "cache.sqlite3"), max_entries=100)
+    else:
+        backend = cache.RedisBackend(request.getfixturevalue("resp_server").url)
+    previous = cache._backend
+    cache.configure(backend)
+    cache.reset_stats()
+    yield backend
+    cache.configure(previous)
+
+
+def test_get_set_and_miss(backend):
+    assert cache.get(("rollup", "u1", "2024-04")) is None
+    value = {"total": 12.5, "rows": [("Rent", 10.0)]}
+    cache.set(("rollup", "u1", "2024-04"), value)
+    assert cache.get(("rollup", "u1", "2024-04")) == value
+    assert cache.get(("rollup", "u1", "2024-05")) is None
+
+
+def test_get_or_set_computes_once(backend):
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return [1, 2, 3]
+
+    assert cache.get_or_set(("k",), compute) == [1, 2, 3]
+    assert cache.get_or_set(("k",), compute) == [1, 2, 3]
+    assert len(calls) == 1
+
+
+def test_entries_expire(backend):
+    cache.set(("short",), "v", ttl=0.2)
+    cache.set(("long",), "v", ttl=60)
+    time.sleep(0.3)
+    assert cache.get(("short",)) is None
+    assert cache.get(("long",)) == "v"
+
+
+def test_invalidate_keys(backend):
+    cache.set(("a",), 1)
+    cache.set(("b",), 2)
+    cache.invalidate(("a",), ("missing",))
+    assert cache.get(("a",)) is None
+    assert cache.get(("b",)) == 2
+
+
+def test_invalidate_tags_and_user(backend):
+    cache.set(("rollup", "u1"), 1, tags=(cache.user_tag("u1"),))
+    cache.set(("analytics", "u1"), 2, tags=(cache.user_tag("u1"), "analytics"))
+    cache.set(("rollup", "u2"), 3, tags=(cache.user_tag("u2"),))
+    cache.set(("untagged",), 4)
+
+    cache.invalidate_user("u1")
+    assert cache.get(("rollup", "u1")) is None
+    assert cache.get(("analytics", "u1")) is None
+    assert cache.get(("rollup", "u2")) == 3
+    assert cache.get(("untagged",)) == 4
+
+    # Entries tagged again after an invalidation are tracked afresh
+    cache.set(("rollup", "u1"), 5, tags=(cache.user_tag("u1"),))
+    cache.invalidate_tags("nothing-has-this-tag")
+    assert cache.get(("rollup", "u1")) == 5
+    cache.invalidate_tags(cache.user_tag("u1"), cache.user_tag("u2"))
+    assert cache.get(("rollup", "u1")) is None
+    assert cache.get(("rollup", "u2")) is None
+
+
+def test_clear_and_size(backend):
+    for n in range(5):
+        cache.set(("k", n), n, tags=("t",))
+    assert backend.size() == 5
+    cache.clear()
+    assert backend.size() == 0
+    assert cache.get(("k", 0)) is None
+
+
+def test_stats_count_hits_and_misses(backend):
+    cache.get(("k",))
+    cache.set(("k",), "v")
+    cache.get(("k",))
+    cache.get(("k",))
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["sets"], stats["errors"]) == (2, 1, 1, 0)
+    assert stats["hit_ratio"] == pytest.approx(0.667)
+    assert stats["backend"] == backend.name
+    assert stats["entries"] == 1
+
+
+def test_memory_backend_evicts_least_recently_used():
+    backend = cache.MemoryBackend(max_entries=3)
+    for n in range(3):
+        backend.set(f"k{n}", n, 60, ("t",))
+    backend.get("k0")
+    backend.set("k3", 3, 60, ("t",))
+    assert backend.get("k1") is None
+    assert [backend.get(key) for key in ("k0", "k2", "k3")] == [0, 2, 3]
+    # Evicted keys leave the tag index too
+    assert set(backend._tags["t"]) == {"k0", "k2", "k3"}
+
+
+def test_sqlite_backend_is_shared_and_pruned(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    first = cache.SQLiteBackend(path, max_entries=2)
+    second = cache.SQLiteBackend(path, max_entries=2)
+    first.set("k", "v", 60, ("t",))
+    assert second.get("k") == "v"
+    second.delete_tags(["t"])
+    assert first.get("k") is None
+
+    for n in range(4):
+        first.set(f"k{n}", n, 60 + n, ())
+    first.prune()
+    assert first.size() == 2
+    assert first.get("k3") == 3 and first.get("k0") is None
+
+
+def test_redis_backend_renames_tag_sets_before_deleting(resp_server):
+    backend = cache.RedisBackend(resp_server.url)
+    backend.set("k", "v", 60, ("t",))
+    backend.delete_tags(["t"])
+    assert backend.get("k") is None
+    assert "RENAME" in resp_server.commands and "AUTH" in resp_server.commands
+    assert not any(key.startswith(b"invoice:t:") for key in resp_server.data)
+
+
+def test_unreachable_server_is_a_miss():
+    cache.configure(cache.RedisBackend("redis://127.0.0.1:1/0", timeout=0.2))
+    cache.reset_stats()
+    try:
+        assert cache.get_or_set(("k",), lambda: "computed") == "computed"
+        stats = cache.stats()
+        assert stats["errors"] >= 2 and stats["hits"] == 0
+    finally:
+        cache.configure(cache.MemoryBackend())
+
+
+def test_backend_bugs_are_not_hidden():
+    class Broken(cache.MemoryBackend):
+        def get(self, key):
+            raise AttributeError("bug in the backend")
+
+    previous = cache._backend
+    cache.configure(Broken())
+    try:
+        with pytest.raises(AttributeError):
+            cache.get(("k",))
+    finally:
+        cache.configure(previous)
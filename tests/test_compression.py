@@ -0,0 +1,82 @@
+"""CompressionMiddleware against WSGI apps that start late or are never read (user-046)."""
+import gzip
+
+import pytest
+
+from compression import CompressionMiddleware
+
+BODY = b"<p>invoice</p>" * 200
+GZIP = {"REQUEST_METHOD": "GET", "HTTP_ACCEPT_ENCODING": "gzip"}
+
+
+class Body:
+    """A response iterable that records whether it was closed."""
+
+    def __init__(self, start_response, chunks, start_before=0):
+        self.start_response = start_response
+        self.chunks = chunks
+        self.start_before = start_before
+        self.closed = False
+
+    def __iter__(self):
+        for index, chunk in enumerate(self.chunks):
+            if index == self.start_before:
+                self.start_response("200 OK", [("Content-Type", "text/html")])
+            yield chunk
+
+    def close(self):
+        self.closed = True
+
+
+def _run(app, environ=GZIP):
+    response = {}
+
+    def start_response(status, headers, exc_info=None):
+        response.update(status=status, headers=dict(headers))
+
+    body = CompressionMiddleware(app)(dict(environ), start_response)
+    try:
+        return response, b"".join(body)
+    finally:
+        body.close()
+
+
+def test_start_response_on_first_non_empty_chunk():
+    bodies = []
+
+    def app(environ, start_response):
+        bodies.append(Body(start_response, [b"", b"", BODY[:100], BODY[100:]], start_before=2))
+        return bodies[0]
+
+    response, data = _run(app)
+    assert response["headers"]["Content-Encoding"] == "gzip"
+    assert gzip.decompress(data) == BODY
+    assert bodies[0].closed
+
+
+def test_unread_response_still_closes_the_app_iterable():
+    bodies = []
+
+    def app(environ, start_response):
+        bodies.append(Body(start_response, [BODY]))
+        return bodies[0]
+
+    # The server gives up before reading a single chunk
+    CompressionMiddleware(app)(dict(GZIP), lambda *args: None).close()
+    assert bodies[0].closed
+
+
+def test_small_and_uncompressible_bodies_pass_through():
+    def app(environ, start_response):
+        start_response("200 OK", [("Content-Type", environ["TYPE"])])
+        return [environ["BODY"]]
+
+    response, data = _run(app, dict(GZIP, TYPE="text/html", BODY=b"<p>short</p>"))
+    assert "Content-Encoding" not in response["headers"] and data == b"<p>short</p>"
+    response, data = _run(app, dict(GZIP, TYPE="application/pdf", BODY=BODY))
+    assert "Content-Encoding" not in response["headers"] and data == BODY
+
+
+def test_app_that_never_starts_the_response_is_an_error():
+    with pytest.raises(RuntimeError):
+        _run(lambda environ, start_response: [])
@@ -0,0 +1,39 @@
+"""Migrations run against data that predates them (user-028)."""
+import os
+import sqlite3
+import subprocess
+import sys
+
+from conftest import ROOT
+
+
+def _flask_db(database, *args):
+    env = dict(os.environ, DATABASE_URL=f"sqlite:///{database}")
+    subprocess.run(
+        [sys.executable, "-m", "flask", "--app", "app", "db", *args],
+        cwd=ROOT, env=env, check=True, capture_output=True,
+    )
+
+
+def test_unique_sku_index_renames_existing_duplicates(tmp_path):
+    database = tmp_path / "old.db"
+    _flask_db(database, "upgrade", "0002")
+    with sqlite3.connect(database) as connection:
+        connection.execute(
+            "INSERT INTO users (id, email, created_at) VALUES ('u1', 'a@x', '2024-01-01'), ('u2', 'b@x', '2024-01-01')"
+        )
+        connection.executemany(
+            "INSERT INTO products (id, user_id, name, sku, unit_price, cost_price, stock_quantity, min_stock_level,"
+            " created_at, updated_at) VALUES (?, ?, ?, ?, 10, 6, 0, 0, '2024-01-01', '2024-01-01')",
+            [(1, "u1", "A", "SKU-1"), (2, "u1", "B", "SKU-1"), (3, "u1", "C", "SKU-1-2"),
+             (4, "u1", "D", "SKU-1"), (5, "u2", "E", "SKU-1")],
+        )
+
+    _flask_db(database, "upgrade", "0003")
+
+    with sqlite3.connect(database) as connection:
+        skus = dict(connection.execute("SELECT id, sku FROM products"))
+        indexes = [row[1] for row in connection.execute("PRAGMA index_list(products)")]
+    # The first keeps its SKU, a taken new SKU is skipped and another store's product is no duplicate
+    assert skus == {1: "SKU-1", 2: "SKU-1-2-dup", 3: "SKU-1-2", 4: "SKU-1-4", 5: "SKU-1"}
+    assert "uq_products_user_id_sku" in indexes
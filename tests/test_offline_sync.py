@@ -0,0 +1,63 @@
+"""Offline invoice numbers keep the year of the block they came from (user-048)."""
+from models import db, InvoiceNumberBlock
+import services
+
+from conftest import USER_ID
+
+
+def _record(key, sequence, **fields):
+    record = {
+        "key": key,
+        "sequence": sequence,
+        "customer_name": "Walk-in",
+        "payment_mode": "CASH",
+        "items": [{"description": "Widget", "quantity": 1, "unit_price": 10}],
+    }
+    record.update(fields)
+    return record
+
+
+def _sync(client, *records):
+    response = client.post("/api/v1/sync/invoices", json={"terminal_id": "till-1", "invoices": list(records)})
+    assert response.status_code == 200, response.get_json()
+    return response.get_json()["data"]
+
+
+def test_block_reports_its_year(client):
+    response = client.post("/api/v1/terminals/till-1/number-blocks", json={"size": 5})
+    assert response.status_code == 201
+    block = response.get_json()["data"]
+    assert (block["year"], block["first"], block["last"]) == (services.invoice_number_year(), 1, 5)
+
+
+def test_number_uses_the_block_year_not_the_invoice_date(app, client):
+    client.post("/api/v1/terminals/till-1/number-blocks", json={"size": 5})
+    with app.app_context():
+        # Reserved late in 2025, billed offline on the 2nd of January
+        db.session.query(InvoiceNumberBlock).update({"year": 2025})
+        db.session.commit()
+        prefix = services.invoice_number_prefix(USER_ID)
+
+    [result] = _sync(client, _record("till-1-0001", 3, invoice_date="2026-01-02"))
+    assert result["status"] == "created"
+    assert result["invoice_number"] == f"{prefix}-2025-0003"
+
+
+def test_used_number_is_rejected_and_resend_is_a_duplicate(client):
+    client.post("/api/v1/terminals/till-1/number-blocks", json={"size": 5})
+
+    [first] = _sync(client, _record("till-1-0001", 1))
+    assert first["status"] == "created"
+
+    # Another record printed with the same number clashes; the same record re-sent does not
+    clash, resent = _sync(client, _record("till-1-0002", 1), _record("till-1-0001", 1))
+    assert clash["status"] == "rejected"
+    assert clash["error"] == f"Invoice number {first['invoice_number']} is already used."
+    assert (resent["status"], resent["id"]) == ("duplicate", first["id"])
+
+
+def test_unreserved_sequence_is_rejected(client):
+    client.post("/api/v1/terminals/till-1/number-blocks", json={"size": 5})
+    [result] = _sync(client, _record("till-1-0001", 6))
+    assert result["status"] == "rejected"
+    assert "was not reserved" in result["error"]
@@ -0,0 +1,48 @@
+"""Pages run a fixed number of statements however many invoices there are (user-027).
+
+Invoice items are loaded explicitly (selectinload) where a page shows them
+and not at all elsewhere; a lazy or joined load creeping back in shows up
+here as a count that grows with the data.
+"""
+import pytest
+
+# Statements per page once the session is warm, pinned so any change is noticed
+QUERY_COUNTS = {
+    "/": 2,
+    "/invoice/1": 3,
+    "/invoice/1/download": 3,
+    "/invoices/export": 1,
+    "/reports": 4,
+    "/reports/export": 4,
+    "/reports/gstr1": 3,
+    "/expenses": 1,
+    "/products": 1,
+    "/inventory": 2,
+    "/inventory/valuation": 2,
+}
+
+
+@pytest.fixture
+def bill(make_product, make_invoice):
+    def bill(count):
+        product_id = make_product(name=f"Widget {count}", stock=100)
+        for _ in range(count):
+            make_invoice([(product_id, 1), (product_id, 2)])
+    return bill
+
+
+def _count(client, statements, path):
+    # The first request fills the user and settings caches
+    assert client.get(path).status_code == 200
+    statements.clear()
+    assert client.get(path).status_code == 200
+    return len(statements)
+
+
+@pytest.mark.parametrize("path", QUERY_COUNTS)
+def test_statement_count_does_not_grow_with_invoices(client, statements, bill, path):
+    bill(2)
+    few = _count(client, statements, path)
+    bill(10)
+    many = _count(client, statements, path)
+    assert (few, many) == (QUERY_COUNTS[path], QUERY_COUNTS[path])
@@ -0,0 +1,49 @@
+"""Per-user pages search an index instead of scanning whole tables (user-028).
+
+Every statement a page runs is put through SQLite's EXPLAIN QUERY PLAN. A
+plan step that reads a table from start to end ("SCAN invoices") fails;
+searching an index ("SEARCH invoices USING INDEX ...") and scanning a
+subquery's own rows are fine.
+"""
+import re
+
+import pytest
+
+from models import db
+
+PATHS = [
+    "/",
+    "/invoice/1",
+    "/invoices/export",
+    "/reports",
+    "/reports/gstr1",
+    "/expenses",
+    "/products",
+    "/inventory",
+    "/inventory/valuation",
+]
+
+
+def _plan(statement, parameters):
+    rows = db.session.connection().exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters).all()
+    return [row[-1] for row in rows]
+
+
+@pytest.mark.parametrize("path", PATHS)
+def test_pages_use_indexes(app, client, statements, make_product, make_invoice, path):
+    product_id = make_product(stock=100)
+    for _ in range(3):
+        make_invoice([(product_id, 1)])
+    client.post("/expenses", data={"date": "2026-04-02", "description": "Rent", "category": "Rent", "amount": 100})
+
+    client.get(path)
+    statements.clear()
+    assert client.get(path).status_code == 200
+    assert statements
+
+    with app.app_context():
+        tables = set(db.metadata.tables)
+        for statement, parameters in list(statements):
+            plan = _plan(statement, parameters)
+            scans = [step for step in plan if (match := re.match(r"SCAN (\w+)", step)) and match[1] in tables]
+            assert not scans, f"{statement}\n{plan}"
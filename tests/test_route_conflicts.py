@@ -0,0 +1,75 @@
+"""Routes turn a conflict that outlasts every retry into a flashed error, never a 500 (user-039, user-040)."""
+import pytest
+
+from models import db, Branch
+import inventory
+import services
+
+CONFLICT = "changed by someone else"
+
+
+def _always_conflicts(*args, **kwargs):
+    raise inventory.StockConflictError("Some invoices were changed at the same time.")
+
+
+@pytest.fixture
+def invoice_id(make_product, make_invoice):
+    return make_invoice([(make_product(), 1)])
+
+
+@pytest.mark.parametrize("operation, path, data", [
+    ("delete_invoice", "/invoice/{id}/delete", {}),
+    ("void_invoices", "/invoice/{id}/void", {}),
+    ("void_invoices", "/invoices/void", {"ids": "{id}"}),
+])
+def test_invoice_routes_flash_conflicts(client, monkeypatch, invoice_id, operation, path, data):
+    monkeypatch.setattr(services, operation, _always_conflicts)
+    data = {name: value.format(id=invoice_id) for name, value in data.items()}
+    response = client.post(path.format(id=invoice_id), data=data, follow_redirects=True)
+    assert response.status_code == 200
+    assert CONFLICT in response.get_data(as_text=True)
+
+
+def test_settings_save_flashes_conflicts(client, monkeypatch):
+    monkeypatch.setattr(services, "save_store_settings", _always_conflicts)
+    response = client.post("/settings", data={"store_name": "Shop"}, follow_redirects=True)
+    assert response.status_code == 200
+    assert CONFLICT in response.get_data(as_text=True)
+
+
+@pytest.mark.parametrize("operation, path, data", [
+    ("update_product", "/products/{id}/edit", {"name": "Widget", "sku": "WIDGET", "unit_price": "12"}),
+    ("delete_product", "/products/{id}/delete", {}),
+])
+def test_product_routes_flash_conflicts(client, monkeypatch, make_product, operation, path, data):
+    product_id = make_product()
+    monkeypatch.setattr(services, operation, _always_conflicts)
+    response = client.post(path.format(id=product_id), data=data, follow_redirects=True)
+    assert response.status_code == 200
+    assert CONFLICT in response.get_data(as_text=True)
+
+
+@pytest.mark.parametrize("operation, key", [("create_invoice", ""), ("create_invoice_once", "form-key-0001")])
+def test_new_invoice_flashes_conflicts(client, monkeypatch, make_product, operation, key):
+    product_id = make_product()
+    monkeypatch.setattr(services, operation, _always_conflicts)
+    response = client.post("/invoice/new", data={
+        "customer_name": "Walk-in", "payment_mode": "CASH", "idempotency_key": key,
+        "item_description[]": "Widget", "item_quantity[]": "1", "item_unit_price[]": "10",
+        "item_product_id[]": str(product_id),
+    }, follow_redirects=True)
+    assert response.status_code == 200
+    assert CONFLICT in response.get_data(as_text=True)
+
+
+def test_branch_transfer_flashes_conflicts(app, client, monkeypatch, make_product):
+    make_product()
+    client.post("/branches", data={"name": "Second shop"})
+    with app.app_context():
+        branch_id = db.session.query(Branch.id).scalar()
+    monkeypatch.setattr(inventory, "transfer_stock", _always_conflicts)
+    response = client.post("/branches/transfer", data={
+        "from_branch": "0", "to_branch": str(branch_id), "lines": "WIDGET, 5",
+    }, follow_redirects=True)
+    assert response.status_code == 200
+    assert CONFLICT in response.get_data(as_text=True)